@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Benchmark regression guard: rerun a fixed benchmark profile and compare it with a baseline.
+
+The baseline (default benchmarks/baseline.json) is a benchmark.py report plus the profile it was
+run with and the tolerances to apply. Every case is matched by (stage, rows, depth) and each
+metric must stay within
+
+  current <= baseline * ratio + slack
+
+for its tolerance. Defaults: median wall time 1.25x + 20 ms, peak RSS 1.15x + 48 MB, stage RSS
+delta 1.25x + 24 MB, artifact size exact. The median is compared rather than the best run, which
+a single lucky run can pull down. Tiny cases are dominated by the slack, large ones by the ratio.
+
+Time and memory depend on the software stack, so when the report's Python, NumPy or sklearn
+version differs from the baseline's, their regressions are reported as warnings up to
+HARD_RATIO (2x) of the baseline, and fail beyond it; missing cases and artifact sizes still
+fail. A readable table of all compared metrics is printed; the
+exit status is 1 if anything failed.
+
+Usage:
+  python scripts/bench_guard.py                      # run the baseline's profile and compare
+  python scripts/bench_guard.py --update             # rerun the profile and (re)write the baseline
+  python scripts/bench_guard.py --results benchmarks/latest.json   # compare an existing report
+  python scripts/bench_guard.py --tolerance medianSeconds=2.0,0.05
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from benchmark import STAGES, run_benchmarks
+
+DEFAULT_BASELINE = "benchmarks/baseline.json"
+DEFAULT_PROFILE = {
+    "stages": list(STAGES),
+    "sizes": [3_000, 100_000],
+    "depths": [6, 12],
+    "repeat": 5,
+    "seed": 0,
+}
+# metric -> (ratio, slack); a metric regresses when current > baseline * ratio + slack.
+DEFAULT_TOLERANCES: Dict[str, Tuple[float, float]] = {
+    "medianSeconds": (1.25, 0.02),
+    "peakRssMb": (1.15, 48.0),
+    "deltaRssMb": (1.25, 24.0),
+    "artifactBytes": (1.0, 0.0),
+}
+# Metrics that only warn when the environment differs from the baseline's, up to HARD_RATIO.
+MACHINE_METRICS = ("medianSeconds", "peakRssMb", "deltaRssMb")
+HARD_RATIO = 2.0
+# Environment fields that make time and memory incomparable; the kernel string or CPU count
+# changing (e.g. another CI runner of the same image) does not.
+ENVIRONMENT_KEYS = ("python", "numpy", "sklearn")
+
+
+def case_key(record: Dict[str, Any]) -> Tuple[str, int, Optional[int]]:
+    return record["stage"], record["rows"], record["depth"]
+
+
+def parse_tolerances(values: List[str]) -> Dict[str, Tuple[float, float]]:
+    """Parse `metric=ratio[,slack]` overrides."""
+    tolerances = {}
+    for value in values:
+        metric, _, spec = value.partition("=")
+        if metric not in DEFAULT_TOLERANCES or not spec:
+            raise SystemExit(
+                f"Bad --tolerance {value!r}; expected metric=ratio[,slack] with metric in "
+                f"{', '.join(DEFAULT_TOLERANCES)}"
+            )
+        ratio, _, slack = spec.partition(",")
+        tolerances[metric] = (float(ratio), float(slack or DEFAULT_TOLERANCES[metric][1]))
+    return tolerances
+
+
+def compare(
+    baseline: List[Dict[str, Any]],
+    current: List[Dict[str, Any]],
+    tolerances: Dict[str, Tuple[float, float]],
+    warn_only: Sequence[str] = (),
+) -> Tuple[List[Dict[str, Any]], bool]:
+    """Return one row per compared metric (plus missing cases) and whether anything failed.
+
+    Regressions of metrics in `warn_only` are marked WARNING and do not count as failures,
+    unless the metric exceeds `baseline * max(ratio, HARD_RATIO) + slack`.
+    """
+    current_by_key = {case_key(r): r for r in current}
+    rows, failed = [], False
+    for base in baseline:
+        key = case_key(base)
+        cur = current_by_key.get(key)
+        if cur is None:
+            rows.append({"case": key, "metric": "-", "status": "MISSING"})
+            failed = True
+            continue
+        for metric, (ratio, slack) in tolerances.items():
+            if metric not in base or metric not in cur:
+                continue
+            limit = base[metric] * ratio + slack
+            regressed = cur[metric] > limit
+            hard_limit = base[metric] * max(ratio, HARD_RATIO) + slack
+            warning = regressed and metric in warn_only and cur[metric] <= hard_limit
+            failed |= regressed and not warning
+            rows.append(
+                {
+                    "case": key,
+                    "metric": metric,
+                    "baseline": base[metric],
+                    "current": cur[metric],
+                    "limit": limit,
+                    "change": cur[metric] / base[metric] - 1 if base[metric] else None,
+                    "status": "WARNING" if warning else "REGRESSED" if regressed else "ok",
+                }
+            )
+    return rows, failed
+
+
+def format_table(rows: List[Dict[str, Any]], only_failures: bool = False) -> str:
+    def num(value: Any) -> str:
+        if value is None:
+            return "-"
+        return f"{value:,.0f}" if abs(value) >= 1000 else f"{value:.4g}"
+
+    header = (
+        f"{'stage':<16}{'rows':>10}{'depth':>6}  {'metric':<14}{'baseline':>12}"
+        f"{'current':>12}{'limit':>12}{'change':>9}  status"
+    )
+    lines = [header, "-" * len(header)]
+    for row in rows:
+        if only_failures and row["status"] == "ok":
+            continue
+        stage, n_rows, depth = row["case"]
+        change = row.get("change")
+        lines.append(
+            f"{stage:<16}{n_rows:>10,}{'-' if depth is None else depth:>6}  {row['metric']:<14}"
+            f"{num(row.get('baseline')):>12}{num(row.get('current')):>12}"
+            f"{num(row.get('limit')):>12}{'-' if change is None else f'{change:+.1%}':>9}"
+            f"  {row['status']}"
+        )
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a benchmark run against the baseline")
+    parser.add_argument("--baseline", type=str, default=DEFAULT_BASELINE)
+    parser.add_argument(
+        "--results",
+        type=str,
+        default=None,
+        help="Compare this existing benchmark.py report instead of running the profile",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Run the profile and write it as the new baseline (keeps its tolerances); "
+        "required to create a baseline that does not exist yet",
+    )
+    parser.add_argument(
+        "--tolerance",
+        action="append",
+        default=[],
+        help="Override a tolerance as metric=ratio[,slack] (repeatable)",
+    )
+    parser.add_argument(
+        "--failures-only", action="store_true", help="Only print regressed or missing metrics"
+    )
+    parser.add_argument("--out", type=str, default=None, help="Also save the current report here")
+    args = parser.parse_args()
+
+    baseline_path = Path(args.baseline)
+    baseline = json.loads(baseline_path.read_text()) if baseline_path.exists() else None
+    if baseline is None and not args.update:
+        # A mistyped path must not quietly become a new baseline that every run passes against.
+        raise SystemExit(f"Baseline {baseline_path} does not exist; pass --update to create it")
+    profile = (baseline or {}).get("profile", DEFAULT_PROFILE)
+    tolerances = {
+        metric: tuple(value)
+        for metric, value in (baseline or {}).get("tolerances", DEFAULT_TOLERANCES).items()
+    }
+    tolerances.update(parse_tolerances(args.tolerance))
+
+    if args.results:
+        report = json.loads(Path(args.results).read_text())
+    else:
+        report = run_benchmarks(
+            profile["stages"],
+            profile["sizes"],
+            profile["depths"],
+            repeat=profile["repeat"],
+            seed=profile["seed"],
+        )
+    if args.out:
+        Path(args.out).write_text(json.dumps(report, indent=2))
+
+    if args.update:
+        report["profile"] = profile
+        report["tolerances"] = {metric: list(value) for metric, value in tolerances.items()}
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(report, indent=2))
+        print(f"Wrote baseline with {len(report['results'])} cases to {baseline_path}")
+        return
+
+    env_base, env_cur = baseline.get("environment", {}), report.get("environment", {})
+    changed = [k for k in ENVIRONMENT_KEYS if env_base.get(k) != env_cur.get(k)]
+    rows, failed = compare(
+        baseline["results"], report["results"], tolerances, MACHINE_METRICS if changed else ()
+    )
+    print(format_table(rows, only_failures=args.failures_only))
+    if changed:
+        print(
+            f"note: environment differs from the baseline ({', '.join(changed)}); time and "
+            f"memory regressions up to {HARD_RATIO:g}x are warnings"
+        )
+    n_bad = sum(row["status"] not in ("ok", "WARNING") for row in rows)
+    n_warn = sum(row["status"] == "WARNING" for row in rows)
+    if n_warn:
+        print(f"{n_warn} of {len(rows)} metrics regressed in a different environment (warnings)")
+    print(f"{n_bad} of {len(rows)} metrics regressed or missing" if failed else "No regressions.")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Benchmark the data-preparation, training, export and prediction stages on synthetic data.
+
+Every (stage, rows, depth) case runs in a fresh process. The process builds a synthetic
+California-Housing-shaped table (8 features and a target), runs the setup the stage needs (e.g.
+fitting the tree that `export` serializes), then times the stage `--repeat` times and keeps the
+best and median wall times. Peak memory is the resident-set high-water mark reached during the
+timed runs: on Linux the mark is reset before each run through /proc/self/clear_refs, so setup
+does not count. Elsewhere it is the process-wide peak. deltaRssMb is that peak minus the RSS
+right before the run, i.e. what the stage itself allocated.
+
+Stages:
+- load           : warm dataset_cache load (memory-mapped columns, SHA-256 verified)
+- split          : prepare_data.stratified_fixed_sizes (80/20)
+- split_index    : make_stratify_bins + stratified_split_indices + gather_rows (80/20)
+- train          : train_tree.train_tree (sklearn)
+- train_hist     : train_tree.train_hist_tree
+- export         : train_tree.export_tree_json (per-node dicts)
+- export_columnar: train_tree.export_tree_columnar
+- json           : json.dumps of the per-node export (artifactBytes = its length)
+- tree_bin       : tree_binary.write_tree_binary (artifactBytes = file size)
+- predict        : predict_tree.TreePredictor.predict over every row
+
+Usage:
+  python scripts/benchmark.py
+  python scripts/benchmark.py --sizes 3k,1m,50m --depths 6,12,0 --stages train,export,predict
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import multiprocessing as mp
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+STAGES = (
+    "load",
+    "split",
+    "split_index",
+    "train",
+    "train_hist",
+    "export",
+    "export_columnar",
+    "json",
+    "tree_bin",
+    "predict",
+)
+# Stages whose cost depends on the tree; the others run once per size.
+TREE_STAGES = {"train", "train_hist", "export", "export_columnar", "json", "tree_bin", "predict"}
+RESULTS_VERSION = 1
+TARGET = "MedHouseVal"
+FEATURES = [
+    "MedInc",
+    "HouseAge",
+    "AveRooms",
+    "AveBedrms",
+    "Population",
+    "AveOccup",
+    "Latitude",
+    "Longitude",
+]
+SIZE_SUFFIXES = {"k": 1_000, "m": 1_000_000}
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().lower()
+    if text[-1:] in SIZE_SUFFIXES:
+        return int(float(text[:-1]) * SIZE_SUFFIXES[text[-1]])
+    return int(text)
+
+
+def synthetic_frame(n_rows: int, seed: int = 0) -> pd.DataFrame:
+    """Random table with the California Housing columns and a target that depends on them."""
+    rng = np.random.default_rng(seed)
+    columns = {
+        "MedInc": rng.gamma(4.0, 1.0, n_rows),
+        "HouseAge": rng.integers(1, 53, n_rows).astype(np.float64),
+        "AveRooms": rng.lognormal(1.6, 0.3, n_rows),
+        "AveBedrms": rng.lognormal(0.05, 0.1, n_rows),
+        "Population": np.round(rng.lognormal(7.0, 0.7, n_rows)),
+        "AveOccup": rng.lognormal(1.0, 0.3, n_rows),
+        "Latitude": np.round(rng.uniform(32.5, 42.0, n_rows), 2),
+        "Longitude": np.round(rng.uniform(-124.3, -114.3, n_rows), 2),
+    }
+    y = (
+        0.45 * columns["MedInc"]
+        - 0.03 * (columns["Latitude"] - 34.0) ** 2
+        + 0.01 * columns["HouseAge"]
+        + rng.normal(0.0, 0.5, n_rows)
+    )
+    columns[TARGET] = np.clip(y, 0.15, 5.0)
+    return pd.DataFrame(columns, copy=False)
+
+
+def _status_kb(field: str) -> Optional[int]:
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Reset the RSS high-water mark (Linux only); returns whether it worked."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    hwm = _status_kb("VmHWM")
+    if hwm is None:
+        # ru_maxrss is in bytes on macOS and kilobytes elsewhere.
+        hwm = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            hwm //= 1024
+    return hwm / 1024
+
+
+def current_rss_mb() -> Optional[float]:
+    rss = _status_kb("VmRSS")
+    return None if rss is None else rss / 1024
+
+
+def _no_artifact(result: Any) -> None:
+    return None
+
+
+def _setup(
+    stage: str, df: pd.DataFrame, depth: Optional[int], tmp: Path
+) -> Tuple[Callable[[], Any], Callable[[Any], Optional[int]]]:
+    """Return (timed function, artifact size of its result) for `stage`."""
+    # Imported here so each spawned case only pays for what it uses.
+    from train_tree import (
+        export_tree_columnar,
+        export_tree_json,
+        train_hist_tree,
+        train_tree,
+    )
+
+    n_test = len(df) // 5
+    if stage == "load":
+        from dataset_cache import load_frame, store_frame
+
+        store_frame(tmp, "bench", df)
+        return (lambda: load_frame(tmp, "bench", verify=True)), _no_artifact
+    if stage == "split":
+        from prepare_data import stratified_fixed_sizes
+
+        X, y = df[FEATURES], df[TARGET]
+        return (lambda: stratified_fixed_sizes(X, y, len(df) - n_test, n_test, 0)), _no_artifact
+    if stage == "split_index":
+        from prepare_data import gather_rows, make_stratify_bins, stratified_split_indices
+
+        def split_index():
+            codes = make_stratify_bins(df[TARGET])
+            train_idx, test_idx = stratified_split_indices(codes, len(df) - n_test, n_test, 0)
+            columns = FEATURES + [TARGET]
+            return gather_rows(df, train_idx, columns), gather_rows(df, test_idx, columns)
+
+        return split_index, _no_artifact
+    if stage == "train":
+        return (lambda: train_tree(df, TARGET, depth, 20, 0)), _no_artifact
+    if stage == "train_hist":
+        return (lambda: train_hist_tree(df, TARGET, depth, 20, 0)), _no_artifact
+
+    tree = train_tree(df, TARGET, depth, 20, 0)
+    if stage == "export":
+        return (lambda: export_tree_json(tree, FEATURES)), _no_artifact
+    if stage == "export_columnar":
+        return (lambda: export_tree_columnar(tree, FEATURES)), _no_artifact
+    if stage == "json":
+        exported = export_tree_json(tree, FEATURES)
+        return (lambda: json.dumps(exported)), len
+    if stage == "tree_bin":
+        from tree_binary import tree_arrays, write_tree_binary
+
+        path = tmp / "tree.bin"
+        return (lambda: write_tree_binary(tree_arrays(tree), path)), lambda _: path.stat().st_size
+    if stage == "predict":
+        from predict_tree import TreePredictor
+
+        predictor = TreePredictor.from_dict(export_tree_columnar(tree, FEATURES))
+        X = df[FEATURES].to_numpy(dtype=np.float32)
+        return (lambda: predictor.predict(X)), _no_artifact
+    raise ValueError(f"Unknown stage {stage!r}")
+
+
+def run_case(
+    stage: str, n_rows: int, depth: Optional[int], repeat: int, seed: int
+) -> Dict[str, Any]:
+    """Run one benchmark case (meant to be called in a fresh process)."""
+    with tempfile.TemporaryDirectory(prefix="regtree-bench-") as tmp:
+        df = synthetic_frame(n_rows, seed)
+        fn, artifact_size = _setup(stage, df, depth, Path(tmp))
+        if stage == "load":
+            del df
+        times, peaks = [], []
+        result, reset = None, False
+        for _ in range(repeat):
+            result = None
+            gc.collect()
+            reset = reset_peak_rss()
+            base = current_rss_mb()
+            start = time.perf_counter()
+            result = fn()
+            times.append(time.perf_counter() - start)
+            peak = peak_rss_mb()
+            peaks.append((peak, peak - base if base is not None else None))
+        record = {
+            "stage": stage,
+            "rows": n_rows,
+            "depth": None if stage not in TREE_STAGES else (depth or 0),
+            "seconds": round(min(times), 6),
+            "medianSeconds": round(float(np.median(times)), 6),
+            "repeat": repeat,
+            "peakRssMb": round(max(p for p, _ in peaks), 2),
+            "peakRssResetPerRun": reset,
+        }
+        deltas = [d for _, d in peaks if d is not None]
+        if deltas:
+            record["deltaRssMb"] = round(max(deltas), 2)
+        size = artifact_size(result)
+        if size is not None:
+            record["artifactBytes"] = int(size)
+        return record
+
+
+def _case_in_subprocess(ctx, case: tuple) -> Dict[str, Any]:
+    with ctx.Pool(1, maxtasksperchild=1) as pool:
+        return pool.apply(run_case, case)
+
+
+def environment() -> Dict[str, Any]:
+    import sklearn
+
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "sklearn": sklearn.__version__,
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpuCount": os.cpu_count(),
+    }
+
+
+def run_benchmarks(
+    stages: List[str], sizes: List[int], depths: List[int], repeat: int = 3, seed: int = 0
+) -> Dict[str, Any]:
+    ctx = mp.get_context("spawn")
+    results = []
+    for n_rows in sizes:
+        for stage in stages:
+            for depth in depths if stage in TREE_STAGES else [None]:
+                max_depth = None if not depth else depth
+                record = _case_in_subprocess(ctx, (stage, n_rows, max_depth, repeat, seed))
+                results.append(record)
+                print(format_row(record), flush=True)
+    return {
+        "version": RESULTS_VERSION,
+        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": environment(),
+        "results": results,
+    }
+
+
+def format_row(record: Dict[str, Any]) -> str:
+    depth = "-" if record["depth"] is None else str(record["depth"])
+    delta = record.get("deltaRssMb")
+    artifact = record.get("artifactBytes")
+    return (
+        f"{record['stage']:<16}{record['rows']:>12,}{depth:>7}{record['seconds']:>12.4f}s"
+        f"{record['peakRssMb']:>11.1f}MB{'-' if delta is None else f'{delta:.1f}':>10}MB"
+        f"{'' if artifact is None else f'{artifact:>14,}B'}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prepare/train/export/predict stages")
+    parser.add_argument(
+        "--sizes", type=str, default="3k,100k,1m", help="Comma-separated row counts (k/m suffixes)"
+    )
+    parser.add_argument(
+        "--depths", type=str, default="6,12", help="Comma-separated max depths (0 = unlimited)"
+    )
+    parser.add_argument(
+        "--stages", type=str, default=",".join(STAGES), help=f"Subset of {','.join(STAGES)}"
+    )
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (best is kept)")
+    parser.add_argument("--seed", type=int, default=0, help="Synthetic data seed")
+    parser.add_argument("--out", type=str, default="benchmarks/latest.json")
+    args = parser.parse_args()
+
+    stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = sorted(set(stages) - set(STAGES))
+    if unknown:
+        raise SystemExit(f"Unknown stages {unknown}; choose from {', '.join(STAGES)}")
+    sizes = [parse_size(s) for s in args.sizes.split(",") if s.strip()]
+    depths = [int(d) for d in args.depths.split(",") if d.strip()]
+
+    header = f"{'stage':<16}{'rows':>12}{'depth':>7}{'best':>13}{'peak RSS':>13}{'delta':>12}"
+    print(f"{header}{'artifact':>15}")
+    report = run_benchmarks(stages, sizes, depths, repeat=args.repeat, seed=args.seed)
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2))
+    print(f"Wrote {len(report['results'])} results to {out}")
+
+
+if __name__ == "__main__":
+    main()
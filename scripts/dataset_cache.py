@@ -0,0 +1,130 @@
+"""
+Local content-addressed cache for source datasets.
+
+Layout under the data home (default ~/.cache/regression-tree; override with --data-home or the
+REGTREE_DATA_HOME environment variable):
+- objects/<aa>/<sha256>.npy : one NumPy file per column, named by the SHA-256 of its bytes
+- manifests/<name>.json     : column names, dtypes, row count and the digest of every column
+
+A warm load reads the manifest and memory-maps each column, so nothing is parsed or copied.
+Because objects are immutable and named by content, a data home can be copied as-is to machines
+without network access.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+DATA_HOME_ENV = "REGTREE_DATA_HOME"
+OFFLINE_ENV = "REGTREE_OFFLINE"
+MANIFEST_VERSION = 1
+
+
+class CacheMissError(RuntimeError):
+    """Raised when a dataset is not cached and downloading is not allowed."""
+
+
+def default_data_home() -> Path:
+    env = os.environ.get(DATA_HOME_ENV)
+    return Path(env) if env else Path.home() / ".cache" / "regression-tree"
+
+
+def offline_from_env() -> bool:
+    return os.environ.get(OFFLINE_ENV, "").lower() in {"1", "true", "yes"}
+
+
+def sha256_file(path: str | Path, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(block_size), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def object_path(home: Path, digest: str) -> Path:
+    return home / "objects" / digest[:2] / f"{digest}.npy"
+
+
+def _atomic_write(path: Path, write) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            write(fh)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def put_array(home: Path, arr: np.ndarray) -> str:
+    """Store `arr` as an .npy object and return its SHA-256 digest."""
+    home.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=home, prefix=".object.", suffix=".npy")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            np.save(fh, np.ascontiguousarray(arr), allow_pickle=False)
+        digest = sha256_file(tmp)
+        dest = object_path(home, digest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp, dest)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    return digest
+
+
+def store_frame(home: Path, name: str, df: pd.DataFrame) -> Dict[str, Any]:
+    """Write every column of `df` to the object store and record a manifest for `name`."""
+    columns = []
+    for col in df.columns:
+        arr = df[col].to_numpy()
+        digest = put_array(home, arr)
+        columns.append({"name": str(col), "dtype": arr.dtype.str, "sha256": digest})
+    manifest = {"version": MANIFEST_VERSION, "name": name, "nRows": int(len(df)), "columns": columns}
+    data = json.dumps(manifest, indent=2).encode()
+    _atomic_write(home / "manifests" / f"{name}.json", lambda fh: fh.write(data))
+    return manifest
+
+
+def read_manifest(home: Path, name: str) -> Optional[Dict[str, Any]]:
+    path = home / "manifests" / f"{name}.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def manifest_digest(manifest: Dict[str, Any]) -> str:
+    """Digest of the cached content itself (stable across machines and data homes)."""
+    cols = [(c["name"], c["dtype"], c["sha256"]) for c in manifest["columns"]]
+    return hashlib.sha256(json.dumps(cols).encode()).hexdigest()
+
+
+def load_frame(home: Path, name: str, verify: bool = True) -> Optional[pd.DataFrame]:
+    """Return the cached frame for `name` with memory-mapped columns, or None if not cached.
+
+    With `verify`, every column file is re-hashed and compared with the manifest; a mismatch
+    or missing object is treated as a cache miss.
+    """
+    manifest = read_manifest(home, name)
+    if manifest is None:
+        return None
+    columns = {}
+    for col in manifest["columns"]:
+        path = object_path(home, col["sha256"])
+        if not path.exists() or (verify and sha256_file(path) != col["sha256"]):
+            return None
+        arr = np.load(path, mmap_mode="r", allow_pickle=False)
+        if len(arr) != manifest["nRows"]:
+            return None
+        columns[col["name"]] = arr
+    return pd.DataFrame(columns, copy=False)
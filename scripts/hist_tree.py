@@ -0,0 +1,438 @@
+"""
+Histogram-based regression tree builder in pure NumPy.
+
+Each feature is quantized once to at most 256 bins (uint8 codes) using thresholds taken from a
+row sample: midpoints between distinct values when there are few of them, quantiles otherwise.
+The tree then grows level by level. One pass over the rows per level routes every row through
+the splits chosen for the previous level and accumulates per-(node, feature, bin) target sums
+and counts for the nodes that may split next; the best split of each node is read off the
+cumulative histograms.
+
+Rows are processed in chunks pulled from the source columns, so the inputs can be memory-mapped
+files larger than RAM. With `spill_dir`, the bin codes and per-row node ids also live in
+memory-mapped scratch files, and resident memory is bounded by the chunk size and the
+histograms rather than the row count.
+
+With n_jobs > 1 the level passes are data-parallel: row chunks are sharded across a process
+pool that shares the bin codes, targets and node ids (SharedMemory, or the spill files), each
+worker returns its chunk's histograms, and the parent reduces them in chunk order.
+
+Values are compared as float32, like DecisionTreeRegressor, and the fitted HistTree exposes the
+same `tree_` arrays, so every exporter in train_tree.py works unchanged. Missing values are not
+supported.
+"""
+
+from __future__ import annotations
+
+import multiprocessing as mp
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import numpy as np
+
+from predict_tree import TreePredictor
+from profiling import span
+from scratch_arrays import ScratchArray, open_scratch, start_resource_tracker
+
+MAX_BINS = 256
+DEFAULT_CHUNK_ROWS = 1 << 18
+BIN_SAMPLE_ROWS = 200_000
+SPLIT_NODE_BLOCK = 256  # nodes scored at once; bounds the (nodes, features, bins) temporaries
+
+
+@dataclass
+class TreeArrays:
+    """Node arrays named like sklearn's `Tree` (`value` has shape (node_count, 1, 1))."""
+
+    children_left: np.ndarray
+    children_right: np.ndarray
+    feature: np.ndarray
+    threshold: np.ndarray
+    value: np.ndarray
+    impurity: np.ndarray
+    n_node_samples: np.ndarray
+
+    @property
+    def node_count(self) -> int:
+        return len(self.children_left)
+
+
+@dataclass
+class _LevelPlan:
+    # Indexed by node id. Rows of a node with split_bin >= 0 move to left_of (or left_of + 1
+    # when their code is above split_bin); afterwards rows of nodes with stat_slot >= 0 feed
+    # the count/sum/sum-of-squares totals and rows of nodes with hist_slot >= 0 the histograms.
+    split_feature: np.ndarray
+    split_bin: np.ndarray
+    left_of: np.ndarray
+    stat_slot: np.ndarray
+    hist_slot: np.ndarray
+    n_stat: int
+    n_hist: int
+    n_bins: int
+
+
+def compute_bin_edges(
+    col: np.ndarray, max_bins: int = MAX_BINS, sample_rows: int = BIN_SAMPLE_ROWS, rng=None
+) -> np.ndarray:
+    """Split thresholds for one feature; codes are `searchsorted(edges, x, side="left")`."""
+    rng = np.random.default_rng(rng)
+    n = len(col)
+    if n > sample_rows:
+        sample = np.asarray(col[np.sort(rng.choice(n, size=sample_rows, replace=False))])
+    else:
+        sample = np.asarray(col)
+    sample = sample.astype(np.float32).astype(np.float64)
+    uniq = np.unique(sample)
+    if len(uniq) <= max_bins:
+        return (uniq[:-1] + uniq[1:]) / 2
+    return np.unique(np.quantile(sample, np.linspace(0, 1, max_bins + 1)[1:-1]))
+
+
+def bin_column(col: np.ndarray, edges: np.ndarray) -> np.ndarray:
+    return np.searchsorted(edges, np.asarray(col, dtype=np.float32), side="left").astype(np.uint8)
+
+
+def _level_pass(
+    codes: np.ndarray,
+    y: np.ndarray,
+    node_of_row: np.ndarray,
+    start: int,
+    stop: int,
+    plan: _LevelPlan,
+):
+    """Route rows [start, stop) one level down and return (stats, hist_sum, hist_cnt)."""
+    nodes = np.asarray(node_of_row[start:stop])
+    yv = np.asarray(y[start:stop], dtype=np.float64)
+    chunk_codes = np.asarray(codes[:, start:stop])
+
+    moving = np.flatnonzero(plan.split_bin[nodes] >= 0)
+    if len(moving):
+        parent = nodes[moving]
+        code = chunk_codes[plan.split_feature[parent], moving]
+        nodes[moving] = plan.left_of[parent] + (code > plan.split_bin[parent])
+        node_of_row[start:stop] = nodes
+
+    stats = np.zeros((plan.n_stat, 3))
+    slot = plan.stat_slot[nodes]
+    rows = np.flatnonzero(slot >= 0)
+    if len(rows):
+        s, v = slot[rows], yv[rows]
+        stats[:, 0] = np.bincount(s, minlength=plan.n_stat)
+        stats[:, 1] = np.bincount(s, weights=v, minlength=plan.n_stat)
+        stats[:, 2] = np.bincount(s, weights=v * v, minlength=plan.n_stat)
+
+    n_features, n_bins = chunk_codes.shape[0], plan.n_bins
+    hist_sum = np.zeros((plan.n_hist, n_features, n_bins))
+    hist_cnt = np.zeros((plan.n_hist, n_features, n_bins), dtype=np.int64)
+    slot = plan.hist_slot[nodes]
+    rows = np.flatnonzero(slot >= 0)
+    if len(rows):
+        base, v = slot[rows] * n_bins, yv[rows]
+        size = plan.n_hist * n_bins
+        for f in range(n_features):
+            key = base + chunk_codes[f, rows]
+            hist_sum[:, f, :] = np.bincount(key, weights=v, minlength=size).reshape(-1, n_bins)
+            hist_cnt[:, f, :] = np.bincount(key, minlength=size).reshape(-1, n_bins)
+    return stats, hist_sum, hist_cnt
+
+
+def _find_splits(
+    hist_sum: np.ndarray,
+    hist_cnt: np.ndarray,
+    node_stats: np.ndarray,
+    n_edges: np.ndarray,
+    min_samples_leaf: int,
+):
+    """Best (feature, bin) and left count per slot; feature is -1 when no split improves it."""
+    n_slots, n_features, n_bins = hist_sum.shape
+    best_feature = np.full(n_slots, -1, dtype=np.intp)
+    best_bin = np.zeros(n_slots, dtype=np.intp)
+    left_cnt = np.zeros(n_slots, dtype=np.int64)
+    splittable_bin = np.arange(n_bins)[None, :] < n_edges[:, None]  # last bin cannot split
+
+    for lo in range(0, n_slots, SPLIT_NODE_BLOCK):
+        hi = min(lo + SPLIT_NODE_BLOCK, n_slots)
+        cnt, tot, tot_sq = (node_stats[lo:hi, i][:, None, None] for i in range(3))
+        lc = np.cumsum(hist_cnt[lo:hi], axis=2)
+        ls = np.cumsum(hist_sum[lo:hi], axis=2)
+        rc, rs = cnt - lc, tot - ls
+        valid = (lc >= min_samples_leaf) & (rc >= min_samples_leaf) & splittable_bin[None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # Maximizing sum^2/n over both children minimizes the children's squared error.
+            proxy = np.where(valid, ls * ls / lc + rs * rs / rc, -np.inf)
+        flat = proxy.reshape(hi - lo, -1).argmax(axis=1)
+        f, b = np.divmod(flat, n_bins)
+        k = np.arange(hi - lo)
+        gain = proxy[k, f, b] - (tot * tot / cnt)[:, 0, 0]
+        ok = np.isfinite(gain) & (gain > 1e-12 * tot_sq[:, 0, 0])
+        best_feature[lo:hi] = np.where(ok, f, -1)
+        best_bin[lo:hi] = b
+        left_cnt[lo:hi] = lc[k, f, b]
+    return best_feature, best_bin, left_cnt
+
+
+class HistTree:
+    """Level-wise histogram regression tree with a DecisionTreeRegressor-like `tree_`."""
+
+    def __init__(
+        self,
+        max_depth: Optional[int] = None,
+        min_samples_leaf: int = 1,
+        max_bins: int = MAX_BINS,
+        chunk_rows: int = DEFAULT_CHUNK_ROWS,
+        random_state: Optional[int] = None,
+        n_jobs: int = 1,
+    ) -> None:
+        if not 2 <= max_bins <= MAX_BINS:
+            raise ValueError(f"max_bins must be in [2, {MAX_BINS}], got {max_bins}")
+        self.max_depth = max_depth
+        self.min_samples_leaf = max(1, min_samples_leaf)
+        self.max_bins = max_bins
+        self.chunk_rows = chunk_rows
+        self.random_state = random_state
+        self.n_jobs = n_jobs if n_jobs > 0 else (os.cpu_count() or 1)
+
+    def fit(self, X: np.ndarray, y: np.ndarray, spill_dir: str | Path | None = None) -> "HistTree":
+        """Fit from an (n_rows, n_features) matrix; see fit_columns."""
+        return self.fit_columns([X[:, j] for j in range(X.shape[1])], y, spill_dir=spill_dir)
+
+    def fit_columns(
+        self,
+        columns: Sequence[np.ndarray],
+        y: np.ndarray,
+        spill_dir: str | Path | None = None,
+    ) -> "HistTree":
+        """Fit from one 1D array per feature (e.g. np.load(..., mmap_mode="r") columns).
+
+        With `spill_dir`, scratch arrays are memory-mapped files in a temporary directory
+        under it instead of RAM. With `n_jobs > 1`, binning runs in threads and every level
+        pass is sharded by row chunk across worker processes that share the scratch arrays;
+        chunk results are summed in chunk order, so the tree is identical to a serial fit.
+        """
+        n_rows = len(y)
+        rng = np.random.default_rng(self.random_state)
+        with span("bin_edges"):
+            self.bin_edges_: List[np.ndarray] = [
+                compute_bin_edges(col, self.max_bins, rng=rng) for col in columns
+            ]
+        chunks = [
+            (start, min(start + self.chunk_rows, n_rows))
+            for start in range(0, n_rows, self.chunk_rows)
+        ]
+        shared = self.n_jobs > 1
+        with tempfile.TemporaryDirectory(dir=spill_dir) if spill_dir else nullcontext() as tmp:
+            scratch = {
+                "codes": ScratchArray(tmp, "codes", (len(columns), n_rows), np.uint8, shared),
+                "nodes": ScratchArray(tmp, "nodes", (n_rows,), np.int32, shared),
+            }
+            if shared:
+                scratch["y"] = ScratchArray(tmp, "y", (n_rows,), np.float64, shared)
+            try:
+                with span("bin"):
+                    self._bin(columns, scratch["codes"].array, chunks)
+                scratch["nodes"].array[:] = 0
+                if shared:
+                    for start, stop in chunks:
+                        scratch["y"].array[start:stop] = y[start:stop]
+                    self.tree_ = self._grow_parallel(scratch, chunks, n_rows)
+                else:
+                    codes, nodes = scratch["codes"].array, scratch["nodes"].array
+                    self.tree_ = self._grow(
+                        n_rows,
+                        lambda plan: _reduce_passes(
+                            _level_pass(codes, y, nodes, start, stop, plan) for start, stop in chunks
+                        ),
+                    )
+                    del codes, nodes
+            finally:
+                for arr in scratch.values():
+                    arr.release()
+        return self
+
+    def _bin(self, columns: Sequence[np.ndarray], codes: np.ndarray, chunks) -> None:
+        def bin_chunk(task):
+            f, (start, stop) = task
+            codes[f, start:stop] = bin_column(columns[f][start:stop], self.bin_edges_[f])
+
+        tasks = [(f, chunk) for f in range(len(columns)) for chunk in chunks]
+        if self.n_jobs > 1:
+            # searchsorted releases the GIL, so threads are enough to bin columns in parallel.
+            with ThreadPoolExecutor(self.n_jobs) as ex:
+                list(ex.map(bin_chunk, tasks))
+        else:
+            for task in tasks:
+                bin_chunk(task)
+
+    def _grow_parallel(self, scratch: Dict[str, "ScratchArray"], chunks, n_rows: int) -> TreeArrays:
+        handles = tuple(scratch[k].handle() for k in ("codes", "y", "nodes"))
+        # With spill files no block exists yet, but the workers attach each level's plan block.
+        start_resource_tracker()
+        with mp.get_context().Pool(self.n_jobs, initializer=_init_worker, initargs=handles) as pool:
+
+            def run_level(plan: _LevelPlan):
+                # Plan arrays go to the workers through shared memory, once per level.
+                packed = ScratchArray(None, "plan", (5, len(plan.split_bin)), np.intp, shared=True)
+                packed.array[:] = [
+                    plan.split_feature, plan.split_bin, plan.left_of, plan.stat_slot, plan.hist_slot
+                ]
+                tasks = [
+                    (packed.handle(), plan.n_stat, plan.n_hist, plan.n_bins, start, stop)
+                    for start, stop in chunks
+                ]
+                try:
+                    return _reduce_passes(pool.imap(_worker_level_pass, tasks))
+                finally:
+                    packed.release()
+
+            return self._grow(n_rows, run_level)
+
+    def _grow(self, n_rows: int, run_level: Callable[[_LevelPlan], tuple]) -> TreeArrays:
+        """Grow the tree; `run_level(plan)` makes one pass and returns summed level results."""
+        n_edges = np.array([len(e) for e in self.bin_edges_])
+        n_bins = int(n_edges.max()) + 1 if len(n_edges) else 1
+        max_depth = self.max_depth if self.max_depth is not None else np.iinfo(np.int32).max
+        msl = self.min_samples_leaf
+
+        left: List[int] = [-1]
+        feature: List[int] = [-2]
+        threshold: List[float] = [-2.0]
+        stats = np.zeros((1, 3))
+        depth = 0
+
+        # Root: totals for node 0 plus its histograms when it may split.
+        frontier = np.array([0]) if (max_depth > 0 and n_rows >= 2 * msl) else np.array([], int)
+        plan = _LevelPlan(
+            split_feature=np.zeros(1, dtype=np.intp),
+            split_bin=np.full(1, -1, dtype=np.intp),
+            left_of=np.zeros(1, dtype=np.intp),
+            stat_slot=np.zeros(1, dtype=np.intp),
+            hist_slot=np.array([0 if len(frontier) else -1], dtype=np.intp),
+            n_stat=1,
+            n_hist=len(frontier),
+            n_bins=n_bins,
+        )
+        level_stats, hist_sum, hist_cnt = run_level(plan)
+        stats[0] = level_stats[0]
+
+        while len(frontier):
+            best_f, best_b, l_cnt = _find_splits(
+                hist_sum, hist_cnt, stats[frontier], n_edges, msl
+            )
+            split = best_f >= 0
+            parents = frontier[split]
+            if not len(parents):
+                break
+
+            n_nodes = len(left)
+            split_f, split_b = best_f[split], best_b[split]
+            first_child = n_nodes + 2 * np.arange(len(parents))
+            children = np.stack([first_child, first_child + 1], axis=1).reshape(-1)
+            for p, f, b, c in zip(
+                parents.tolist(), split_f.tolist(), split_b.tolist(), first_child.tolist()
+            ):
+                left[p] = c
+                feature[p] = f
+                threshold[p] = float(self.bin_edges_[f][b])
+            left.extend([-1] * len(children))
+            feature.extend([-2] * len(children))
+            threshold.extend([-2.0] * len(children))
+            n_total = len(left)
+
+            # Children counts are known from the split histograms, so the next frontier is
+            # chosen before the pass that routes rows into the children.
+            pair_cnt = np.stack([l_cnt[split], stats[parents, 0] - l_cnt[split]], axis=1)
+            depth += 1
+            if depth < max_depth:
+                next_frontier = children[pair_cnt.reshape(-1) >= 2 * msl]
+            else:
+                next_frontier = children[:0]
+
+            # Histogram subtraction: the pass only histograms the smaller child of each split
+            # that has a child in the next frontier; the sibling is the parent minus that child.
+            needed = np.isin(children, next_frontier).reshape(-1, 2).any(axis=1)
+            right_smaller = pair_cnt[:, 1] < pair_cnt[:, 0]
+            built = (first_child + right_smaller)[needed]
+            sibling = (first_child + ~right_smaller)[needed]
+
+            plan = _LevelPlan(
+                split_feature=np.zeros(n_total, dtype=np.intp),
+                split_bin=np.full(n_total, -1, dtype=np.intp),
+                left_of=np.zeros(n_total, dtype=np.intp),
+                stat_slot=np.full(n_total, -1, dtype=np.intp),
+                hist_slot=np.full(n_total, -1, dtype=np.intp),
+                n_stat=len(children),
+                n_hist=len(built),
+                n_bins=n_bins,
+            )
+            plan.split_feature[parents] = split_f
+            plan.split_bin[parents] = split_b
+            plan.left_of[parents] = first_child
+            plan.stat_slot[children] = np.arange(len(children))
+            plan.hist_slot[built] = np.arange(len(built))
+            level_stats, built_sum, built_cnt = run_level(plan)
+            stats = np.concatenate([stats, level_stats])
+
+            parent_slot = np.flatnonzero(split)[needed]
+            hist_nodes = np.concatenate([built, sibling])
+            hist_sum = np.concatenate([built_sum, hist_sum[parent_slot] - built_sum])
+            hist_cnt = np.concatenate([built_cnt, hist_cnt[parent_slot] - built_cnt])
+            order = np.argsort(hist_nodes)
+            keep = order[np.searchsorted(hist_nodes[order], next_frontier)]
+            hist_sum, hist_cnt = hist_sum[keep], hist_cnt[keep]
+            frontier = next_frontier
+
+        left_arr = np.array(left, dtype=np.intp)
+        right_arr = np.where(left_arr >= 0, left_arr + 1, -1)
+        cnt = stats[:, 0]
+        mean = stats[:, 1] / cnt
+        return TreeArrays(
+            children_left=left_arr,
+            children_right=right_arr,
+            feature=np.array(feature, dtype=np.intp),
+            threshold=np.array(threshold, dtype=np.float64),
+            value=mean.reshape(-1, 1, 1),
+            impurity=np.maximum(stats[:, 2] / cnt - mean * mean, 0.0),
+            n_node_samples=cnt.astype(np.intp),
+        )
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return TreePredictor.from_tree(self).predict(X)
+
+
+def _reduce_passes(results: Iterable[tuple]) -> tuple:
+    stats = hist_sum = hist_cnt = None
+    for s, hs, hc in results:
+        if stats is None:
+            stats, hist_sum, hist_cnt = s, hs, hc
+        else:
+            stats += s
+            hist_sum += hs
+            hist_cnt += hc
+    return stats, hist_sum, hist_cnt
+
+
+_WORKER: Dict[str, Any] = {}
+
+
+def _init_worker(codes_handle: tuple, y_handle: tuple, nodes_handle: tuple) -> None:
+    for key, handle in (("codes", codes_handle), ("y", y_handle), ("nodes", nodes_handle)):
+        _WORKER[key], _WORKER[f"{key}_shm"] = open_scratch(handle)
+
+
+def _worker_level_pass(task: tuple):
+    handle, n_stat, n_hist, n_bins, start, stop = task
+    if _WORKER.get("plan_handle") != handle:
+        _WORKER.pop("plan", None)
+        old = _WORKER.pop("plan_shm", None)
+        if old is not None:
+            old.close()
+        _WORKER["plan"], _WORKER["plan_shm"] = open_scratch(handle)
+        _WORKER["plan_handle"] = handle
+    plan = _LevelPlan(*_WORKER["plan"], n_stat=n_stat, n_hist=n_hist, n_bins=n_bins)
+    return _level_pass(_WORKER["codes"], _WORKER["y"], _WORKER["nodes"], start, stop, plan)
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Batch prediction runtime for the exported regression tree (no sklearn required).
+
+The tree in model/tree.json is loaded into flat NumPy arrays (feature index, threshold,
+children, value) and rows are scored with level-synchronous traversal: every row in a chunk
+advances one level per step, so the Python loop runs `depth` times per chunk instead of once
+per row. Leaves point to themselves, which lets rows that finish early keep "walking" in place
+without any masking.
+
+A row goes left when `float32(x) <= threshold`. NaN fails that test and goes right, as in the
+generated predictors (tree_codegen.py), the web viewer and the hist engine's binning.
+
+Usage:
+  python scripts/predict_tree.py --data data/california_housing_test.csv
+  python scripts/predict_tree.py --model model/tree.json --data big.csv --out preds.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from table_io import read_table
+from tree_binary import read_tree_binary
+
+DEFAULT_CHUNK_ROWS = 1 << 13  # small enough that per-level temporaries stay in cache
+
+
+class TreePredictor:
+    """Regression tree stored as parallel arrays, scored without a per-row Python loop.
+
+    `children` has shape (n_nodes, 2) holding the left/right child of each node; leaves
+    reference themselves on both sides and carry an infinite threshold.
+    """
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        value: np.ndarray,
+        root: int = 0,
+        feature_names: Optional[List[str]] = None,
+    ) -> None:
+        n_nodes = len(value)
+        ids = np.arange(n_nodes, dtype=np.intp)
+        left = np.asarray(left, dtype=np.intp)
+        right = np.asarray(right, dtype=np.intp)
+        is_leaf = (left < 0) | (left == right)
+
+        self.is_leaf = is_leaf
+        self.feature = np.where(is_leaf, 0, np.asarray(feature, dtype=np.intp))
+        self.threshold = np.where(is_leaf, np.inf, np.asarray(threshold, dtype=np.float64))
+        self.children = np.empty((n_nodes, 2), dtype=np.intp)
+        self.children[:, 0] = np.where(is_leaf, ids, left)
+        self.children[:, 1] = np.where(is_leaf, ids, right)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.root = int(root)
+        self.feature_names = feature_names
+        self.n_features = int(self.feature.max()) + 1 if n_nodes else 0
+        if feature_names is not None:
+            self.n_features = max(self.n_features, len(feature_names))
+        self.depth = _tree_depth(self.children, is_leaf, self.root)
+
+    @property
+    def node_count(self) -> int:
+        return len(self.value)
+
+    @classmethod
+    def from_dict(
+        cls, tree_json: Dict[str, Any], feature_names: Optional[List[str]] = None
+    ) -> "TreePredictor":
+        """Build from a tree.json dict in either the per-node or the columnar layout."""
+        if tree_json.get("format") == "columnar":
+            return cls(
+                tree_json["feature"],
+                tree_json["threshold"],
+                tree_json["left"],
+                tree_json["right"],
+                tree_json["value"],
+                tree_json["root"],
+                feature_names or tree_json["featureNames"],
+            )
+        nodes = tree_json["nodes"]
+        n_nodes = len(nodes)
+        feature = np.zeros(n_nodes, dtype=np.intp)
+        threshold = np.zeros(n_nodes, dtype=np.float64)
+        left = np.full(n_nodes, -1, dtype=np.intp)
+        right = np.full(n_nodes, -1, dtype=np.intp)
+        value = np.zeros(n_nodes, dtype=np.float64)
+        names: Dict[int, str] = {}
+        for n in nodes:
+            i = n["id"]
+            value[i] = n["value"]
+            if not n["isLeaf"]:
+                feature[i] = n["featureIndex"]
+                threshold[i] = n["threshold"]
+                left[i] = n["left"]
+                right[i] = n["right"]
+                names[n["featureIndex"]] = n["feature"]
+        if feature_names is None and names and len(names) == max(names) + 1:
+            feature_names = [names[i] for i in range(len(names))]
+        return cls(feature, threshold, left, right, value, tree_json["root"], feature_names)
+
+    @classmethod
+    def from_tree(cls, tree: Any, feature_names: Optional[List[str]] = None) -> "TreePredictor":
+        """Build from a fitted DecisionTreeRegressor or HistTree (anything with a `tree_`)."""
+        t = tree.tree_
+        return cls(
+            t.feature,
+            t.threshold,
+            t.children_left,
+            t.children_right,
+            t.value[:, 0, 0],
+            feature_names=feature_names,
+        )
+
+    @classmethod
+    def load(cls, path: str | Path, meta_path: str | Path | None = None) -> "TreePredictor":
+        """Load tree.bin or tree.json, chosen by file suffix."""
+        if str(path).endswith(".bin"):
+            return cls.from_binary(path, meta_path)
+        return cls.from_json(path, meta_path)
+
+    @classmethod
+    def from_json(cls, path: str | Path, meta_path: str | Path | None = None) -> "TreePredictor":
+        """Load tree.json; feature names come from meta.json next to it when available."""
+        feature_names = _meta_feature_names(Path(path), meta_path)
+        return cls.from_dict(json.loads(Path(path).read_text()), feature_names)
+
+    @classmethod
+    def from_binary(cls, path: str | Path, meta_path: str | Path | None = None) -> "TreePredictor":
+        """Load the tree.bin written alongside tree.json."""
+        feature_names = _meta_feature_names(Path(path), meta_path)
+        cols = read_tree_binary(path)
+        return cls(
+            cols["feature"],
+            cols["threshold"],
+            cols["left"],
+            cols["right"],
+            cols["value"],
+            cols["root"],
+            feature_names,
+        )
+
+    def _as_matrix(self, X: Any) -> np.ndarray:
+        if isinstance(X, pd.DataFrame):
+            if self.feature_names is None:
+                raise ValueError("Feature names are unknown; pass a NumPy matrix in column order")
+            X = X[self.feature_names].to_numpy(dtype=np.float32)
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] < self.n_features:
+            raise ValueError(f"Expected a 2D matrix with {self.n_features} columns, got {X.shape}")
+        return np.ascontiguousarray(X)
+
+    def apply(self, X: Any, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> np.ndarray:
+        """Return the leaf id reached by every row of X."""
+        X = self._as_matrix(X)
+        n_rows, n_cols = X.shape
+        leaves = np.empty(n_rows, dtype=np.intp)
+        flat_x = X.reshape(-1)
+        flat_children = self.children.reshape(-1)
+        for start in range(0, n_rows, chunk_rows):
+            stop = min(start + chunk_rows, n_rows)
+            row_offsets = np.arange(start, stop, dtype=np.intp) * n_cols
+            node = np.full(stop - start, self.root, dtype=np.intp)
+            for _ in range(self.depth):
+                # Not `x > t`: NaN must go right, like everywhere else.
+                go_right = ~(flat_x[row_offsets + self.feature[node]] <= self.threshold[node])
+                node = flat_children[2 * node + go_right]
+            leaves[start:stop] = node
+        return leaves
+
+    def predict(self, X: Any, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> np.ndarray:
+        """Return the predicted target value for every row of X."""
+        return self.value[self.apply(X, chunk_rows=chunk_rows)]
+
+    def parents(self) -> np.ndarray:
+        """Parent id of every node (-1 for the root)."""
+        parent = np.full(self.node_count, -1, dtype=np.intp)
+        internal = np.flatnonzero(~self.is_leaf)
+        parent[self.children[internal, 0]] = internal
+        parent[self.children[internal, 1]] = internal
+        return parent
+
+    def path_codes(self, nodes: Any) -> List[str]:
+        """Root-to-node branch decisions per node id: a string of '0' (left) / '1' (right)."""
+        parent = self.parents()
+        codes = []
+        for node in np.asarray(nodes, dtype=np.intp):
+            bits = []
+            while parent[node] >= 0:
+                bits.append("1" if self.children[parent[node], 1] == node else "0")
+                node = parent[node]
+            codes.append("".join(reversed(bits)))
+        return codes
+
+
+def _meta_feature_names(model_path: Path, meta_path: str | Path | None) -> Optional[List[str]]:
+    if meta_path is None and (model_path.parent / "meta.json").exists():
+        meta_path = model_path.parent / "meta.json"
+    if meta_path is None:
+        return None
+    return json.loads(Path(meta_path).read_text())["featureNames"]
+
+
+def _tree_depth(children: np.ndarray, is_leaf: np.ndarray, root: int) -> int:
+    depth = 0
+    frontier = np.array([root], dtype=np.intp)
+    frontier = frontier[~is_leaf[frontier]]
+    while len(frontier):
+        depth += 1
+        frontier = children[frontier].reshape(-1)
+        frontier = frontier[~is_leaf[frontier]]
+    return depth
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score rows with an exported tree.json")
+    parser.add_argument(
+        "--model", type=str, default="model/tree.json", help="Path to tree.json or tree.bin"
+    )
+    parser.add_argument(
+        "--meta", type=str, default=None, help="Path to meta.json (default: next to the model)"
+    )
+    parser.add_argument(
+        "--data",
+        type=str,
+        required=True,
+        help="Table with feature columns (.csv, .parquet, .feather or .npz)",
+    )
+    parser.add_argument("--out", type=str, default=None, help="Write predictions to this CSV")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+
+    predictor = TreePredictor.load(args.model, args.meta)
+    df = read_table(args.data)
+    pred = predictor.predict(df, chunk_rows=args.chunk_rows)
+
+    if args.out:
+        pd.DataFrame({"prediction": pred}).to_csv(args.out, index=False)
+        print(f"Wrote {len(pred)} predictions to {args.out}")
+    else:
+        print(f"Scored {len(pred)} rows; mean prediction {pred.mean():.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,19 +3,25 @@
 Prepare California Housing regression dataset for interactive visualization.
 
 Features:
-- Fetches dataset via sklearn (as pandas DataFrame)
-- Stratified shuffle split using binned target to preserve distribution
+- Fetches dataset via sklearn (as pandas DataFrame) once, then loads it from a local
+  content-addressed cache of memory-mapped columns (see dataset_cache.py); --offline never downloads
+- Stratified shuffle split using binned target to preserve distribution (--split index: an
+  index-only split that gathers the selected rows straight from the cached columns)
 - Allows fixed train/test sizes (small test for viz), reproducible with seed
-- Writes CSVs to data/ directory
+- Writes CSVs to data/ directory (or Parquet / Feather / NPZ with --format, see table_io.py)
+- With --stage-cache, reuses the outputs of an earlier run with the same source data and flags
 
 Usage (defaults: train=3000, test=300):
   python scripts/prepare_data.py
   python scripts/prepare_data.py --train-size 5000 --test-size 500 --random-state 7
+  python scripts/prepare_data.py --offline --data-home /mnt/cache/regression-tree
+  python scripts/prepare_data.py --n-splits 50 --jobs 0   # data/splits.npz, seeds 42..91
 """
 
 from __future__ import annotations
 
 import argparse
+import multiprocessing as mp
 from pathlib import Path
 
 import numpy as np
@@ -23,23 +29,198 @@ import pandas as pd
 from sklearn.datasets import fetch_california_housing
 from sklearn.model_selection import StratifiedShuffleSplit
 
+from dataset_cache import (
+    CacheMissError,
+    default_data_home,
+    load_frame,
+    manifest_digest,
+    offline_from_env,
+    read_manifest,
+    store_frame,
+)
+from profiling import add_profile_args, configure_from_args, span
+from quantile_sketch import sketch_columns
+from scratch_arrays import ScratchArray, open_scratch
+from stage_cache import DEFAULT_BUDGET_MB, StageCache, default_stage_cache, stage_key
+from table_io import TABLE_SUFFIXES, write_table
+
+DATASET_NAME = "california_housing"
+SPLITS_FILE = "splits.npz"
+
+
+def load_california_housing(
+    data_home: str | Path | None = None,
+    offline: bool | None = None,
+    verify: bool = True,
+) -> pd.DataFrame:
+    """Load the dataset from the local cache, fetching and caching it on first use.
+
+    `offline` (default: REGTREE_OFFLINE) forbids downloading: only the cache and sklearn's
+    own on-disk copy under the data home are tried, and CacheMissError is raised otherwise.
+    """
+    home = Path(data_home) if data_home is not None else default_data_home()
+    if offline is None:
+        offline = offline_from_env()
+
+    df = load_frame(home, DATASET_NAME, verify=verify)
+    if df is not None:
+        return df
 
-def load_california_housing() -> pd.DataFrame:
-    data = fetch_california_housing(as_frame=True)
-    df: pd.DataFrame = data.frame.copy()
+    try:
+        data = fetch_california_housing(
+            as_frame=True, data_home=str(home / "sklearn"), download_if_missing=not offline
+        )
+    except OSError as exc:
+        if offline:
+            raise CacheMissError(
+                f"{DATASET_NAME} is not cached under {home} and --offline forbids downloading"
+            ) from exc
+        raise
     # Keep column names as-is; target is 'MedHouseVal'
-    return df
+    store_frame(home, DATASET_NAME, data.frame)
+    return load_frame(home, DATASET_NAME, verify=False)
 
 
-def make_stratify_bins(y: pd.Series, n_bins: int = 10) -> np.ndarray:
+def make_stratify_bins(y: pd.Series | np.ndarray, n_bins: int = 10, sketch_k: int = 0) -> np.ndarray:
     """Bin continuous target into quantiles for stratification.
 
     Handles duplicate edges by dropping and using resulting number of bins.
-    Returns integer bin codes suitable for stratify parameter.
+    Returns integer bin codes suitable for stratify parameter (the same codes as
+    pd.qcut(y, n_bins, duplicates="drop"), without building a Categorical).
+    With `sketch_k`, the bin edges come from a KLL sketch streamed over the target in chunks
+    (see quantile_sketch.py) instead of an exact quantile pass.
+    """
+    values = np.asarray(y)
+    levels = np.linspace(0.0, 1.0, n_bins + 1)
+    with span("bin", sketch_k=sketch_k):
+        if sketch_k:
+            edges = sketch_columns({"y": values}, k=sketch_k)["y"].quantiles(levels)
+        else:
+            edges = np.quantile(values, levels)
+        edges = np.unique(edges)
+        # qcut bins are right-closed with the lowest edge included in the first bin.
+        return np.searchsorted(edges[1:-1], values, side="left")
+
+
+def _allocate(counts: np.ndarray, total: int, capacity: np.ndarray) -> np.ndarray:
+    """Split `total` across strata in proportion to `counts` (largest remainder), within `capacity`."""
+    share = counts * (total / counts.sum())
+    quota = np.minimum(np.floor(share).astype(np.int64), capacity)
+    remainder = share - quota
+    while quota.sum() < total:
+        open_bins = quota < capacity
+        if not open_bins.any():
+            raise ValueError(f"Cannot place {total} rows in strata of sizes {capacity.tolist()}")
+        order = np.argsort(-np.where(open_bins, remainder, -np.inf), kind="stable")
+        take = order[: min(total - int(quota.sum()), int(open_bins.sum()))]
+        quota[take] += 1
+        remainder[take] -= 1
+    return quota
+
+
+def stratified_split_indices(
+    codes: np.ndarray, train_size: int, test_size: int, random_state: int = 42
+) -> tuple[np.ndarray, np.ndarray]:
+    """Row indices of a stratified train/test split with exact sizes, without touching the data.
+
+    Each stratum gets train and test quotas proportional to its size (largest remainder, so
+    the totals are exact). Rows are drawn without replacement inside each stratum, and both
+    index arrays are shuffled so strata are interleaved.
+    """
+    assert train_size > 0 and test_size > 0, "train_size and test_size must be > 0"
+    assert train_size + test_size <= len(codes), (
+        f"Requested sizes exceed dataset: {train_size + test_size} > {len(codes)}"
+    )
+    rng = np.random.default_rng(random_state)
+    counts = np.bincount(codes)
+    train_quota = _allocate(counts, train_size, counts)
+    test_quota = _allocate(counts, test_size, counts - train_quota)
+    train_parts, test_parts = [], []
+    for code in np.flatnonzero(counts):
+        rows = np.flatnonzero(codes == code)
+        picked = rows[rng.choice(len(rows), train_quota[code] + test_quota[code], replace=False)]
+        train_parts.append(picked[: train_quota[code]])
+        test_parts.append(picked[train_quota[code] :])
+    return rng.permutation(np.concatenate(train_parts)), rng.permutation(np.concatenate(test_parts))
+
+
+def stratified_kfold_indices(
+    codes: np.ndarray, n_folds: int, random_state: int = 42
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """(train, test) row indices of a stratified k-fold split over bin `codes`.
+
+    Rows of each stratum are shuffled and dealt round-robin to the folds, continuing from where
+    the previous stratum stopped, so fold sizes differ by at most one row overall.
+    """
+    assert 2 <= n_folds <= len(codes), f"n_folds must be in [2, {len(codes)}], got {n_folds}"
+    rng = np.random.default_rng(random_state)
+    fold_of_row = np.empty(len(codes), dtype=np.int32)
+    dealt = 0
+    for code in np.unique(codes):
+        rows = rng.permutation(np.flatnonzero(codes == code))
+        fold_of_row[rows] = (np.arange(len(rows)) + dealt) % n_folds
+        dealt += len(rows)
+    return [
+        (np.flatnonzero(fold_of_row != fold), np.flatnonzero(fold_of_row == fold))
+        for fold in range(n_folds)
+    ]
+
+
+_WORKER: dict = {}
+
+
+def _init_split_worker(codes_handle: tuple) -> None:
+    _WORKER["codes"], _WORKER["codes_shm"] = open_scratch(codes_handle)
+
+
+def _split_task(task: tuple[int, int, int]) -> tuple[np.ndarray, np.ndarray]:
+    train_size, test_size, random_state = task
+    return stratified_split_indices(_WORKER["codes"], train_size, test_size, random_state)
+
+
+def repeated_split_indices(
+    codes: np.ndarray,
+    train_size: int,
+    test_size: int,
+    seeds: list[int],
+    n_jobs: int = 1,
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """One stratified_split_indices() per seed over the same bin codes.
+
+    With `n_jobs` != 1 the seeds are spread over a process pool that reads the codes from
+    shared memory (0 = all cores); results do not depend on `n_jobs`.
+    """
+    if n_jobs == 1:
+        return [stratified_split_indices(codes, train_size, test_size, s) for s in seeds]
+    shared = ScratchArray(None, "codes", codes.shape, codes.dtype, shared=True)
+    shared.array[...] = codes
+    try:
+        tasks = [(train_size, test_size, s) for s in seeds]
+        with mp.get_context().Pool(n_jobs or None, _init_split_worker, (shared.handle(),)) as pool:
+            return pool.map(_split_task, tasks, chunksize=1)
+    finally:
+        shared.release()
+
+
+def write_split_indices(
+    splits: list[tuple[np.ndarray, np.ndarray]], path: Path, n_rows: int, **info
+) -> None:
+    """Save splits as one .npz of train_000/test_000, ... row-index arrays (int32 when possible).
+
+    Extra keyword arguments are stored as scalar or 1-d arrays next to the indices.
     """
-    # Use qcut to create (approx) equal-frequency bins
-    binned = pd.qcut(y, q=n_bins, duplicates="drop")
-    return binned.astype("category").cat.codes.to_numpy()
+    dtype = np.int32 if n_rows <= np.iinfo(np.int32).max else np.int64
+    arrays = {}
+    for i, (train_idx, test_idx) in enumerate(splits):
+        arrays[f"train_{i:03d}"] = train_idx.astype(dtype)
+        arrays[f"test_{i:03d}"] = test_idx.astype(dtype)
+    arrays.update({key: np.asarray(value) for key, value in info.items()})
+    np.savez(path, nRows=np.int64(n_rows), **arrays)
+
+
+def gather_rows(df: pd.DataFrame, idx: np.ndarray, columns: list[str]) -> pd.DataFrame:
+    """Copy only the rows `idx` of `columns`, gathering from each (possibly memory-mapped) column."""
+    return pd.DataFrame({c: df[c].to_numpy()[idx] for c in columns}, copy=False)
 
 
 def stratified_fixed_sizes(
@@ -49,6 +230,7 @@ def stratified_fixed_sizes(
     test_size: int,
     random_state: int = 42,
     n_bins: int = 10,
+    sketch_k: int = 0,
 ) -> tuple[pd.DataFrame, pd.DataFrame]:
     """Return train/test DataFrames with fixed row counts using stratified shuffle.
 
@@ -60,7 +242,7 @@ def stratified_fixed_sizes(
         f"Requested sizes exceed dataset: {train_size + test_size} > {n_total}"
     )
 
-    stratify_bins = make_stratify_bins(y, n_bins=n_bins)
+    stratify_bins = make_stratify_bins(y, n_bins=n_bins, sketch_k=sketch_k)
 
     train_prop = train_size / n_total
     test_prop = test_size / n_total
@@ -97,42 +279,212 @@ def main():
     parser.add_argument("--test-size", type=int, default=300, help="Number of test rows")
     parser.add_argument("--random-state", type=int, default=42, help="Random seed")
     parser.add_argument("--bins", type=int, default=10, help="Number of quantile bins for stratification")
+    parser.add_argument(
+        "--split",
+        choices=["sklearn", "index"],
+        default="sklearn",
+        help="Split implementation: sklearn's StratifiedShuffleSplit on DataFrame copies, or an "
+        "index-only split that gathers rows straight from the source columns",
+    )
+    many = parser.add_mutually_exclusive_group()
+    many.add_argument(
+        "--n-splits",
+        type=int,
+        default=0,
+        help="Write this many index splits (seeds random-state, random-state+1, ...) "
+        f"to <out-dir>/{SPLITS_FILE} in one run",
+    )
+    many.add_argument(
+        "--folds",
+        type=int,
+        default=0,
+        help=f"Write a stratified k-fold split with this many folds to <out-dir>/{SPLITS_FILE}",
+    )
+    parser.add_argument(
+        "--split-tables",
+        action="store_true",
+        help="With --n-splits/--folds, also write the train/test tables of every split",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for --n-splits (0 = all cores); not valid with --folds",
+    )
+    parser.add_argument(
+        "--sketch-k",
+        type=int,
+        default=0,
+        help="Compute stratification bin edges with a KLL sketch of this size (0 = exact qcut)",
+    )
     parser.add_argument(
         "--out-dir", type=str, default="data", help="Output directory for CSV files"
     )
+    parser.add_argument(
+        "--format",
+        choices=sorted(TABLE_SUFFIXES),
+        default="csv",
+        help="Output file format (the web client reads CSV)",
+    )
+    parser.add_argument(
+        "--data-home",
+        type=str,
+        default=None,
+        help="Dataset cache directory (default: $REGTREE_DATA_HOME or ~/.cache/regression-tree)",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        default=None,
+        help="Never download; fail fast if the dataset is not cached (also: REGTREE_OFFLINE=1)",
+    )
+    parser.add_argument(
+        "--no-verify",
+        dest="verify",
+        action="store_false",
+        help="Skip SHA-256 verification of cached columns",
+    )
+    parser.add_argument(
+        "--stage-cache",
+        type=str,
+        default=default_stage_cache(),
+        help="Stage output cache directory; skip the run when nothing changed "
+        "(default: $REGTREE_STAGE_CACHE, unset = disabled)",
+    )
+    parser.add_argument(
+        "--cache-budget-mb",
+        type=int,
+        default=DEFAULT_BUDGET_MB,
+        help="Stage cache size limit; least recently used entries are evicted",
+    )
+    add_profile_args(parser)
     args = parser.parse_args()
+    if args.jobs != 1 and not args.n_splits:
+        parser.error("--jobs only applies to --n-splits (--folds and single splits run serially)")
+    if args.split_tables and not (args.n_splits or args.folds):
+        parser.error("--split-tables requires --n-splits or --folds")
+
+    out_dir = Path(args.out_dir)
+    profiler = configure_from_args(args, out_dir)
+    data_home = Path(args.data_home) if args.data_home else default_data_home()
+    cache_params = {
+        "train_size": args.train_size,
+        "test_size": args.test_size,
+        "random_state": args.random_state,
+        "bins": args.bins,
+        "sketch_k": args.sketch_k,
+        "split": args.split,
+        "n_splits": args.n_splits,
+        "folds": args.folds,
+        "split_tables": args.split_tables,
+        "format": args.format,
+    }
+
+    def source_key() -> str | None:
+        # The manifest lists every column's digest, so the key needs no column reads.
+        manifest = read_manifest(data_home, DATASET_NAME)
+        if manifest is None:
+            return None
+        return stage_key("prepare", cache_params, {"source": manifest_digest(manifest)})
+
+    stage_cache = None
+    if args.stage_cache:
+        stage_cache = StageCache(args.stage_cache, args.cache_budget_mb)
+        # Try the cache before loading: a hit skips reading and verifying the columns.
+        cache_key = source_key()
+        with span("restore"):
+            restored = stage_cache.restore(cache_key, out_dir) if cache_key else None
+        if restored is not None:
+            print(f"Inputs unchanged; restored {', '.join(str(p) for p in restored)} from cache.")
+            profiler.report()
+            return
+
+    try:
+        with span("load"):
+            df = load_california_housing(data_home, offline=args.offline, verify=args.verify)
+    except CacheMissError as exc:
+        raise SystemExit(str(exc))
+    if stage_cache is not None:
+        # Loading may have fetched the dataset or replaced corrupt columns.
+        cache_key = source_key()
 
-    df = load_california_housing()
     feature_cols = [c for c in df.columns if c != "MedHouseVal"]
     target = df["MedHouseVal"]
     features = df[feature_cols]
 
-    if args.train_size + args.test_size > len(df):
+    if not args.folds and args.train_size + args.test_size > len(df):
         raise SystemExit(
             f"Requested train+test = {args.train_size + args.test_size} exceeds dataset size {len(df)}"
         )
 
-    train_df, test_df = stratified_fixed_sizes(
-        X=features,
-        y=target,
-        train_size=args.train_size,
-        test_size=args.test_size,
-        random_state=args.random_state,
-        n_bins=args.bins,
-    )
+    if args.n_splits or args.folds:
+        # Bin codes are computed once and shared by every split.
+        codes = make_stratify_bins(target, n_bins=args.bins, sketch_k=args.sketch_k)
+        codes = codes.astype(np.min_scalar_type(int(codes.max())))
+        with span("split", kind="folds" if args.folds else "seeds"):
+            if args.folds:
+                splits = stratified_kfold_indices(codes, args.folds, random_state=args.random_state)
+                info = {"kind": "folds", "seeds": [args.random_state]}
+            else:
+                seeds = [args.random_state + i for i in range(args.n_splits)]
+                splits = repeated_split_indices(
+                    codes, args.train_size, args.test_size, seeds, n_jobs=args.jobs
+                )
+                info = {"kind": "seeds", "seeds": seeds}
+        out_dir.mkdir(parents=True, exist_ok=True)
+        outputs = [out_dir / SPLITS_FILE]
+        with span("write"):
+            write_split_indices(splits, outputs[0], len(df), **info)
+            if args.split_tables:
+                suffix = TABLE_SUFFIXES[args.format]
+                columns = feature_cols + ["MedHouseVal"]
+                for i, (train_idx, test_idx) in enumerate(splits):
+                    for part, idx in (("train", train_idx), ("test", test_idx)):
+                        path = out_dir / f"california_housing_{part}_{i:03d}{suffix}"
+                        write_table(gather_rows(df, idx, columns), path, args.format)
+                        outputs.append(path)
+        if stage_cache is not None:
+            stage_cache.store(cache_key, "prepare", cache_params, outputs)
+        print(f"Wrote {len(splits)} splits ({info['kind']}) to {outputs[0]}.")
+        profiler.report()
+        return
+
+    with span("split", method=args.split):
+        if args.split == "index":
+            codes = make_stratify_bins(target, n_bins=args.bins, sketch_k=args.sketch_k)
+            train_idx, test_idx = stratified_split_indices(
+                codes, args.train_size, args.test_size, random_state=args.random_state
+            )
+            columns = feature_cols + ["MedHouseVal"]
+            train_df = gather_rows(df, train_idx, columns)
+            test_df = gather_rows(df, test_idx, columns)
+        else:
+            train_df, test_df = stratified_fixed_sizes(
+                X=features,
+                y=target,
+                train_size=args.train_size,
+                test_size=args.test_size,
+                random_state=args.random_state,
+                n_bins=args.bins,
+                sketch_k=args.sketch_k,
+            )
 
-    out_dir = Path(args.out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
 
-    train_path = out_dir / "california_housing_train.csv"
-    test_path = out_dir / "california_housing_test.csv"
+    suffix = TABLE_SUFFIXES[args.format]
+    train_path = out_dir / f"california_housing_train{suffix}"
+    test_path = out_dir / f"california_housing_test{suffix}"
 
-    train_df.to_csv(train_path, index=False)
-    test_df.to_csv(test_path, index=False)
+    with span("write", format=args.format):
+        write_table(train_df, train_path, args.format)
+        write_table(test_df, test_path, args.format)
+    if stage_cache is not None:
+        stage_cache.store(cache_key, "prepare", cache_params, [train_path, test_path])
 
     print(
         f"Wrote {len(train_df)} rows to {train_path} and {len(test_df)} rows to {test_path}."
     )
+    profiler.report()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+"""
+Lightweight stage instrumentation for the pipeline scripts.
+
+Code marks stages with `with span("fit"):`. Spans nest, and each one records its wall time and
+CPU time. When profiling is enabled (`--profile`), each span also records the tracemalloc peak
+reached inside it. Spans are handled by a process-wide Profiler: by default it only times them
+(a couple of clock reads per span) and keeps nothing, so library functions can use span()
+unconditionally.
+
+With profiling enabled, the scripts:
+- print a summary table of all spans (summary())
+- append one JSON object per finished span to a JSONL trace (--profile-trace)
+- dump a cProfile .prof file for each span named in --profile-cprofile (view with snakeviz,
+  or `python -m pstats`)
+
+Usage:
+  configure(enabled=True, trace_path="model/profile.jsonl", cprofile_spans=["fit"])
+  with span("fit") as s:
+      tree.fit(X, y)
+  s.wall  # seconds
+"""
+
+from __future__ import annotations
+
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+
+@dataclass
+class Span:
+    name: str
+    path: str
+    depth: int
+    start: float
+    wall: float = 0.0
+    cpu: float = 0.0
+    peak_mb: Optional[float] = None
+    attrs: Dict[str, Any] = field(default_factory=dict)
+
+
+class Profiler:
+    """Collects spans; tracemalloc, the trace file and cProfile dumps only when `enabled`."""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        trace_path: Optional[str | Path] = None,
+        cprofile_spans: Iterable[str] = (),
+        cprofile_dir: Optional[str | Path] = None,
+    ) -> None:
+        self.enabled = enabled
+        self.trace_path = Path(trace_path) if trace_path else None
+        self.cprofile_spans = set(cprofile_spans)
+        self.cprofile_dir = Path(cprofile_dir) if cprofile_dir else Path(".")
+        self.spans: List[Span] = []
+        self._stack: List[Span] = []
+        # Peak seen by each open span before its children reset the tracemalloc peak.
+        self._peaks: List[int] = []
+        self._cprofile_active = False
+        self._started_tracemalloc = False
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        if enabled and self.trace_path:
+            self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+            self.trace_path.write_text("")
+
+    @contextmanager
+    def span(self, name: str, **attrs: Any) -> Iterator[Span]:
+        parent = self._stack[-1] if self._stack else None
+        s = Span(
+            name=name,
+            path=f"{parent.path}/{name}" if parent else name,
+            depth=len(self._stack),
+            start=time.time(),
+            attrs=attrs,
+        )
+        tracing = self.enabled and tracemalloc.is_tracing()
+        if tracing:
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+            self._peaks.append(0)
+        profile = None
+        if self.enabled and name in self.cprofile_spans and not self._cprofile_active:
+            profile, self._cprofile_active = cProfile.Profile(), True
+        self._stack.append(s)
+        wall0, cpu0 = time.perf_counter(), time.process_time()
+        if profile is not None:
+            profile.enable()
+        try:
+            yield s
+        finally:
+            if profile is not None:
+                profile.disable()
+            s.wall = time.perf_counter() - wall0
+            s.cpu = time.process_time() - cpu0
+            self._stack.pop()
+            if tracing:
+                peak = max(self._peaks.pop(), tracemalloc.get_traced_memory()[1])
+                s.peak_mb = peak / (1024 * 1024)
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], peak)
+            if profile is not None:
+                self._cprofile_active = False
+                self.cprofile_dir.mkdir(parents=True, exist_ok=True)
+                profile.dump_stats(self.cprofile_dir / f"profile-{name}.prof")
+            # Bookkeeping only: returning from this finally would swallow the block's exception.
+            if self.enabled:
+                self.spans.append(s)
+                if self.trace_path:
+                    with open(self.trace_path, "a") as fh:
+                        fh.write(json.dumps(self._record(s)) + "\n")
+
+    def _record(self, s: Span) -> Dict[str, Any]:
+        return {
+            "name": s.name,
+            "path": s.path,
+            "depth": s.depth,
+            "start": s.start,
+            "wallSeconds": round(s.wall, 6),
+            "cpuSeconds": round(s.cpu, 6),
+            "peakMb": None if s.peak_mb is None else round(s.peak_mb, 3),
+            "attrs": s.attrs,
+            "pid": os.getpid(),
+        }
+
+    def summary(self) -> str:
+        """Table of spans in start order, indented by nesting depth."""
+        header = f"{'span':<32}{'wall s':>10}{'cpu s':>10}{'peak MB':>10}"
+        lines = [header, "-" * len(header)]
+        for s in sorted(self.spans, key=lambda s: (s.start, s.depth)):
+            peak = "-" if s.peak_mb is None else f"{s.peak_mb:.1f}"
+            label = "  " * s.depth + s.name
+            lines.append(f"{label:<32}{s.wall:>10.3f}{s.cpu:>10.3f}{peak:>10}")
+        return "\n".join(lines)
+
+    def report(self) -> None:
+        """Print the summary and trace location when enabled (end of a script run)."""
+        if not self.enabled:
+            return
+        print(self.summary())
+        if self.trace_path:
+            print(f"Wrote span trace to {self.trace_path}")
+
+    def close(self) -> None:
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+
+_PROFILER = Profiler()
+
+
+def configure(
+    enabled: bool = False,
+    trace_path: Optional[str | Path] = None,
+    cprofile_spans: Iterable[str] = (),
+    cprofile_dir: Optional[str | Path] = None,
+) -> Profiler:
+    """Replace the process-wide profiler used by span()."""
+    global _PROFILER
+    _PROFILER.close()
+    _PROFILER = Profiler(enabled, trace_path, cprofile_spans, cprofile_dir)
+    return _PROFILER
+
+
+def get_profiler() -> Profiler:
+    return _PROFILER
+
+
+def span(name: str, **attrs: Any):
+    """Time a block with the process-wide profiler: `with span("fit"): ...`."""
+    return _PROFILER.span(name, **attrs)
+
+
+def add_profile_args(parser) -> None:
+    """Add --profile, --profile-trace and --profile-cprofile to an argparse parser."""
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Print per-stage wall/CPU time and tracemalloc peaks and write a JSONL trace",
+    )
+    parser.add_argument(
+        "--profile-trace",
+        type=str,
+        default=None,
+        help="JSONL trace path (default: <out-dir>/profile.jsonl with --profile)",
+    )
+    parser.add_argument(
+        "--profile-cprofile",
+        type=str,
+        default="",
+        help="Comma-separated span names to record with cProfile (<out-dir>/profile-<span>.prof)",
+    )
+
+
+def configure_from_args(args, out_dir: str | Path) -> Profiler:
+    """Configure the profiler from add_profile_args() flags, writing files under `out_dir`."""
+    spans = [s.strip() for s in args.profile_cprofile.split(",") if s.strip()]
+    enabled = args.profile or bool(spans) or bool(args.profile_trace)
+    trace = args.profile_trace or (Path(out_dir) / "profile.jsonl" if enabled else None)
+    return configure(enabled, trace, spans, out_dir)
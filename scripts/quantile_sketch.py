@@ -0,0 +1,146 @@
+"""
+Mergeable streaming quantile sketch (KLL), for medians and quantile bins over chunked data.
+
+A KLLSketch keeps a hierarchy of compactors. Level h holds items that each stand for 2**h
+input values. When a level outgrows its capacity it is sorted, and every other item (starting
+at a random offset) moves up one level. The top level holds about k items and the levels below
+shrink geometrically, so the sketch stays O(k) in size whatever the input length. The worst
+normalized rank error over all quantiles is about 2.5 / k (k=200: ~1.2%, k=800: ~0.3%); the min
+and max are exact.
+
+Sketches built on different chunks, files or worker processes combine with merge(). They
+pickle, so workers can return them. Updates take whole NumPy arrays; NaNs are skipped.
+
+Usage:
+  sketch = KLLSketch(k=200, seed=0)
+  for chunk in chunks:
+      sketch.update(chunk)
+  median = sketch.quantile(0.5)
+"""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, List, Mapping, Optional
+
+import numpy as np
+
+DEFAULT_K = 200
+# Capacity ratio between consecutive levels and the smallest level capacity, as in the KLL paper.
+CAPACITY_DECAY = 2.0 / 3.0
+MIN_CAPACITY = 8
+DEFAULT_CHUNK_ROWS = 1 << 20
+
+
+class KLLSketch:
+    """KLL quantile sketch over float64 values with accuracy parameter `k`."""
+
+    def __init__(self, k: int = DEFAULT_K, seed: Optional[int] = None) -> None:
+        if k < MIN_CAPACITY:
+            raise ValueError(f"k must be at least {MIN_CAPACITY}, got {k}")
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.levels: List[np.ndarray] = [np.empty(0)]
+        self.n = 0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(MIN_CAPACITY, int(np.ceil(self.k * CAPACITY_DECAY**depth)))
+
+    def _compress(self) -> None:
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) <= self._capacity(level):
+                level += 1
+                continue
+            if level + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            items = np.sort(items)
+            # An odd item out stays behind so the total weight is preserved exactly.
+            keep = items[: len(items) % 2]
+            paired = items[len(keep) :]
+            promoted = paired[int(self.rng.integers(2)) :: 2]
+            self.levels[level] = keep
+            self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+            # Adding a level lowers every capacity below it, so rescan from the bottom.
+            level = 0
+
+    def update(self, values: Iterable[float] | np.ndarray) -> "KLLSketch":
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return self
+        self.n += len(values)
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Fold `other` into this sketch (in place); both must use the same k."""
+        if other.k != self.k:
+            raise ValueError(f"Cannot merge sketches with k={self.k} and k={other.k}")
+        if other.n == 0:
+            return self
+        self.n += other.n
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        while len(self.levels) < len(other.levels):
+            self.levels.append(np.empty(0))
+        for level, items in enumerate(other.levels):
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self._compress()
+        return self
+
+    def _sorted_weights(self) -> tuple[np.ndarray, np.ndarray]:
+        items = np.concatenate(self.levels)
+        weights = np.concatenate(
+            [np.full(len(lvl), 1 << h, dtype=np.int64) for h, lvl in enumerate(self.levels)]
+        )
+        order = np.argsort(items, kind="stable")
+        return items[order], np.cumsum(weights[order])
+
+    def quantiles(self, qs: Iterable[float] | np.ndarray) -> np.ndarray:
+        """Approximate values at quantile levels `qs` in [0, 1]; 0 and 1 give the exact min/max."""
+        qs = np.asarray(qs, dtype=np.float64)
+        if self.n == 0:
+            return np.full(qs.shape, np.nan)
+        items, cum = self._sorted_weights()
+        idx = np.searchsorted(cum, qs * self.n, side="left")
+        out = items[np.minimum(idx, len(items) - 1)]
+        out = np.where(qs <= 0, self.min, out)
+        return np.where(qs >= 1, self.max, out)
+
+    def quantile(self, q: float) -> float:
+        return float(self.quantiles([q])[0])
+
+    def rank(self, values: Iterable[float] | np.ndarray) -> np.ndarray:
+        """Approximate fraction of inserted values that are <= each of `values`."""
+        values = np.asarray(values, dtype=np.float64)
+        if self.n == 0:
+            return np.full(values.shape, np.nan)
+        items, cum = self._sorted_weights()
+        idx = np.searchsorted(items, values, side="right")
+        return np.where(idx > 0, cum[np.maximum(idx - 1, 0)], 0) / self.n
+
+    def __len__(self) -> int:
+        """Number of items retained (not the number inserted, which is `n`)."""
+        return sum(len(items) for items in self.levels)
+
+
+def sketch_columns(
+    columns: Mapping[str, np.ndarray],
+    k: int = DEFAULT_K,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    seed: Optional[int] = 0,
+) -> Dict[str, KLLSketch]:
+    """One KLLSketch per column, fed `chunk_rows` rows at a time (columns may be memory-mapped)."""
+    sketches = {name: KLLSketch(k, seed=seed) for name in columns}
+    n_rows = len(next(iter(columns.values()))) if columns else 0
+    for start in range(0, n_rows, chunk_rows):
+        for name, col in columns.items():
+            sketches[name].update(col[start : start + chunk_rows])
+    return sketches
@@ -0,0 +1,67 @@
+"""
+Scratch arrays that worker processes can re-open: private RAM, a memory-mapped .npy file, or a
+multiprocessing SharedMemory block.
+
+The parent creates a ScratchArray and passes its handle() (a small picklable tuple) to the pool
+initializer; each worker maps the same memory with open_scratch. Call start_resource_tracker()
+before creating a pool whose workers attach blocks the parent creates later. Used by the hist engine's
+parallel level passes, prepare_data.py's split workers and sweep_tree.py's fit workers.
+"""
+
+from __future__ import annotations
+
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+
+class ScratchArray:
+    """Scratch array: private RAM, a memory-mapped .npy under `tmp`, or a SharedMemory block.
+
+    File- and shared-memory-backed arrays can be re-opened by worker processes from handle().
+    """
+
+    def __init__(self, tmp: Optional[str], name: str, shape, dtype, shared: bool = False) -> None:
+        dtype = np.dtype(dtype)
+        self.shm: Optional[SharedMemory] = None
+        self._handle: Optional[tuple] = None
+        if tmp is not None:
+            path = Path(tmp) / f"{name}.npy"
+            self.array = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+            self._handle = ("file", str(path))
+        elif shared:
+            self.shm = SharedMemory(create=True, size=max(1, int(np.prod(shape)) * dtype.itemsize))
+            self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+            self._handle = ("shm", self.shm.name, shape, dtype.str)
+        else:
+            self.array = np.empty(shape, dtype=dtype)
+
+    def handle(self) -> Optional[tuple]:
+        return self._handle
+
+    def release(self) -> None:
+        self.array = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+def start_resource_tracker() -> None:
+    """Start the parent's resource tracker so forked workers share it.
+
+    Attaching a SharedMemory block registers it with the process's tracker. A worker forked
+    before the parent had one starts its own, which unlinks the parent's blocks ("leaked
+    shared_memory objects") when the worker exits.
+    """
+    resource_tracker.ensure_running()
+
+
+def open_scratch(handle: tuple):
+    if handle[0] == "file":
+        return np.load(handle[1], mmap_mode="r+"), None
+    shm = SharedMemory(name=handle[1])
+    return np.ndarray(handle[2], dtype=np.dtype(handle[3]), buffer=shm.buf), shm
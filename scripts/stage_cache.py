@@ -0,0 +1,154 @@
+"""
+Content-addressed cache of pipeline stage outputs, so unchanged prepare/train runs are skipped.
+
+A stage run is identified by a key: the SHA-256 of the stage name, its output-affecting flags,
+the digests of its input data and the digest of the scripts/ sources (so code changes never
+reuse stale outputs). Layout under the store root (--stage-cache or REGTREE_STAGE_CACHE):
+- entries/<key>/files/...  copies of the output files and directories of that run
+- entries/<key>/entry.json stage name, flags, output names, total bytes, last-used time
+
+Entries are evicted least-recently-used first once the store exceeds its byte budget.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from dataset_cache import sha256_file
+
+STAGE_CACHE_ENV = "REGTREE_STAGE_CACHE"
+DEFAULT_BUDGET_MB = 2048
+
+
+def default_stage_cache() -> Optional[str]:
+    return os.environ.get(STAGE_CACHE_ENV) or None
+
+
+def path_digest(path: str | Path) -> str:
+    """SHA-256 of a file, or of the relative names and contents of every file in a directory."""
+    path = Path(path)
+    if path.is_file():
+        return sha256_file(path)
+    h = hashlib.sha256()
+    for f in sorted(p for p in path.rglob("*") if p.is_file()):
+        h.update(f.relative_to(path).as_posix().encode() + b"\0" + sha256_file(f).encode())
+    return h.hexdigest()
+
+
+def code_digest() -> str:
+    """Digest of the pipeline sources (every .py file next to this module)."""
+    h = hashlib.sha256()
+    for f in sorted(Path(__file__).resolve().parent.glob("*.py")):
+        h.update(f.name.encode() + b"\0" + f.read_bytes())
+    return h.hexdigest()
+
+
+def stage_key(stage: str, params: Mapping[str, Any], inputs: Mapping[str, str]) -> str:
+    payload = {"stage": stage, "params": dict(params), "inputs": dict(inputs), "code": code_digest()}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode()).hexdigest()
+
+
+def _size(path: Path) -> int:
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def _copy(src: Path, dest: Path) -> None:
+    # Always copy: outputs are later rewritten in place, which would corrupt hard-linked entries.
+    if dest.is_dir():
+        shutil.rmtree(dest)
+    if src.is_dir():
+        shutil.copytree(src, dest)
+    else:
+        shutil.copy2(src, dest)
+
+
+class StageCache:
+    """Store of stage outputs keyed by stage_key(), bounded by `budget_mb` with LRU eviction."""
+
+    def __init__(self, root: str | Path, budget_mb: int = DEFAULT_BUDGET_MB) -> None:
+        self.root = Path(root)
+        self.entries = self.root / "entries"
+        self.budget_bytes = budget_mb * 1024 * 1024
+
+    def _read_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        path = self.entries / key / "entry.json"
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def _write_entry(self, entry_dir: Path, entry: Dict[str, Any]) -> None:
+        tmp = entry_dir / "entry.json.tmp"
+        tmp.write_text(json.dumps(entry, indent=2))
+        os.replace(tmp, entry_dir / "entry.json")
+
+    def restore(self, key: str, out_dir: str | Path) -> Optional[List[Path]]:
+        """Copy the outputs of `key` into `out_dir`; returns their paths, or None on a miss."""
+        entry = self._read_entry(key)
+        if entry is None:
+            return None
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        restored = []
+        for name in entry["outputs"]:
+            _copy(self.entries / key / "files" / name, out_dir / name)
+            restored.append(out_dir / name)
+        entry["lastUsed"] = time.time()
+        self._write_entry(self.entries / key, entry)
+        return restored
+
+    def store(self, key: str, stage: str, params: Mapping[str, Any], outputs: Sequence[Path]) -> bool:
+        """Record `outputs` (files or directories) under `key`; returns False if over budget."""
+        size = sum(_size(Path(p)) for p in outputs)
+        if size > self.budget_bytes:
+            return False
+        self.entries.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=self.entries, prefix=".staging-"))
+        try:
+            (staging / "files").mkdir()
+            for p in outputs:
+                _copy(Path(p), staging / "files" / Path(p).name)
+            entry = {
+                "stage": stage,
+                "params": dict(params),
+                "outputs": [Path(p).name for p in outputs],
+                "bytes": size,
+                "lastUsed": time.time(),
+            }
+            self._write_entry(staging, entry)
+            dest = self.entries / key
+            if dest.exists():
+                shutil.rmtree(dest)
+            os.replace(staging, dest)
+        finally:
+            if staging.exists():
+                shutil.rmtree(staging)
+        self.evict(keep=key)
+        return True
+
+    def evict(self, keep: Optional[str] = None) -> List[str]:
+        """Drop least-recently-used entries until the store fits its budget."""
+        entries = []
+        for d in self.entries.iterdir() if self.entries.exists() else []:
+            entry = self._read_entry(d.name) if not d.name.startswith(".") else None
+            if entry is not None:
+                entries.append((entry["lastUsed"], d.name, entry["bytes"]))
+        total = sum(size for _, _, size in entries)
+        evicted = []
+        for _, key, size in sorted(entries):
+            if total <= self.budget_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self.entries / key)
+            total -= size
+            evicted.append(key)
+        return evicted
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Grid search over max_depth and min_samples_leaf for the exported regression tree.
+
+The train and test tables are read once and placed in shared memory; a process pool fits one
+grid point per task against those shared arrays and scores it on the test set. Results are
+written as a ranked table, and the best point is refit and exported exactly like
+train_tree.py (tree.json, tree.bin, layout.bin, predictor.js, test_paths.json for the test
+table, and meta.json with fitSeconds and nodeCount).
+
+Usage:
+  python scripts/sweep_tree.py --max-depth 2,4,6,8,10,0 --min-samples-leaf 1,5,10,20,50
+  python scripts/sweep_tree.py --engine hist --jobs 16 --train-data data/train.feather
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import multiprocessing as mp
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.tree import DecisionTreeRegressor
+
+from hist_tree import HistTree
+from profiling import span
+from scratch_arrays import ScratchArray, open_scratch
+from stage_cache import path_digest
+from table_io import read_table
+from train_tree import build_meta, write_model
+
+_WORKER: Dict[str, Any] = {}
+
+
+def parse_grid(values: str) -> List[int]:
+    return [int(v) for v in values.split(",") if v.strip()]
+
+
+def make_tree(engine: str, max_depth: int | None, min_samples_leaf: int, random_state: int):
+    if engine == "hist":
+        return HistTree(
+            max_depth=max_depth, min_samples_leaf=min_samples_leaf, random_state=random_state
+        )
+    return DecisionTreeRegressor(
+        max_depth=max_depth, min_samples_leaf=min_samples_leaf, random_state=random_state
+    )
+
+
+def score(y_true: np.ndarray, y_pred: np.ndarray) -> Dict[str, float]:
+    err = y_pred - y_true
+    ss_tot = float(((y_true - y_true.mean()) ** 2).sum())
+    return {
+        "rmse": float(np.sqrt(np.mean(err * err))),
+        "mae": float(np.mean(np.abs(err))),
+        "r2": 1.0 - float((err * err).sum()) / ss_tot if ss_tot > 0 else float("nan"),
+    }
+
+
+def _init_worker(handles: Dict[str, tuple]) -> None:
+    for key, handle in handles.items():
+        _WORKER[key], _WORKER[f"{key}_shm"] = open_scratch(handle)
+
+
+def _fit_point(task: Tuple[str, int | None, int, int]) -> Dict[str, Any]:
+    engine, max_depth, min_samples_leaf, random_state = task
+    tree = make_tree(engine, max_depth, min_samples_leaf, random_state)
+    start = time.perf_counter()
+    tree.fit(_WORKER["X_train"], _WORKER["y_train"])
+    fit_time = time.perf_counter() - start
+    result = {
+        "max_depth": max_depth or 0,
+        "min_samples_leaf": min_samples_leaf,
+        "node_count": int(tree.tree_.node_count),
+        "fit_seconds": round(fit_time, 4),
+    }
+    result.update(score(_WORKER["y_test"], tree.predict(_WORKER["X_test"])))
+    return result
+
+
+def _share(arrays: Dict[str, np.ndarray]) -> Dict[str, ScratchArray]:
+    shared = {}
+    for key, arr in arrays.items():
+        shared[key] = ScratchArray(None, key, arr.shape, arr.dtype, shared=True)
+        shared[key].array[...] = arr
+    return shared
+
+
+def run_sweep(
+    train_df: pd.DataFrame,
+    test_df: pd.DataFrame,
+    target: str,
+    depths: List[int],
+    leaves: List[int],
+    engine: str,
+    random_state: int,
+    n_jobs: int,
+) -> pd.DataFrame:
+    """Fit every (max_depth, min_samples_leaf) pair and return results ranked by test RMSE.
+
+    `max_depth` 0 means unlimited, in the grid and in the returned table.
+    """
+    feature_names = [c for c in train_df.columns if c != target]
+    # float32 is what both engines compare against, so sharing it halves memory at no cost.
+    shared = _share(
+        {
+            "X_train": train_df[feature_names].to_numpy(dtype=np.float32),
+            "y_train": train_df[target].to_numpy(dtype=np.float64),
+            "X_test": test_df[feature_names].to_numpy(dtype=np.float32),
+            "y_test": test_df[target].to_numpy(dtype=np.float64),
+        }
+    )
+    tasks = [
+        (engine, None if d <= 0 else d, leaf, random_state)
+        for d, leaf in itertools.product(depths, leaves)
+    ]
+    try:
+        handles = {key: arr.handle() for key, arr in shared.items()}
+        with mp.get_context().Pool(n_jobs or None, _init_worker, (handles,)) as pool:
+            rows = pool.map(_fit_point, tasks, chunksize=1)
+    finally:
+        for arr in shared.values():
+            arr.release()
+
+    results = pd.DataFrame(rows).sort_values(["rmse", "node_count"], kind="stable")
+    results.insert(0, "rank", np.arange(1, len(results) + 1))
+    return results.reset_index(drop=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep max_depth x min_samples_leaf")
+    parser.add_argument(
+        "--train-data", type=str, default="data/california_housing_train.csv"
+    )
+    parser.add_argument("--test-data", type=str, default="data/california_housing_test.csv")
+    parser.add_argument("--target", type=str, default="MedHouseVal", help="Target column")
+    parser.add_argument(
+        "--max-depth",
+        type=str,
+        default="2,3,4,5,6,8,10,0",
+        help="Comma-separated depths (0 = unlimited)",
+    )
+    parser.add_argument(
+        "--min-samples-leaf", type=str, default="1,5,10,20,50", help="Comma-separated values"
+    )
+    parser.add_argument("--engine", choices=["sklearn", "hist"], default="sklearn")
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("--jobs", type=int, default=0, help="Worker processes (0 = all cores)")
+    parser.add_argument("--out-dir", type=str, default="model")
+    parser.add_argument(
+        "--results",
+        type=str,
+        default=None,
+        help="Ranked results CSV (default: <out-dir>/sweep_results.csv)",
+    )
+    args = parser.parse_args()
+
+    train_df = read_table(args.train_data)
+    test_df = read_table(args.test_data)
+    feature_names = [c for c in train_df.columns if c != args.target]
+
+    results = run_sweep(
+        train_df,
+        test_df,
+        args.target,
+        parse_grid(args.max_depth),
+        parse_grid(args.min_samples_leaf),
+        args.engine,
+        args.random_state,
+        args.jobs,
+    )
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    results_path = Path(args.results) if args.results else out_dir / "sweep_results.csv"
+    results.to_csv(results_path, index=False)
+
+    best = results.iloc[0]
+    max_depth = int(best["max_depth"]) or None
+    min_samples_leaf = int(best["min_samples_leaf"])
+    tree = make_tree(args.engine, max_depth, min_samples_leaf, args.random_state)
+    with span("fit", engine=args.engine) as fit:
+        X = train_df[feature_names].to_numpy(dtype=np.float32)
+        tree.fit(X, train_df[args.target].to_numpy())
+    params = {
+        "max_depth": max_depth,
+        "min_samples_leaf": min_samples_leaf,
+        "random_state": args.random_state,
+        "engine": args.engine,
+    }
+    meta = build_meta(train_df, feature_names, args.target, params)
+    meta["fitSeconds"] = round(fit.wall, 4)
+    meta["nodeCount"] = int(tree.tree_.node_count)
+    meta["sweep"] = {"points": int(len(results)), "testRmse": float(best["rmse"])}
+    tree_path = write_model(
+        tree,
+        feature_names,
+        meta,
+        out_dir,
+        test_df=test_df,
+        test_source=Path(args.test_data).name,
+        test_digest=path_digest(args.test_data),
+    )[0]
+
+    print(results.head(10).to_string(index=False))
+    print(
+        f"Wrote {len(results)} results to {results_path}; best model "
+        f"(max_depth={max_depth}, min_samples_leaf={min_samples_leaf}) to {tree_path}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Read and write the prepared train/test tables in several on-disk formats.
+
+- csv     : default, read by the web client
+- parquet : columnar, compressed (requires pyarrow)
+- feather : Arrow IPC, fastest to load (requires pyarrow)
+- npz     : one NumPy array per column, no extra dependency
+- columns : a directory of per-column .npy files plus columns.json; read back memory-mapped,
+            for training on data larger than RAM (train_tree.py --out-of-core)
+
+Floats round-trip exactly in every format except CSV. The format is inferred from the file
+suffix when reading.
+"""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+TABLE_SUFFIXES = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "feather": ".feather",
+    "npz": ".npz",
+    "columns": ".columns",
+}
+COLUMNS_INDEX = "columns.json"
+
+
+def table_format(path: str | Path) -> str:
+    suffix = Path(path).suffix.lower()
+    for fmt, fmt_suffix in TABLE_SUFFIXES.items():
+        if suffix == fmt_suffix:
+            return fmt
+    raise ValueError(
+        f"Cannot infer table format of {path}; expected one of {sorted(TABLE_SUFFIXES.values())}"
+    )
+
+
+def write_table(df: pd.DataFrame, path: str | Path, fmt: str | None = None) -> None:
+    fmt = fmt or table_format(path)
+    if fmt == "csv":
+        df.to_csv(path, index=False)
+    elif fmt == "parquet":
+        df.to_parquet(path, index=False)
+    elif fmt == "feather":
+        df.reset_index(drop=True).to_feather(path)
+    elif fmt == "npz":
+        # Keyword order is kept in the archive, so column order survives the round trip.
+        np.savez(path, **{str(c): df[c].to_numpy() for c in df.columns})
+    elif fmt == "columns":
+        write_columns({str(c): df[c].to_numpy() for c in df.columns}, path)
+    else:
+        raise ValueError(f"Unknown table format {fmt!r}")
+
+
+def read_table(path: str | Path) -> pd.DataFrame:
+    fmt = table_format(path)
+    if fmt == "csv":
+        return pd.read_csv(path)
+    if fmt == "parquet":
+        return pd.read_parquet(path)
+    if fmt == "feather":
+        return pd.read_feather(path)
+    if fmt == "columns":
+        return pd.DataFrame(open_columns(path), copy=False)
+    with np.load(path, allow_pickle=False) as npz:
+        return pd.DataFrame({name: npz[name] for name in npz.files})
+
+
+def write_columns(columns: Dict[str, np.ndarray], path: str | Path) -> None:
+    """Write a `.columns` directory: col_000.npy, col_001.npy, ... and a columns.json index."""
+    path = Path(path)
+    path.mkdir(parents=True, exist_ok=True)
+    index = []
+    for i, (name, arr) in enumerate(columns.items()):
+        fname = f"col_{i:03d}.npy"
+        np.save(path / fname, np.ascontiguousarray(arr), allow_pickle=False)
+        index.append({"name": name, "file": fname})
+    (path / COLUMNS_INDEX).write_text(json.dumps({"columns": index}))
+
+
+def open_columns(path: str | Path) -> Dict[str, np.ndarray]:
+    """Memory-map every column of a `.columns` directory (read-only), in stored order."""
+    path = Path(path)
+    index = json.loads((path / COLUMNS_INDEX).read_text())["columns"]
+    return {c["name"]: np.load(path / c["file"], mmap_mode="r") for c in index}
@@ -1,24 +1,63 @@
 #!/usr/bin/env python3
 """
-Train a DecisionTreeRegressor on the prepared California Housing CSV and export a compact JSON
+Train a DecisionTreeRegressor on the prepared California Housing data (CSV, Parquet, Feather or
+NPZ, detected by file suffix) and export a compact JSON
 for client-side visualization and prediction.
 
 Outputs:
 - model/tree.json : structure with nodes, thresholds, features, value, children
+                    (one object per node, or parallel arrays with --tree-format columnar)
+- model/tree.bin  : the same tree as little-endian typed-array column blocks (see tree_binary.py)
 - model/meta.json : feature names, target, training stats, feature ranges/medians
+- model/predictor.js : the tree compiled to an ES module the web viewer imports for prediction
+                       (tree_codegen.py; skipped with --no-js, and in auto mode for trees over
+                       JS_AUTO_MAX_NODES nodes)
+- model/layout.bin : precomputed viewer layout, node x/y as float64 blocks plus the bounding box
+                     (tree_layout.py; skipped with --no-layout)
+- model/test_paths.json : leaf, prediction, error and root-to-leaf path of every --test-data row,
+                          which the web viewer replays instead of traversing the tree (only when
+                          the file's SHA-256 matches the test CSV it loaded)
+- model/tree_predictor.py : with --emit-python, a standalone generated predictor (tree_codegen.py)
+
+With --stage-cache, a run whose training data and flags match an earlier one restores that
+run's outputs instead of training (see stage_cache.py).
+
+predictor.js, layout.bin and test_paths.json record the SHA-256 of the tree.bin they were derived
+from (also meta.json's treeDigest), and the viewer ignores any whose digest does not match. Derived
+files that a run does not write are deleted, so a directory never mixes two trees.
 """
 
 from __future__ import annotations
 
 import argparse
+import gzip
 import json
+import tempfile
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List
 
 import numpy as np
 import pandas as pd
 from sklearn.tree import DecisionTreeRegressor
 
+from hist_tree import MAX_BINS, HistTree
+from predict_tree import TreePredictor
+from profiling import add_profile_args, configure_from_args, span
+from quantile_sketch import DEFAULT_K as DEFAULT_SKETCH_K
+from quantile_sketch import sketch_columns
+from stage_cache import DEFAULT_BUDGET_MB, StageCache, default_stage_cache, path_digest, stage_key
+from table_io import read_table
+from tree_binary import tree_arrays, tree_digest, write_tree_binary
+from tree_codegen import (
+    CODEGEN_MODES,
+    JS_AUTO_MAX_NODES,
+    JS_PREDICTOR,
+    PYTHON_PREDICTOR,
+    write_js_predictor,
+    write_python_predictor,
+)
+from tree_layout import LAYOUT_FILE, write_layout
+
 
 def train_tree(
     df: pd.DataFrame,
@@ -38,98 +77,752 @@ def train_tree(
     return tree
 
 
-def export_tree_json(tree: DecisionTreeRegressor, feature_names: List[str]) -> Dict[str, Any]:
+def train_hist_tree(
+    df: pd.DataFrame,
+    target_col: str,
+    max_depth: int | None,
+    min_samples_leaf: int,
+    random_state: int,
+    max_bins: int = MAX_BINS,
+    spill_dir: str | None = None,
+    n_jobs: int = 1,
+) -> HistTree:
+    """Fit the histogram engine column by column, without building a dense feature matrix.
+
+    Columns of a DataFrame read from a `.columns` directory stay memory-mapped throughout; with
+    `spill_dir` the engine's scratch arrays are memory-mapped too (out-of-core training).
+    """
+    columns = [df[c].to_numpy() for c in df.columns if c != target_col]
+    tree = HistTree(
+        max_depth=max_depth,
+        min_samples_leaf=min_samples_leaf,
+        max_bins=max_bins,
+        random_state=random_state,
+        n_jobs=n_jobs,
+    )
+    return tree.fit_columns(columns, df[target_col].to_numpy(), spill_dir=spill_dir)
+
+
+TREE_FORMAT_VERSIONS = {"nodes": 1, "columnar": 2}
+
+
+DEFAULT_STREAM_CHUNK_NODES = 1 << 16
+# Values converted to float64 at once when computing meta.json column stats.
+STATS_BLOCK_CELLS = 1 << 24
+# Digit width of the streaming radix select used for the stats of longer columns.
+RADIX_BITS = 16
+_SIGN_BIT = np.uint64(1 << 63)
+TEST_PATHS = "test_paths.json"
+# Files a run may or may not write; see remove_stale_artifacts. Only one of tree.json and
+# tree.json.gz is written. layout.json is the layout format written before layout.bin.
+DERIVED_ARTIFACTS = (
+    "tree.json",
+    "tree.json.gz",
+    LAYOUT_FILE,
+    "layout.json",
+    JS_PREDICTOR,
+    TEST_PATHS,
+    PYTHON_PREDICTOR,
+)
+
+
+def _node_dicts(
+    tree: DecisionTreeRegressor, feature_names: List[str], start: int, stop: int
+) -> List[Dict[str, Any]]:
     sk = tree.tree_
     nodes: List[Dict[str, Any]] = []
 
-    def node_dict(i: int) -> Dict[str, Any]:
-        is_leaf = sk.children_left[i] == sk.children_right[i]
+    # Convert each tree_ array to Python scalars in bulk instead of indexing NumPy per node.
+    left = sk.children_left[start:stop].tolist()
+    right = sk.children_right[start:stop].tolist()
+    feature = sk.feature[start:stop].tolist()
+    threshold = sk.threshold[start:stop].tolist()
+    value = sk.value[start:stop, 0, 0].tolist()
+    n_samples = sk.n_node_samples[start:stop].tolist()
+    impurity = sk.impurity[start:stop].tolist()
+
+    for k in range(stop - start):
+        is_leaf = left[k] == right[k]
         d: Dict[str, Any] = {
-            "id": int(i),
-            "isLeaf": bool(is_leaf),
-            "nSamples": int(sk.n_node_samples[i]),
-            "impurity": float(sk.impurity[i]),
-            "value": float(sk.value[i][0][0]),
+            "id": start + k,
+            "isLeaf": is_leaf,
+            "nSamples": n_samples[k],
+            "impurity": impurity[k],
+            "value": value[k],
         }
         if not is_leaf:
-            feat_idx = int(sk.feature[i])
+            feat_idx = feature[k]
             d.update(
                 {
                     "feature": feature_names[feat_idx],
                     "featureIndex": feat_idx,
-                    "threshold": float(sk.threshold[i]),
-                    "left": int(sk.children_left[i]),
-                    "right": int(sk.children_right[i]),
+                    "threshold": threshold[k],
+                    "left": left[k],
+                    "right": right[k],
                 }
             )
-        return d
+        nodes.append(d)
+    return nodes
+
+
+def export_tree_json(tree: DecisionTreeRegressor, feature_names: List[str]) -> Dict[str, Any]:
+    nodes = _node_dicts(tree, feature_names, 0, tree.tree_.node_count)
+    return {"version": TREE_FORMAT_VERSIONS["nodes"], "root": 0, "nodes": nodes}
+
+
+def _columnar_header(tree: DecisionTreeRegressor, feature_names: List[str]) -> Dict[str, Any]:
+    return {
+        "format": "columnar",
+        "version": TREE_FORMAT_VERSIONS["columnar"],
+        "root": 0,
+        "nodeCount": int(tree.tree_.node_count),
+        "featureNames": list(feature_names),
+    }
+
+
+def export_tree_columnar(tree: DecisionTreeRegressor, feature_names: List[str]) -> Dict[str, Any]:
+    """Export the tree as parallel arrays indexed by node id (struct-of-arrays).
+
+    Leaves have `left == right == -1`; their `feature`/`threshold` entries are placeholders.
+    """
+    out = _columnar_header(tree, feature_names)
+    out.update({name: col.tolist() for name, col in tree_arrays(tree).items()})
+    return out
+
+
+def _write_json_items(fh, chunks: Iterable[List[Any]]) -> None:
+    # Write the items of several JSON lists as the body of a single list.
+    first = True
+    for items in chunks:
+        if not items:
+            continue
+        if not first:
+            fh.write(", ")
+        fh.write(json.dumps(items)[1:-1])
+        first = False
+
+
+def write_tree_json_stream(
+    tree: DecisionTreeRegressor,
+    feature_names: List[str],
+    path: str | Path,
+    tree_format: str = "nodes",
+    chunk_nodes: int = DEFAULT_STREAM_CHUNK_NODES,
+) -> None:
+    """Write tree.json to `path` straight from the `tree_` arrays, `chunk_nodes` at a time.
+
+    Peak memory is bounded by one chunk rather than the whole node list, and the output is
+    byte-identical to `json.dumps` of export_tree_json / export_tree_columnar. Paths ending
+    in `.gz` are gzip-compressed.
+    """
+    n_nodes = tree.tree_.node_count
+    starts = range(0, n_nodes, chunk_nodes)
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "wt", encoding="utf-8") as fh:
+        if tree_format == "columnar":
+            fh.write(json.dumps(_columnar_header(tree, feature_names))[:-1])
+            for name, col in tree_arrays(tree).items():
+                fh.write(f", {json.dumps(name)}: [")
+                _write_json_items(fh, (col[i : i + chunk_nodes].tolist() for i in starts))
+                fh.write("]")
+            fh.write("}")
+        else:
+            fh.write(f'{{"version": {TREE_FORMAT_VERSIONS["nodes"]}, "root": 0, "nodes": [')
+            _write_json_items(
+                fh,
+                (
+                    _node_dicts(tree, feature_names, i, min(i + chunk_nodes, n_nodes))
+                    for i in starts
+                ),
+            )
+            fh.write("]}")
+
+
+def stats_levels(n_bins: int = 0) -> np.ndarray:
+    """Quantile levels computed for meta.json: 0, 0.5, 1 and, with `n_bins`, every 1/n_bins."""
+    levels = np.array([0.0, 0.5, 1.0])
+    if n_bins > 0:
+        levels = np.unique(np.concatenate([levels, np.linspace(0.0, 1.0, n_bins + 1)]))
+    return levels
+
+
+def _quantiles(values: np.ndarray, levels: np.ndarray) -> np.ndarray:
+    """Linear-interpolated quantiles along the last axis, matching np.quantile's default method.
+
+    The min and max are plain reductions. Interior order statistics come from one np.partition
+    call at their lower indices; each upper neighbour is the minimum of the partitioned segment
+    that follows it. This is several times faster than np.quantile on (columns, rows) blocks.
+    """
+    n = values.shape[-1]
+    pos = levels * (n - 1)
+    lo = np.floor(pos).astype(np.int64)
+    frac = pos - lo
+    kth = np.unique(lo[(lo > 0) & (lo < n - 1)])
+    part = np.partition(values, kth, axis=-1) if len(kth) else values
+    at = {0: values.min(axis=-1), n - 1: values.max(axis=-1)}
+    bounds = list(kth[1:]) + [n - 1]
+    for k, nxt in zip(kth, bounds):
+        at[int(k)] = part[..., k]
+        at.setdefault(int(k) + 1, part[..., k + 1 : nxt + 1].min(axis=-1))
+    out = np.empty(values.shape[:-1] + (len(levels),))
+    for i, (k, f) in enumerate(zip(lo, frac)):
+        out[..., i] = at[int(k)] if f == 0 else at[int(k)] + (at[int(k) + 1] - at[int(k)]) * f
+    return out
+
+
+def _histograms(X: np.ndarray, lo: np.ndarray, hi: np.ndarray, n_bins: int) -> np.ndarray:
+    """Equal-width counts of each row of `X` over [lo, hi], as one (rows, n_bins) bincount."""
+    width = np.where(hi > lo, hi - lo, 1.0)
+    codes = np.floor((X - lo[:, None]) / width[:, None] * n_bins)
+    codes = np.clip(np.nan_to_num(codes, nan=-1), -1, n_bins - 1).astype(np.int64)
+    valid = codes >= 0
+    codes += np.arange(len(X))[:, None] * n_bins
+    return np.bincount(codes[valid], minlength=len(X) * n_bins).reshape(len(X), n_bins)
+
+
+def _stats_dicts(
+    q: np.ndarray, levels: np.ndarray, counts: np.ndarray | None
+) -> List[Dict[str, Any]]:
+    median = int(np.searchsorted(levels, 0.5))
+    stats = []
+    for j in range(len(q)):
+        col = {"min": float(q[j, 0]), "max": float(q[j, -1]), "median": float(q[j, median])}
+        if counts is not None:
+            col["quantiles"] = q[j].tolist()
+            col["histogram"] = counts[j].tolist()
+        stats.append(col)
+    return stats
+
+
+def _streamed_histograms(
+    data: Dict[str, np.ndarray], columns: List[str], q: np.ndarray, n_bins: int, block_cells: int
+) -> np.ndarray:
+    """_histograms over [q[:, 0], q[:, -1]] of each column, accumulated over row chunks."""
+    counts = np.zeros((len(columns), n_bins), dtype=np.int64)
+    n_rows = len(data[columns[0]]) if columns else 0
+    chunk_rows = max(1, block_cells // max(len(columns), 1))
+    for start in range(0, n_rows, chunk_rows):
+        X = np.stack([data[name][start : start + chunk_rows] for name in columns])
+        counts += _histograms(X.astype(np.float64), q[:, 0], q[:, -1], n_bins)
+    return counts
+
+
+def _sketch_column_stats(
+    df: pd.DataFrame, columns: List[str], n_bins: int, sketch_k: int, block_cells: int
+) -> List[Dict[str, Any]]:
+    data = {name: df[name].to_numpy() for name in columns}
+    sketches = sketch_columns(data, k=sketch_k)
+    levels = stats_levels(n_bins)
+    q = np.array([sketches[name].quantiles(levels) for name in columns])
+    # min and max are exact in the sketch, so a second streaming pass gives exact histograms.
+    counts = _streamed_histograms(data, columns, q, n_bins, block_cells) if n_bins > 0 else None
+    return _stats_dicts(q, levels, counts)
+
+
+def _float_keys(values: np.ndarray) -> np.ndarray:
+    """uint64 keys whose unsigned order is the numeric order of the (non-NaN) float64 `values`."""
+    bits = values.view(np.uint64)
+    return np.where(bits & _SIGN_BIT, ~bits, bits | _SIGN_BIT)
+
+
+def _key_floats(keys: np.ndarray) -> np.ndarray:
+    """Inverse of _float_keys."""
+    return np.where(keys & _SIGN_BIT, keys & ~_SIGN_BIT, ~keys).view(np.float64)
+
+
+def _order_statistics(chunks, ranks: np.ndarray) -> np.ndarray:
+    """Exact values at 0-based `ranks` of the float64 values yielded by `chunks()`.
+
+    A radix select over _float_keys, most significant digit first: each of the 64 / RADIX_BITS
+    passes histograms the next digit of the keys that share a target's digits so far, which
+    fixes that digit of every target at once. Memory is one chunk plus 2**RADIX_BITS counts per
+    distinct target, and nothing is sorted.
+    """
+    size = 1 << RADIX_BITS
+    prefix = np.zeros(len(ranks), dtype=np.uint64)
+    remaining = np.asarray(ranks, dtype=np.int64).copy()  # rank among keys sharing the prefix
+    for shift in range(64 - RADIX_BITS, -1, -RADIX_BITS):
+        groups, group_of = np.unique(prefix, return_inverse=True)
+        counts = np.zeros(len(groups) * size, dtype=np.int64)
+        for chunk in chunks():
+            keys = _float_keys(chunk)
+            group = np.zeros(len(keys), dtype=np.int64)
+            if shift + RADIX_BITS < 64:
+                high = keys >> np.uint64(shift + RADIX_BITS)
+                group = np.minimum(np.searchsorted(groups, high), len(groups) - 1)
+                keep = groups[group] == high
+                keys, group = keys[keep], group[keep]
+            digits = ((keys >> np.uint64(shift)) & np.uint64(size - 1)).astype(np.int64)
+            counts += np.bincount(group * size + digits, minlength=len(counts))
+        cumulative = counts.reshape(len(groups), size).cumsum(axis=1)
+        for i, g in enumerate(group_of):
+            digit = int(np.searchsorted(cumulative[g], remaining[i], side="right"))
+            remaining[i] -= cumulative[g, digit - 1] if digit else 0
+            prefix[i] = (prefix[i] << np.uint64(RADIX_BITS)) | np.uint64(digit)
+    return _key_floats(prefix)
+
+
+def _streamed_column_stats(
+    df: pd.DataFrame, columns: List[str], n_bins: int, block_cells: int
+) -> List[Dict[str, Any]]:
+    """column_stats for columns longer than `block_cells`, exact, in chunks of that many rows.
+
+    The quantiles are interpolated from _order_statistics exactly as _quantiles does, so they
+    equal the in-memory results.
+    """
+    data = {name: df[name].to_numpy() for name in columns}
+    levels = stats_levels(n_bins)
+    q = np.full((len(columns), len(levels)), np.nan)
+    for j, name in enumerate(columns):
+
+        def chunks(col=data[name]):
+            for start in range(0, len(col), block_cells):
+                x = np.asarray(col[start : start + block_cells], dtype=np.float64)
+                # Without NaN; + 0.0 turns -0.0 into 0.0, which np.partition treats as equal.
+                yield x[~np.isnan(x)] + 0.0
+
+        n = sum(len(x) for x in chunks())
+        if n == 0:
+            continue
+        pos = levels * (n - 1)
+        lo = np.floor(pos).astype(np.int64)
+        frac = pos - lo
+        ranks = np.unique(np.concatenate([lo, np.minimum(lo + 1, n - 1)]))
+        at = dict(zip(ranks.tolist(), _order_statistics(chunks, ranks)))
+        q[j] = [at[k] if f == 0 else at[k] + (at[k + 1] - at[k]) * f for k, f in zip(lo, frac)]
+    counts = _streamed_histograms(data, columns, q, n_bins, block_cells) if n_bins > 0 else None
+    return _stats_dicts(q, levels, counts)
+
+
+def column_stats(
+    df: pd.DataFrame,
+    columns: List[str],
+    n_bins: int = 0,
+    block_cells: int = STATS_BLOCK_CELLS,
+    sketch_k: int = 0,
+) -> List[Dict[str, Any]]:
+    """min/max/median of each column (plus quantiles and a histogram when `n_bins` > 0).
+
+    Columns are copied into a (columns, rows) float64 block of at most `block_cells` values;
+    the quantiles of a block come from one partition pass (see _quantiles) and its
+    histograms from one np.bincount. NaNs are ignored, as in pandas.
+    Columns longer than `block_cells` are instead read in chunks of that many rows, and their
+    quantiles found by a streaming radix select (_streamed_column_stats); the results are the
+    same. With `sketch_k`, columns are streamed through KLL sketches (quantile_sketch.py) in a
+    single pass: min/max and histograms stay exact, medians and quantiles become approximate.
+    """
+    if sketch_k:
+        return _sketch_column_stats(df, columns, n_bins, sketch_k, block_cells)
+    if len(df) > block_cells:
+        return _streamed_column_stats(df, columns, n_bins, block_cells)
+    levels = stats_levels(n_bins)
+    block = max(1, block_cells // max(len(df), 1))
+    stats = []
+    for start in range(0, len(columns), block):
+        names = columns[start : start + block]
+        X = np.empty((len(names), len(df)), dtype=np.float64)
+        for j, name in enumerate(names):
+            X[j] = df[name].to_numpy(dtype=np.float64)
+        nan_rows = np.isnan(X).any(axis=1)
+        if nan_rows.any():
+            q = np.empty((len(names), len(levels)))
+            for j in range(len(names)):
+                col = X[j][~np.isnan(X[j])] if nan_rows[j] else X[j]
+                q[j] = _quantiles(col, levels) if len(col) else np.nan
+        else:
+            q = _quantiles(X, levels)
+        counts = _histograms(X, q[:, 0], q[:, -1], n_bins) if n_bins > 0 else None
+        stats.extend(_stats_dicts(q, levels, counts))
+    return stats
+
+
+def build_meta(
+    df: pd.DataFrame,
+    feature_names: List[str],
+    target: str,
+    params: Dict[str, Any],
+    stats_bins: int = 0,
+    sketch_k: int = 0,
+) -> Dict[str, Any]:
+    """Model metadata; `stats_bins` > 0 adds quantiles and equal-width histograms per column.
+
+    `sketch_k` > 0 computes approximate medians and quantiles with KLL sketches (see
+    column_stats); meta.json then records the sketch size as statsSketchK.
+    """
+    with span("stats"):
+        stats = column_stats(df, feature_names + [target], n_bins=stats_bins, sketch_k=sketch_k)
+    meta = {
+        "featureNames": feature_names,
+        "target": target,
+        "nTrain": int(len(df)),
+        "params": params,
+        "featureStats": dict(zip(feature_names, stats[:-1])),
+        "targetStats": stats[-1],
+    }
+    if sketch_k:
+        meta["statsSketchK"] = sketch_k
+    if stats_bins > 0:
+        meta["statsQuantileLevels"] = stats_levels(stats_bins).tolist()
+    return meta
+
+
+def export_test_paths(
+    predictor: TreePredictor,
+    df: pd.DataFrame,
+    target: str,
+    source: str,
+    digest: str = "",
+    source_digest: str = "",
+) -> Dict[str, Any]:
+    """Leaf, prediction, error (prediction - target) and path of every row of `df`, in row order.
+
+    Paths are stored once per reached leaf in `leafPaths`: a string of '0' (left) and '1'
+    (right) branch decisions from the root, whose length is the leaf depth. `digest` is the
+    tree's and `source_digest` the SHA-256 of the test file, which the viewer compares with the
+    CSV it loaded.
+    """
+    leaf = predictor.apply(df)
+    pred = predictor.value[leaf]
+    error = pred - df[target].to_numpy(dtype=np.float64)
+    reached = np.unique(leaf)
+    return {
+        "version": 1,
+        "treeDigest": digest,
+        "source": source,
+        "testDigest": source_digest,
+        "target": target,
+        "nSamples": int(len(df)),
+        "leaf": leaf.tolist(),
+        "pred": np.round(pred, 6).tolist(),
+        "error": np.round(error, 6).tolist(),
+        "leafPaths": dict(zip((str(i) for i in reached), predictor.path_codes(reached))),
+        "rmse": float(np.sqrt(np.mean(error**2))),
+        "mae": float(np.mean(np.abs(error))),
+    }
+
 
-    for i in range(sk.node_count):
-        nodes.append(node_dict(i))
+def remove_stale_artifacts(out_dir: Path, written: Iterable[Path]) -> List[Path]:
+    """Delete derived artifacts in `out_dir` that are not in `written`; returns the deleted paths.
 
-    return {"root": 0, "nodes": nodes}
+    Leaving them would pair an old tree.json, layout.bin, predictor.js or test_paths.json with a
+    new tree.
+    """
+    keep = {Path(p).name for p in written}
+    stale = [out_dir / name for name in DERIVED_ARTIFACTS if name not in keep]
+    stale = [p for p in stale if p.exists()]
+    for path in stale:
+        path.unlink()
+    return stale
+
+
+def write_model(
+    tree: DecisionTreeRegressor,
+    feature_names: List[str],
+    meta: Dict[str, Any],
+    out_dir: Path,
+    tree_format: str = "nodes",
+    stream: bool = False,
+    gzip_json: bool = False,
+    js_mode: str | None = "auto",
+    test_df: pd.DataFrame | None = None,
+    test_source: str = "",
+    test_digest: str = "",
+    python_mode: str | None = None,
+    layout: bool = True,
+) -> List[Path]:
+    """Write the model artifacts and then meta.json; returns their paths (tree file first).
+
+    Always writes tree.json (or tree.json.gz) and tree.bin, and layout.bin unless `layout` is
+    False. predictor.js is written unless `js_mode` is None (or "auto" on a tree over
+    JS_AUTO_MAX_NODES nodes), test_paths.json when `test_df` is given (its row count, RMSE and
+    MAE are also added to `meta`) and tree_predictor.py when `python_mode` is set. Artifacts left
+    in `out_dir` by an earlier run that this one did not write (including the other of tree.json
+    and tree.json.gz) are deleted. meta.json comes last, so its artifactBytes lists the sizes of
+    every file written.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tree_path = out_dir / ("tree.json.gz" if gzip_json else "tree.json")
+    if stream or gzip_json:
+        with span("serialize", stream=True):
+            write_tree_json_stream(tree, feature_names, tree_path, tree_format=tree_format)
+    else:
+        with span("export", format=tree_format):
+            if tree_format == "columnar":
+                tree_json = export_tree_columnar(tree, feature_names)
+            else:
+                tree_json = export_tree_json(tree, feature_names)
+        with span("serialize"):
+            tree_path.write_text(json.dumps(tree_json))
+    bin_path = out_dir / "tree.bin"
+    with span("binary"):
+        write_tree_binary(tree_arrays(tree), bin_path)
+        digest = tree_digest(bin_path)
+    meta["treeDigest"] = digest
+    predictor = TreePredictor.from_tree(tree, feature_names)
+    paths = [tree_path, bin_path]
+    if layout:
+        with span("layout"):
+            paths.append(write_layout(predictor, out_dir / LAYOUT_FILE, tree_digest=digest))
+    if js_mode == "auto" and predictor.node_count > JS_AUTO_MAX_NODES:
+        js_mode = None
+    if js_mode is not None:
+        with span("codegen", mode=js_mode, language="js"):
+            paths.append(
+                write_js_predictor(
+                    predictor,
+                    out_dir / JS_PREDICTOR,
+                    mode=js_mode,
+                    source=tree_path.name,
+                    tree_digest=digest,
+                )
+            )
+    if test_df is not None:
+        with span("test_paths"):
+            test_paths = export_test_paths(
+                predictor, test_df, meta["target"], test_source, digest, test_digest
+            )
+            paths.append(out_dir / TEST_PATHS)
+            paths[-1].write_text(json.dumps(test_paths))
+        meta["testRows"] = test_paths["nSamples"]
+        meta["testRmse"] = test_paths["rmse"]
+        meta["testMae"] = test_paths["mae"]
+    if python_mode is not None:
+        with span("codegen", mode=python_mode):
+            paths.append(
+                write_python_predictor(
+                    predictor, out_dir / PYTHON_PREDICTOR, mode=python_mode, source=tree_path.name
+                )
+            )
+    remove_stale_artifacts(out_dir, paths)
+    meta["artifactBytes"] = {path.name: path.stat().st_size for path in paths}
+    paths.append(out_dir / "meta.json")
+    paths[-1].write_text(json.dumps(meta))
+    return paths
 
 
 def main():
     parser = argparse.ArgumentParser(description="Train DecisionTreeRegressor and export JSON")
     parser.add_argument(
+        "--train-data",
         "--train-csv",
+        dest="train_data",
         type=str,
         default="data/california_housing_train.csv",
-        help="Path to training CSV",
+        help="Path to training data (.csv, .parquet, .feather, .npz or a .columns directory)",
     )
     parser.add_argument("--target", type=str, default="MedHouseVal", help="Target column")
     parser.add_argument("--max-depth", type=int, default=6, help="Max tree depth (None for unlimited)")
     parser.add_argument("--min-samples-leaf", type=int, default=20, help="Minimum samples per leaf")
     parser.add_argument("--random-state", type=int, default=42)
     parser.add_argument("--out-dir", type=str, default="model")
+    parser.add_argument(
+        "--tree-format",
+        choices=sorted(TREE_FORMAT_VERSIONS),
+        default="nodes",
+        help="tree.json layout: one object per node, or parallel per-field arrays",
+    )
+    parser.add_argument(
+        "--engine",
+        choices=["sklearn", "hist"],
+        default="sklearn",
+        help="sklearn: exact DecisionTreeRegressor; hist: binned histogram tree (hist_tree.py)",
+    )
+    parser.add_argument(
+        "--out-of-core",
+        action="store_true",
+        help="Use the hist engine on memory-mapped columns (use a .columns --train-data) and "
+        "spill its scratch arrays to --spill-dir",
+    )
+    parser.add_argument(
+        "--spill-dir",
+        type=str,
+        default=None,
+        help="Directory for out-of-core scratch files (default: system temp dir)",
+    )
+    parser.add_argument(
+        "--max-bins", type=int, default=MAX_BINS, help="Histogram bins per feature (hist engine)"
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        help="Worker processes for the hist engine (0 = all cores); the tree does not change. "
+        "Only valid with --engine hist or --out-of-core",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Write tree.json in chunks straight from the fitted tree (flat memory for huge trees)",
+    )
+    parser.add_argument(
+        "--gzip",
+        action="store_true",
+        help="Write a gzip-compressed tree.json.gz (implies --stream)",
+    )
+    parser.add_argument(
+        "--stats-bins",
+        type=int,
+        default=0,
+        help="Add quantiles and histograms with this many bins per column to meta.json",
+    )
+    parser.add_argument(
+        "--sketch-k",
+        type=int,
+        default=0,
+        help="Approximate meta.json medians/quantiles with KLL sketches of this size in one "
+        f"streaming pass (0 = exact, the default; e.g. {DEFAULT_SKETCH_K})",
+    )
+    parser.add_argument(
+        "--stage-cache",
+        type=str,
+        default=default_stage_cache(),
+        help="Stage output cache directory; skip training when nothing changed "
+        "(default: $REGTREE_STAGE_CACHE, unset = disabled)",
+    )
+    parser.add_argument(
+        "--cache-budget-mb",
+        type=int,
+        default=DEFAULT_BUDGET_MB,
+        help="Stage cache size limit; least recently used entries are evicted",
+    )
+    parser.add_argument(
+        "--emit-python",
+        action="store_true",
+        help=f"Also write <out-dir>/{PYTHON_PREDICTOR}, a dependency-free generated predictor",
+    )
+    parser.add_argument(
+        "--test-data",
+        "--test-csv",
+        dest="test_data",
+        type=str,
+        default="data/california_housing_test.csv",
+        help=f"Score this table into <out-dir>/{TEST_PATHS} for the viewer ('' to skip; "
+        "skipped when the file does not exist)",
+    )
+    parser.add_argument(
+        "--no-js",
+        action="store_true",
+        help=f"Skip <out-dir>/{JS_PREDICTOR}; the web viewer then walks the tree arrays itself",
+    )
+    parser.add_argument(
+        "--no-layout",
+        action="store_true",
+        help=f"Skip <out-dir>/{LAYOUT_FILE}; the web viewer then lays the tree out with d3",
+    )
+    parser.add_argument(
+        "--codegen-mode",
+        choices=CODEGEN_MODES,
+        default="auto",
+        help="Generated predictor layout: nested ifs, a flat node table, or auto by tree size",
+    )
+    add_profile_args(parser)
 
     args = parser.parse_args()
 
-    df = pd.read_csv(args.train_csv)
-    feature_names = [c for c in df.columns if c != args.target]
+    out_dir = Path(args.out_dir)
+    profiler = configure_from_args(args, out_dir)
+    engine = "hist" if args.out_of_core else args.engine
+    if args.jobs != 1 and engine != "hist":
+        parser.error("--jobs requires --engine hist (or --out-of-core); sklearn fits use one core")
+    # Flags that change the exported files (--jobs and --spill-dir do not; --out-of-core acts
+    # through engine).
+    cache_params = {
+        "target": args.target,
+        "max_depth": args.max_depth,
+        "min_samples_leaf": args.min_samples_leaf,
+        "random_state": args.random_state,
+        "engine": engine,
+        "max_bins": args.max_bins if engine == "hist" else None,
+        "tree_format": args.tree_format,
+        "gzip": args.gzip,
+        "stats_bins": args.stats_bins,
+        "sketch_k": args.sketch_k,
+        "emit_python": args.codegen_mode if args.emit_python else None,
+        "emit_js": None if args.no_js else args.codegen_mode,
+        "layout": not args.no_layout,
+    }
+    test_data = args.test_data if args.test_data and Path(args.test_data).exists() else None
+    stage_cache = None
+    if args.stage_cache:
+        stage_cache = StageCache(args.stage_cache, args.cache_budget_mb)
+        inputs = {"train": path_digest(args.train_data)}
+        if test_data:
+            inputs["test"] = path_digest(test_data)
+        cache_key = stage_key("train", cache_params, inputs)
+        with span("restore"):
+            restored = stage_cache.restore(cache_key, out_dir)
+        if restored is not None:
+            remove_stale_artifacts(out_dir, restored)
+            print(f"Inputs unchanged; restored {', '.join(str(p) for p in restored)} from cache.")
+            profiler.report()
+            return
 
-    tree = train_tree(
-        df=df,
-        target_col=args.target,
-        max_depth=None if args.max_depth <= 0 else args.max_depth,
-        min_samples_leaf=args.min_samples_leaf,
-        random_state=args.random_state,
-    )
+    with span("load"):
+        df = read_table(args.train_data)
+    feature_names = [c for c in df.columns if c != args.target]
 
-    tree_json = export_tree_json(tree, feature_names)
+    with span("fit", engine=engine) as fit:
+        if engine == "hist":
+            tree = train_hist_tree(
+                df=df,
+                target_col=args.target,
+                max_depth=None if args.max_depth <= 0 else args.max_depth,
+                min_samples_leaf=args.min_samples_leaf,
+                random_state=args.random_state,
+                max_bins=args.max_bins,
+                spill_dir=(args.spill_dir or tempfile.gettempdir()) if args.out_of_core else None,
+                n_jobs=args.jobs,
+            )
+        else:
+            tree = train_tree(
+                df=df,
+                target_col=args.target,
+                max_depth=None if args.max_depth <= 0 else args.max_depth,
+                min_samples_leaf=args.min_samples_leaf,
+                random_state=args.random_state,
+            )
 
     # Meta for client rendering/controls
-    meta = {
-        "featureNames": feature_names,
-        "target": args.target,
-        "nTrain": int(len(df)),
-        "params": {
-            "max_depth": None if args.max_depth <= 0 else args.max_depth,
-            "min_samples_leaf": args.min_samples_leaf,
-            "random_state": args.random_state,
-        },
-        "featureStats": {
-            name: {
-                "min": float(df[name].min()),
-                "max": float(df[name].max()),
-                "median": float(df[name].median()),
-            }
-            for name in feature_names
-        },
-        "targetStats": {
-            "min": float(df[args.target].min()),
-            "max": float(df[args.target].max()),
-            "median": float(df[args.target].median()),
-        },
+    params = {
+        "max_depth": None if args.max_depth <= 0 else args.max_depth,
+        "min_samples_leaf": args.min_samples_leaf,
+        "random_state": args.random_state,
+        "engine": engine,
     }
+    meta = build_meta(
+        df, feature_names, args.target, params, stats_bins=args.stats_bins, sketch_k=args.sketch_k
+    )
+    meta["fitSeconds"] = round(fit.wall, 4)
+    meta["nodeCount"] = int(tree.tree_.node_count)
+    if args.sketch_k:
+        print(f"meta.json medians and quantiles are approximate (KLL sketch, k={args.sketch_k})")
 
-    out_dir = Path(args.out_dir)
-    out_dir.mkdir(parents=True, exist_ok=True)
-    (out_dir / "tree.json").write_text(json.dumps(tree_json))
-    (out_dir / "meta.json").write_text(json.dumps(meta))
+    outputs = write_model(
+        tree,
+        feature_names,
+        meta,
+        out_dir,
+        tree_format=args.tree_format,
+        stream=args.stream,
+        gzip_json=args.gzip,
+        js_mode=None if args.no_js else args.codegen_mode,
+        test_df=read_table(test_data) if test_data else None,
+        test_source=Path(test_data).name if test_data else "",
+        test_digest=path_digest(test_data) if test_data else "",
+        python_mode=args.codegen_mode if args.emit_python else None,
+        layout=not args.no_layout,
+    )
+    tree_path = outputs[0]
+    if test_data:
+        print(f"Test set RMSE {meta['testRmse']:.4f} over {meta['testRows']} rows")
+    if stage_cache is not None:
+        stage_cache.store(cache_key, "train", cache_params, outputs)
 
-    print(f"Exported model JSON to {out_dir}/tree.json and meta to {out_dir}/meta.json")
+    print(
+        f"Exported model JSON to {tree_path} (binary {out_dir}/tree.bin) "
+        f"and meta to {out_dir}/meta.json"
+    )
+    profiler.report()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,97 @@
+"""
+Little-endian binary model format (model/tree.bin) read without parsing by the web client.
+
+Layout:
+- 16-byte header: magic b"RTRB", uint32 version, uint32 node count, int32 root id
+- one column block per field in TREE_BIN_BLOCKS order, each `node_count` elements long and
+  starting on an 8-byte boundary (zero padded), so every block can be viewed in place as a
+  typed array (Int32Array / Float32Array / Float64Array in the browser, np.frombuffer here).
+
+Leaves have left == right == -1; their feature/threshold entries are placeholders.
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Mapping
+
+import numpy as np
+
+from dataset_cache import sha256_file
+
+TREE_BIN_MAGIC = b"RTRB"
+TREE_BIN_VERSION = 1
+TREE_BIN_HEADER = np.dtype([("magic", "S4"), ("version", "<u4"), ("nodeCount", "<u4"), ("root", "<i4")])
+TREE_BIN_BLOCKS = (
+    ("feature", "<i4"),
+    ("left", "<i4"),
+    ("right", "<i4"),
+    ("nSamples", "<i4"),
+    ("threshold", "<f8"),
+    ("value", "<f8"),
+    ("impurity", "<f4"),
+)
+
+
+def _align8(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def tree_arrays(tree) -> Dict[str, np.ndarray]:
+    """Column arrays of a fitted tree (anything exposing sklearn's `tree_` attributes)."""
+    sk = tree.tree_
+    return {
+        "feature": sk.feature,
+        "left": sk.children_left,
+        "right": sk.children_right,
+        "nSamples": sk.n_node_samples,
+        "threshold": sk.threshold,
+        "value": sk.value[:, 0, 0],
+        "impurity": sk.impurity,
+    }
+
+
+def write_tree_binary(columns: Mapping[str, np.ndarray], path: str | Path, root: int = 0) -> int:
+    """Write column arrays to `path` in the tree.bin layout; returns the file size in bytes."""
+    node_count = len(columns["value"])
+    header = np.array([(TREE_BIN_MAGIC, TREE_BIN_VERSION, node_count, root)], dtype=TREE_BIN_HEADER)
+    offset = header.nbytes
+    with open(path, "wb") as fh:
+        fh.write(header.tobytes())
+        for name, dtype in TREE_BIN_BLOCKS:
+            block = np.ascontiguousarray(columns[name], dtype=dtype).tobytes()
+            fh.write(block)
+            offset += len(block)
+            pad = _align8(offset) - offset
+            fh.write(b"\0" * pad)
+            offset += pad
+    return offset
+
+
+def tree_digest(path: str | Path) -> str:
+    """SHA-256 of a tree.bin file, recorded by the artifacts derived from that tree."""
+    return sha256_file(path)
+
+
+def model_tree_digest(model_path: str | Path) -> str:
+    """tree_digest of `model_path` if it is a tree.bin, else of the tree.bin next to it ("" if none)."""
+    model_path = Path(model_path)
+    bin_path = model_path if model_path.suffix == ".bin" else model_path.with_name("tree.bin")
+    return tree_digest(bin_path) if bin_path.exists() else ""
+
+
+def read_tree_binary(path: str | Path) -> Dict[str, Any]:
+    """Map tree.bin and return read-only column views plus `root` and `nodeCount`."""
+    buf = np.memmap(path, dtype=np.uint8, mode="r")
+    header = np.frombuffer(buf, dtype=TREE_BIN_HEADER, count=1)[0]
+    if header["magic"] != TREE_BIN_MAGIC:
+        raise ValueError(f"{path} is not a tree.bin model (bad magic {header['magic']!r})")
+    if header["version"] != TREE_BIN_VERSION:
+        raise ValueError(f"Unsupported tree.bin version {header['version']}")
+    node_count = int(header["nodeCount"])
+    out: Dict[str, Any] = {"root": int(header["root"]), "nodeCount": node_count}
+    offset = TREE_BIN_HEADER.itemsize
+    for name, dtype in TREE_BIN_BLOCKS:
+        out[name] = np.frombuffer(buf, dtype=dtype, count=node_count, offset=offset)
+        offset = _align8(offset + out[name].nbytes)
+    return out
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Compile an exported regression tree into standalone, dependency-free predictor code.
+
+Python: the generated module exposes `predict_one(row)` and `predict_many(rows)`, where a row is
+any sequence of feature values in FEATURE_NAMES order.
+JavaScript: an ES module (model/predictor.js, written by train_tree.py next to tree.json) that
+exports `leafOf(x)` for a numeric feature array, `pathTo(leaf)` (node ids from the root, via
+parent pointers) and `predict(x)`. The web viewer uses it instead of walking the model arrays.
+
+Two layouts are emitted:
+- nested : the tree unrolled into nested `if`/`else` comparisons, one branch per node
+           (fastest; used while the depth stays below CPython's indentation limit)
+- table  : a flat tuple of (feature, cut, left, right) entries walked by a small loop, for
+           deep or very large trees
+
+Trees compare float32-cast features against float64 thresholds (as sklearn and
+predict_tree.py do). Each threshold is turned into the float64 cut at which float32 rounding
+changes the outcome, so the plain `row[i] < cut` tests in the generated code give exactly the
+same leaves for any float input, without casting.
+
+Usage:
+  python scripts/tree_codegen.py --model model/tree.bin --out model/tree_predictor.py
+  python scripts/tree_codegen.py --model model/tree.json --out model/predictor.js
+  python scripts/train_tree.py --emit-python            # writes model/tree_predictor.py
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+from predict_tree import TreePredictor
+from tree_binary import model_tree_digest
+
+# CPython rejects 100 levels of indentation. Nested code uses one per tree level, after the
+# function body's, so a leaf at depth d sits at level d + 1.
+NESTED_MAX_DEPTH = 98
+NESTED_MAX_NODES = 50_000
+CODEGEN_MODES = ("auto", "nested", "table")
+PYTHON_PREDICTOR = "tree_predictor.py"
+JS_PREDICTOR = "predictor.js"
+# train_tree.py writes predictor.js in auto mode only up to this size; the viewer imports the whole
+# module on load, and for larger trees its typed-array walk is the cheaper choice.
+JS_AUTO_MAX_NODES = 100_000
+
+
+def float64_cuts(threshold: np.ndarray) -> np.ndarray:
+    """Cuts c such that `x < c` equals `float32(x) <= threshold` for every float64 x.
+
+    float32(x) <= t holds iff float32(x) <= t32, the largest float32 not above t. Rounding to
+    nearest sends x to t32 or below exactly when x is under the midpoint between t32 and the
+    next float32; at the midpoint itself ties go to the value with an even mantissa.
+    """
+    t = np.asarray(threshold, dtype=np.float64)
+    with np.errstate(over="ignore"):
+        t32 = t.astype(np.float32)
+    above = t32.astype(np.float64) > t
+    t32[above] = np.nextafter(t32[above], np.float32(-np.inf))
+    up = np.nextafter(t32, np.float32(np.inf))
+    mid = (t32.astype(np.float64) + up.astype(np.float64)) / 2
+    tie_rounds_down = (t32.view(np.uint32) & 1) == 0
+    return np.where(tie_rounds_down, np.nextafter(mid, np.inf), mid)
+
+
+def _resolve_mode(predictor: TreePredictor, mode: str) -> str:
+    if mode not in CODEGEN_MODES:
+        raise ValueError(f"mode must be one of {CODEGEN_MODES}, got {mode!r}")
+    if mode == "auto":
+        small = predictor.depth <= NESTED_MAX_DEPTH and predictor.node_count <= NESTED_MAX_NODES
+        mode = "nested" if small else "table"
+    if mode == "nested" and predictor.depth > NESTED_MAX_DEPTH:
+        raise ValueError(
+            f"Tree depth {predictor.depth} exceeds {NESTED_MAX_DEPTH} for nested code; use table"
+        )
+    return mode
+
+
+def _header(predictor: TreePredictor, mode: str, source: str) -> List[str]:
+    names = predictor.feature_names or [f"f{i}" for i in range(predictor.n_features)]
+    return [
+        f'"""Regression tree predictor generated by scripts/tree_codegen.py ({mode} layout).',
+        "",
+        f"Source: {source}. Do not edit; regenerate after retraining.",
+        "Rows are sequences of feature values in FEATURE_NAMES order.",
+        '"""',
+        "",
+        f"FEATURE_NAMES = {tuple(names)!r}",
+        f"NODE_COUNT = {predictor.node_count}",
+        f"DEPTH = {predictor.depth}",
+        "",
+        "",
+    ]
+
+
+def _nested_body(predictor: TreePredictor, cuts: np.ndarray) -> List[str]:
+    lines = []
+    # (node, indent, prefix line emitted before the node's own code)
+    stack: List[Tuple[int, int, str | None]] = [(predictor.root, 1, None)]
+    while stack:
+        node, indent, prefix = stack.pop()
+        pad = "    " * indent
+        if prefix is not None:
+            lines.append("    " * (indent - 1) + prefix)
+        if predictor.is_leaf[node]:
+            lines.append(f"{pad}return {float(predictor.value[node])!r}")
+            continue
+        feature = int(predictor.feature[node])
+        lines.append(f"{pad}if row[{feature}] < {float(cuts[node])!r}:")
+        left, right = predictor.children[node]
+        # Pushed right first so the left branch is written first.
+        stack.append((int(right), indent + 1, "else:"))
+        stack.append((int(left), indent + 1, None))
+    return lines
+
+
+def _table_body(predictor: TreePredictor, cuts: np.ndarray) -> List[str]:
+    lines = ["# (feature, cut, left, right) per node; leaves are (-1, value, id, id).", "_NODES = ("]
+    for node in range(predictor.node_count):
+        left, right = (int(c) for c in predictor.children[node])
+        if predictor.is_leaf[node]:
+            lines.append(f"    (-1, {float(predictor.value[node])!r}, {left}, {right}),")
+        else:
+            feature = int(predictor.feature[node])
+            lines.append(f"    ({feature}, {float(cuts[node])!r}, {left}, {right}),")
+    lines += [
+        ")",
+        "",
+        "",
+        "def predict_one(row, _nodes=_NODES):",
+        '    """Predicted target for one row."""',
+        f"    feature, cut, left, right = _nodes[{predictor.root}]",
+        "    while feature >= 0:",
+        "        feature, cut, left, right = _nodes[left if row[feature] < cut else right]",
+        "    return cut",
+    ]
+    return lines
+
+
+def generate_python(predictor: TreePredictor, mode: str = "auto", source: str = "tree") -> str:
+    """Source code of a standalone predictor module for `predictor`."""
+    mode = _resolve_mode(predictor, mode)
+    cuts = float64_cuts(predictor.threshold)
+    lines = _header(predictor, mode, source)
+    if mode == "nested":
+        lines += ["def predict_one(row):", '    """Predicted target for one row."""']
+        lines += _nested_body(predictor, cuts)
+    else:
+        lines += _table_body(predictor, cuts)
+    lines += [
+        "",
+        "",
+        "def predict_many(rows):",
+        '    """Predicted target for each row of an iterable of rows."""',
+        "    one = predict_one",
+        "    return [one(row) for row in rows]",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def _js_number(value: float) -> str:
+    value = float(value)
+    if np.isnan(value):
+        return "NaN"
+    if np.isinf(value):
+        return "Infinity" if value > 0 else "-Infinity"
+    return repr(value)
+
+
+def _js_array(kind: str, values) -> str:
+    fmt = _js_number if kind == "Float64Array" else (lambda v: str(int(v)))
+    return f"new {kind}([{', '.join(fmt(v) for v in values)}])"
+
+
+def _js_nested(predictor: TreePredictor, cuts: np.ndarray, node: int, indent: int) -> List[str]:
+    pad = "  " * indent
+    if predictor.is_leaf[node]:
+        return [f"{pad}return {node};"]
+    left, right = (int(c) for c in predictor.children[node])
+    return (
+        [f"{pad}if (x[{int(predictor.feature[node])}] < {_js_number(cuts[node])}) {{"]
+        + _js_nested(predictor, cuts, left, indent + 1)
+        + [f"{pad}}} else {{"]
+        + _js_nested(predictor, cuts, right, indent + 1)
+        + [f"{pad}}}"]
+    )
+
+
+def generate_js(
+    predictor: TreePredictor, mode: str = "auto", source: str = "tree", tree_digest: str = ""
+) -> str:
+    """Source of an ES module exporting leafOf(x), pathTo(leaf) and predict(x).
+
+    `tree_digest` (the SHA-256 of tree.bin) is exported as TREE_DIGEST so the viewer can tell
+    whether the module belongs to the tree it loaded.
+    """
+    mode = _resolve_mode(predictor, mode)
+    cuts = float64_cuts(predictor.threshold)
+    names = predictor.feature_names or [f"f{i}" for i in range(predictor.n_features)]
+    feature = np.where(predictor.is_leaf, -1, predictor.feature)
+    lines = [
+        f"// Regression tree predictor generated by scripts/tree_codegen.py ({mode} layout)",
+        f"// from {source}. Do not edit; regenerate after retraining.",
+        "// x is an array of feature values in FEATURE_NAMES order; `x[i] < cut` reproduces the",
+        "// float32 threshold comparison of the trained tree.",
+        f"export const FEATURE_NAMES = {json.dumps(names)};",
+        f"export const TREE_DIGEST = {json.dumps(tree_digest)};",
+        f"export const NODE_COUNT = {predictor.node_count};",
+        f"export const ROOT = {predictor.root};",
+        f"export const PARENT = {_js_array('Int32Array', predictor.parents())};",
+        f"const VALUE = {_js_array('Float64Array', predictor.value)};",
+        "",
+    ]
+    if mode == "nested":
+        lines += ["export function leafOf(x) {"]
+        lines += _js_nested(predictor, cuts, predictor.root, 1)
+        lines += ["}"]
+    else:
+        lines += [
+            f"const FEATURE = {_js_array('Int32Array', feature)};",
+            f"const CUT = {_js_array('Float64Array', np.where(predictor.is_leaf, 0.0, cuts))};",
+            f"const LEFT = {_js_array('Int32Array', predictor.children[:, 0])};",
+            f"const RIGHT = {_js_array('Int32Array', predictor.children[:, 1])};",
+            "",
+            "export function leafOf(x) {",
+            "  let id = ROOT;",
+            "  while (FEATURE[id] >= 0) id = x[FEATURE[id]] < CUT[id] ? LEFT[id] : RIGHT[id];",
+            "  return id;",
+            "}",
+        ]
+    lines += [
+        "",
+        "export function pathTo(leaf) {",
+        "  const path = [];",
+        "  for (let id = leaf; id >= 0; id = PARENT[id]) path.push(id);",
+        "  return path.reverse();",
+        "}",
+        "",
+        "export function predict(x) {",
+        "  return VALUE[leafOf(x)];",
+        "}",
+        "",
+    ]
+    return "\n".join(lines)
+
+
+def write_js_predictor(
+    predictor: TreePredictor,
+    path: str | Path,
+    mode: str = "auto",
+    source: str = "tree",
+    tree_digest: str = "",
+) -> Path:
+    path = Path(path)
+    path.write_text(generate_js(predictor, mode=mode, source=source, tree_digest=tree_digest))
+    return path
+
+
+def write_python_predictor(
+    predictor: TreePredictor, path: str | Path, mode: str = "auto", source: str = "tree"
+) -> Path:
+    path = Path(path)
+    path.write_text(generate_python(predictor, mode=mode, source=source))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a standalone Python or JavaScript tree predictor")
+    parser.add_argument(
+        "--model", type=str, default="model/tree.json", help="Path to tree.json or tree.bin"
+    )
+    parser.add_argument(
+        "--meta", type=str, default=None, help="Path to meta.json (default: next to the model)"
+    )
+    parser.add_argument(
+        "--out",
+        type=str,
+        default=f"model/{PYTHON_PREDICTOR}",
+        help="Output path; a .js or .mjs suffix writes the JavaScript module",
+    )
+    parser.add_argument("--mode", choices=CODEGEN_MODES, default="auto")
+    args = parser.parse_args()
+
+    predictor = TreePredictor.load(args.model, args.meta)
+    source = Path(args.model).name
+    if Path(args.out).suffix in (".js", ".mjs"):
+        digest = model_tree_digest(args.model)
+        path = write_js_predictor(predictor, args.out, args.mode, source, tree_digest=digest)
+    else:
+        path = write_python_predictor(predictor, args.out, mode=args.mode, source=source)
+    print(f"Wrote {path} ({predictor.node_count} nodes, depth {predictor.depth})")
+
+
+if __name__ == "__main__":
+    main()
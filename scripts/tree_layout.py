@@ -0,0 +1,260 @@
+"""
+Tidy tree layout (Reingold-Tilford, in Buchheim et al.'s linear-time form), computed at export.
+
+This is a port of d3-hierarchy's `tree()` layout as the web viewer configures it:
+`nodeSize([36, 140])` and d3's default separation, 1 between siblings and 2 between cousins. It
+produces the same coordinates, so the viewer can draw model/layout.bin directly and skip
+d3.hierarchy, the layout pass and the bounding-box scan on every load. `x` is the breadth
+coordinate (drawn vertically) and `y = depth * 140`. The root is at x = 0.
+
+The walks are iterative, so unlimited-depth trees do not hit the recursion limit. Their state is
+held in NumPy arrays (under 100 bytes per node in total) and the result is written as Float64
+blocks, so neither side builds or parses a per-node JSON list. Nodes that cannot be reached from
+the root get NaN coordinates.
+
+layout.bin format (little-endian, read in place by the web client):
+- 144-byte header (LAYOUT_BIN_HEADER): magic b"RTRL", uint32 version, uint32 node count, int32
+  root, the hex SHA-256 of the tree.bin it was computed from, nodeSize, separation and the bbox
+  (minX, maxX, minY, maxY)
+- x then y, `node_count` float64 values each
+
+Usage:
+  python scripts/tree_layout.py --model model/tree.json --out model/layout.bin
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+
+from predict_tree import TreePredictor
+from tree_binary import model_tree_digest
+
+# Keep in sync with d3tree().nodeSize(...) in web/main.js.
+NODE_SIZE = (36.0, 140.0)
+SIBLING_SEPARATION = 1.0
+COUSIN_SEPARATION = 2.0
+LAYOUT_FILE = "layout.bin"
+LAYOUT_BIN_MAGIC = b"RTRL"
+LAYOUT_BIN_VERSION = 1
+LAYOUT_BIN_HEADER = np.dtype(
+    [
+        ("magic", "S4"),
+        ("version", "<u4"),
+        ("nodeCount", "<u4"),
+        ("root", "<i4"),
+        ("treeDigest", "S64"),
+        ("nodeSize", "<f8", (2,)),
+        ("separation", "<f8", (2,)),
+        ("bbox", "<f8", (4,)),
+    ]
+)
+
+
+def tidy_layout(
+    left: Sequence[int],
+    right: Sequence[int],
+    root: int = 0,
+    node_size: Tuple[float, float] = NODE_SIZE,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """(x, y) of every node for a binary tree given as child arrays (leaves have left < 0)."""
+    n = len(left)
+    top = n  # virtual parent of the root, as in d3; its only child is the root
+    left_a = np.empty(n + 1, dtype=np.int32)
+    right_a = np.empty(n + 1, dtype=np.int32)
+    left_a[:n], right_a[:n] = left, right
+    left_a[top] = right_a[top] = root
+    internal_a = (left_a >= 0) & (left_a != right_a)
+    internal_a[top] = False
+
+    parent_a = np.full(n + 1, -1, dtype=np.int32)
+    index_a = np.zeros(n + 1, dtype=np.int8)  # position among siblings
+    depth_a = np.zeros(n + 1, dtype=np.int32)
+    z_a = np.zeros(n + 1)  # preliminary position
+    mod_a = np.zeros(n + 1)
+    change_a = np.zeros(n + 1)
+    shift_a = np.zeros(n + 1)
+    thread_a = np.full(n + 1, -1, dtype=np.int32)
+    ancestor_a = np.arange(n + 1, dtype=np.int32)
+    default_ancestor_a = np.full(n + 1, -1, dtype=np.int32)  # per parent
+    order_a = np.empty(n, dtype=np.int32)
+
+    # The walks are sequential; indexing through memoryviews yields plain Python ints and floats,
+    # which keeps the loops about as fast as over lists while storage stays 1-8 bytes per entry.
+    lc, rc, internal = left_a.data, right_a.data, internal_a.data
+    parent, index, depth = parent_a.data, index_a.data, depth_a.data
+    z, mod, change, shift = z_a.data, mod_a.data, change_a.data, shift_a.data
+    thread, ancestor, default_ancestor = thread_a.data, ancestor_a.data, default_ancestor_a.data
+    order = order_a.data
+
+    parent[root] = top
+    # Same visiting order as d3's eachAfter: left subtrees finish before their right siblings.
+    stack, count = [root], 0
+    while stack:
+        v = stack.pop()
+        order[count] = v
+        count += 1
+        if internal[v]:
+            for i, child in ((0, lc[v]), (1, rc[v])):
+                parent[child], index[child], depth[child] = v, i, depth[v] + 1
+                stack.append(child)
+
+    def separation(a: int, b: int) -> float:
+        return SIBLING_SEPARATION if parent[a] == parent[b] else COUSIN_SEPARATION
+
+    def next_left(v: int) -> int:
+        return lc[v] if internal[v] else thread[v]
+
+    def next_right(v: int) -> int:
+        return rc[v] if internal[v] else thread[v]
+
+    def move_subtree(wm: int, wp: int, amount: float) -> None:
+        step = amount / (index[wp] - index[wm])
+        change[wp] -= step
+        shift[wp] += amount
+        change[wm] += step
+        z[wp] += amount
+        mod[wp] += amount
+
+    def apportion(v: int, w: int, anc: int) -> int:
+        if w < 0:
+            return anc
+        vip = vop = v
+        vim = w
+        vom = lc[parent[vip]]
+        sip, sop, sim, som = mod[vip], mod[vop], mod[vim], mod[vom]
+        while True:
+            vim, vip = next_right(vim), next_left(vip)
+            if vim < 0 or vip < 0:
+                break
+            vom, vop = next_left(vom), next_right(vop)
+            ancestor[vop] = v
+            amount = z[vim] + sim - z[vip] - sip + separation(vim, vip)
+            if amount > 0:
+                wm = ancestor[vim] if parent[ancestor[vim]] == parent[v] else anc
+                move_subtree(wm, v, amount)
+                sip += amount
+                sop += amount
+            sim += mod[vim]
+            sip += mod[vip]
+            som += mod[vom]
+            sop += mod[vop]
+        if vim >= 0 and next_right(vop) < 0:
+            thread[vop] = vim
+            mod[vop] += sim - sop
+        if vip >= 0 and next_left(vom) < 0:
+            thread[vom] = vip
+            mod[vom] += sip - som
+            anc = v
+        return anc
+
+    for k in range(count - 1, -1, -1):
+        v = order[k]
+        p = parent[v]
+        w = lc[p] if index[v] else -1  # left sibling
+        if internal[v]:
+            a, b = lc[v], rc[v]
+            # d3's executeShifts: the right child's shifts carry over to the left one
+            acc = shift[b] + change[b]
+            z[a] += acc
+            mod[a] += acc
+            midpoint = (z[a] + z[b]) / 2
+            if w >= 0:
+                z[v] = z[w] + separation(v, w)
+                mod[v] = z[v] - midpoint
+            else:
+                z[v] = midpoint
+        elif w >= 0:
+            z[v] = z[w] + separation(v, w)
+        anc = default_ancestor[p] if default_ancestor[p] >= 0 else lc[p]
+        default_ancestor[p] = apportion(v, w, anc)
+
+    mod[top] = -z[root]
+    x = np.full(n, np.nan)
+    y = np.full(n, np.nan)
+    xs = x.data
+    dx, dy = node_size
+    for k in range(count):  # parents before children
+        v = order[k]
+        xs[v] = (z[v] + mod[parent[v]]) * dx
+        mod[v] += mod[parent[v]]
+    reached = order_a[:count]
+    y[reached] = depth_a[reached] * dy
+    return x, y
+
+
+def compute_layout(
+    predictor: TreePredictor, node_size: Tuple[float, float] = NODE_SIZE
+) -> Tuple[np.ndarray, np.ndarray]:
+    left = np.where(predictor.is_leaf, -1, predictor.children[:, 0])
+    right = np.where(predictor.is_leaf, -1, predictor.children[:, 1])
+    return tidy_layout(left, right, predictor.root, node_size)
+
+
+def write_layout(
+    predictor: TreePredictor,
+    path: str | Path,
+    tree_digest: str = "",
+    node_size: Tuple[float, float] = NODE_SIZE,
+) -> Path:
+    """Lay out `predictor`'s tree and write it to `path` in the layout.bin format."""
+    x, y = compute_layout(predictor, node_size)
+    header = np.zeros(1, dtype=LAYOUT_BIN_HEADER)
+    header[0] = (
+        LAYOUT_BIN_MAGIC,
+        LAYOUT_BIN_VERSION,
+        predictor.node_count,
+        predictor.root,
+        tree_digest.encode("ascii"),
+        node_size,
+        (SIBLING_SEPARATION, COUSIN_SEPARATION),
+        (np.nanmin(x), np.nanmax(x), np.nanmin(y), np.nanmax(y)),
+    )
+    path = Path(path)
+    with open(path, "wb") as fh:
+        fh.write(header.tobytes())
+        fh.write(x.astype("<f8").tobytes())
+        fh.write(y.astype("<f8").tobytes())
+    return path
+
+
+def read_layout(path: str | Path) -> Dict[str, Any]:
+    """Map layout.bin and return its header fields plus read-only `x` and `y` views."""
+    buf = np.memmap(path, dtype=np.uint8, mode="r")
+    header = np.frombuffer(buf, dtype=LAYOUT_BIN_HEADER, count=1)[0]
+    if header["magic"] != LAYOUT_BIN_MAGIC:
+        raise ValueError(f"{path} is not a layout.bin file (bad magic {header['magic']!r})")
+    if header["version"] != LAYOUT_BIN_VERSION:
+        raise ValueError(f"Unsupported layout.bin version {header['version']}")
+    n = int(header["nodeCount"])
+    offset = LAYOUT_BIN_HEADER.itemsize
+    return {
+        "nodeCount": n,
+        "root": int(header["root"]),
+        "treeDigest": header["treeDigest"].decode("ascii"),
+        "nodeSize": tuple(header["nodeSize"].tolist()),
+        "separation": tuple(header["separation"].tolist()),
+        "bbox": dict(zip(("minX", "maxX", "minY", "maxY"), header["bbox"].tolist())),
+        "x": np.frombuffer(buf, dtype="<f8", count=n, offset=offset),
+        "y": np.frombuffer(buf, dtype="<f8", count=n, offset=offset + 8 * n),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute the viewer's tree layout")
+    parser.add_argument(
+        "--model", type=str, default="model/tree.json", help="Path to tree.json or tree.bin"
+    )
+    parser.add_argument("--out", type=str, default=f"model/{LAYOUT_FILE}")
+    args = parser.parse_args()
+
+    predictor = TreePredictor.load(args.model)
+    path = write_layout(predictor, args.out, tree_digest=model_tree_digest(args.model))
+    print(f"Wrote layout of {predictor.node_count} nodes to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import json
+import sys
+
+import pytest
+
+import bench_guard
+from bench_guard import DEFAULT_TOLERANCES, HARD_RATIO, MACHINE_METRICS, compare
+
+
+def record(**metrics):
+    return {"stage": "train", "rows": 3000, "depth": 6, **metrics}
+
+
+BASE = [record(seconds=0.010, medianSeconds=0.012, peakRssMb=200.0, artifactBytes=1000)]
+
+
+def statuses(rows):
+    return {row["metric"]: row["status"] for row in rows}
+
+
+def test_compares_median_not_best_run():
+    rows, failed = compare(BASE, [record(seconds=0.5, medianSeconds=0.03)], DEFAULT_TOLERANCES)
+    assert not failed
+    assert statuses(rows) == {"medianSeconds": "ok"}
+
+
+def test_slack_absorbs_noise_on_tiny_cases():
+    current = [record(medianSeconds=0.03, peakRssMb=260.0, artifactBytes=1000)]
+    assert compare(BASE, current, DEFAULT_TOLERANCES)[1] is False
+
+
+def test_machine_metrics_only_warn_in_other_environment():
+    current = [record(medianSeconds=0.04, peakRssMb=300.0, artifactBytes=1000)]
+    rows, failed = compare(BASE, current, DEFAULT_TOLERANCES)
+    assert failed and statuses(rows)["medianSeconds"] == "REGRESSED"
+    rows, failed = compare(BASE, current, DEFAULT_TOLERANCES, MACHINE_METRICS)
+    assert not failed
+    assert statuses(rows) == {
+        "medianSeconds": "WARNING",
+        "peakRssMb": "WARNING",
+        "artifactBytes": "ok",
+    }
+
+
+def test_large_slowdowns_fail():
+    base = [record(medianSeconds=0.5)]
+    rows, failed = compare(base, [record(medianSeconds=0.5 * 1.49)], DEFAULT_TOLERANCES)
+    assert failed and statuses(rows)["medianSeconds"] == "REGRESSED"
+
+
+def test_large_regressions_fail_in_other_environment():
+    current = [record(medianSeconds=0.012 * HARD_RATIO + 0.05, peakRssMb=380.0)]
+    rows, failed = compare(BASE, current, DEFAULT_TOLERANCES, MACHINE_METRICS)
+    assert failed
+    assert statuses(rows) == {"medianSeconds": "REGRESSED", "peakRssMb": "WARNING"}
+
+
+def test_only_library_versions_count_as_environment_changes(tmp_path, monkeypatch, capsys):
+    env = {"python": "3.11.7", "numpy": "2.4.6", "sklearn": "1.9.1", "platform": "a", "cpuCount": 8}
+    baseline = {"environment": env, "results": BASE}
+    (tmp_path / "baseline.json").write_text(json.dumps(baseline))
+    slow = [record(medianSeconds=0.04, artifactBytes=1000)]
+
+    def run(**changes):
+        report = {"environment": {**env, **changes}, "results": slow}
+        (tmp_path / "latest.json").write_text(json.dumps(report))
+        argv = ["bench_guard.py", f"--baseline={tmp_path / 'baseline.json'}"]
+        monkeypatch.setattr(sys, "argv", argv + [f"--results={tmp_path / 'latest.json'}"])
+        with pytest.raises(SystemExit) as exc:
+            bench_guard.main()
+        return exc.value.code
+
+    assert run(platform="b", cpuCount=2) == 1
+    assert run(numpy="2.5.0") == 0
+    assert "numpy" in capsys.readouterr().out
+
+
+def test_artifact_growth_and_missing_cases_still_fail():
+    current = [record(medianSeconds=0.012, artifactBytes=1001)]
+    assert compare(BASE, current, DEFAULT_TOLERANCES, MACHINE_METRICS)[1]
+    rows, failed = compare(BASE, [], DEFAULT_TOLERANCES, MACHINE_METRICS)
+    assert failed and rows[0]["status"] == "MISSING"
+
+
+def test_missing_baseline_is_an_error_without_update(tmp_path, monkeypatch):
+    missing = tmp_path / "baseline.jsn"
+    monkeypatch.setattr(sys, "argv", ["bench_guard.py", f"--baseline={missing}"])
+    monkeypatch.setattr(bench_guard, "run_benchmarks", lambda *a, **k: pytest.fail("ran"))
+    with pytest.raises(SystemExit, match="does not exist"):
+        bench_guard.main()
+    assert not missing.exists()
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import train_tree
+
+
+@pytest.fixture
+def df():
+    rng = np.random.default_rng(0)
+    a = rng.normal(scale=1e3, size=301)
+    a[::7] = np.nan
+    return pd.DataFrame(
+        {
+            "a": a,
+            "b": rng.integers(0, 5, 301).astype(float),  # heavy ties
+            "c": np.concatenate([[-0.0, 0.0, -1e-300, 1e300, -1e300], rng.normal(size=296)]),
+            "f32": rng.normal(size=301).astype(np.float32),
+            "empty": np.full(301, np.nan),
+        }
+    )
+
+
+@pytest.mark.parametrize("n_bins", [0, 4, 7])
+def test_long_columns_stream_with_exact_results(df, n_bins):
+    columns = list(df.columns)
+    exact = train_tree.column_stats(df, columns, n_bins=n_bins)
+    streamed = train_tree.column_stats(df, columns, n_bins=n_bins, block_cells=50)
+    assert streamed[:-1] == exact[:-1]
+    assert all(np.isnan(streamed[-1][k]) for k in ("min", "max", "median"))
+
+
+def test_order_statistics_match_sort():
+    rng = np.random.default_rng(1)
+    values = np.concatenate([rng.normal(size=5000), rng.integers(-3, 3, 5000), [-np.inf, np.inf]])
+    ranks = np.array([0, 1, 2500, 4999, 5000, 9999, 10001])
+    chunks = lambda: (values[i : i + 999] for i in range(0, len(values), 999))  # noqa: E731
+    np.testing.assert_array_equal(
+        train_tree._order_statistics(chunks, ranks), np.sort(values)[ranks]
+    )
+
+
+def test_sketch_is_opt_in(df):
+    exact = train_tree.column_stats(df, ["a", "b"], n_bins=4, block_cells=50)
+    sketched = train_tree.column_stats(df, ["a", "b"], n_bins=4, block_cells=50, sketch_k=8)
+    for e, s in zip(exact, sketched):
+        assert (s["min"], s["max"], s["histogram"]) == (e["min"], e["max"], e["histogram"])
+    meta = train_tree.build_meta(df, ["a"], "b", {})
+    assert "statsSketchK" not in meta
+    assert train_tree.build_meta(df, ["a"], "b", {}, sketch_k=8)["statsSketchK"] == 8
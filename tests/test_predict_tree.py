@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeRegressor
+
+from predict_tree import TreePredictor
+from train_tree import export_tree_columnar, export_tree_json
+from tree_binary import tree_arrays, write_tree_binary
+from tree_codegen import generate_python
+
+FEATURES = ["a", "b", "c"]
+
+
+@pytest.fixture(scope="module")
+def fitted():
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(3000, 3))
+    y = X[:, 0] * X[:, 1] + np.sin(X[:, 2])
+    tree = DecisionTreeRegressor(max_depth=10, min_samples_leaf=3, random_state=0).fit(X, y)
+    # Rows at and around every threshold, where float32 rounding decides the branch.
+    t = tree.tree_.threshold[tree.tree_.children_left >= 0]
+    probes = np.concatenate([t, np.nextafter(t, -np.inf), np.nextafter(t, np.inf)])
+    rows = np.vstack([X, rng.choice(probes, size=(5000, 3))])
+    return tree, rows
+
+
+def load(kind, tree, tmp_path):
+    if kind == "bin":
+        path = tmp_path / "tree.bin"
+        write_tree_binary(tree_arrays(tree), path)
+    else:
+        export = export_tree_columnar if kind == "columnar" else export_tree_json
+        path = tmp_path / "tree.json"
+        path.write_text(json.dumps(export(tree, FEATURES)))
+    (tmp_path / "meta.json").write_text(json.dumps({"featureNames": FEATURES}))
+    return TreePredictor.load(path)
+
+
+@pytest.mark.parametrize("kind", ["nodes", "columnar", "bin"])
+def test_matches_sklearn(fitted, kind, tmp_path):
+    tree, rows = fitted
+    predictor = load(kind, tree, tmp_path)
+    np.testing.assert_array_equal(predictor.apply(rows, chunk_rows=1000), tree.apply(rows))
+    np.testing.assert_array_equal(predictor.predict(rows), tree.predict(rows))
+    df = pd.DataFrame(rows[:, ::-1], columns=FEATURES[::-1])  # columns picked by name
+    np.testing.assert_array_equal(predictor.predict(df), tree.predict(rows))
+
+
+def test_nan_goes_right_like_generated_predictors(fitted):
+    tree, rows = fitted
+    predictor = TreePredictor.from_tree(tree, FEATURES)
+    rows = rows[:500].copy()
+    rows[::3, 0] = np.nan
+    rows[1::3, 1:] = np.nan
+    leaves = predictor.apply(rows)
+    # Walk each row by hand, sending NaN to the right child.
+    expected = []
+    for row in rows:
+        node = predictor.root
+        while not predictor.is_leaf[node]:
+            x = np.float32(row[predictor.feature[node]])
+            node = predictor.children[node, 0 if x <= predictor.threshold[node] else 1]
+        expected.append(node)
+    np.testing.assert_array_equal(leaves, expected)
+    namespace = {}
+    exec(generate_python(predictor, mode="table"), namespace)
+    np.testing.assert_array_equal(predictor.value[leaves], namespace["predict_many"](rows.tolist()))
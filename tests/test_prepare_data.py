@@ -0,0 +1,88 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import prepare_data
+from dataset_cache import store_frame
+
+
+@pytest.fixture
+def data_home(tmp_path):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"MedInc": rng.normal(size=500), "HouseAge": rng.integers(1, 50, 500)})
+    df["MedHouseVal"] = df["MedInc"] + rng.normal(scale=0.1, size=500)
+    home = tmp_path / "home"
+    store_frame(home, prepare_data.DATASET_NAME, df)
+    return home
+
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, "argv", ["prepare_data.py", *argv])
+    prepare_data.main()
+
+
+def test_stage_cache_hit_skips_loading(data_home, tmp_path, monkeypatch):
+    argv = [
+        "--offline",
+        f"--data-home={data_home}",
+        f"--stage-cache={tmp_path / 'store'}",
+        "--train-size=200",
+        "--test-size=50",
+    ]
+    run_main(monkeypatch, *argv, f"--out-dir={tmp_path / 'a'}")
+
+    def fail(*args, **kwargs):
+        raise AssertionError("a cache hit must not load the dataset")
+
+    monkeypatch.setattr(prepare_data, "load_california_housing", fail)
+    run_main(monkeypatch, *argv, f"--out-dir={tmp_path / 'b'}")
+    for name in ("california_housing_train.csv", "california_housing_test.csv"):
+        assert (tmp_path / "b" / name).read_bytes() == (tmp_path / "a" / name).read_bytes()
+    with pytest.raises(AssertionError):  # a flag change is a miss
+        run_main(monkeypatch, *argv, "--bins=5", f"--out-dir={tmp_path / 'c'}")
+
+
+@pytest.fixture
+def codes():
+    rng = np.random.default_rng(1)
+    # Uneven strata, including one smaller than the number of folds used below.
+    return rng.choice(6, size=1003, p=[0.4, 0.25, 0.2, 0.1, 0.048, 0.002]).astype(np.int8)
+
+
+@pytest.mark.parametrize("train_size,test_size", [(700, 300), (1, 1), (17, 986), (500, 3)])
+def test_split_sizes_are_exact_and_disjoint(codes, train_size, test_size):
+    train, test = prepare_data.stratified_split_indices(codes, train_size, test_size, 3)
+    assert len(train) == train_size and len(test) == test_size
+    assert len(np.union1d(train, test)) == train_size + test_size
+    assert train.min() >= 0 and max(train.max(), test.max()) < len(codes)
+    # Each stratum's train share is within one row of proportional (test quotas are capped by
+    # the rows train left over, so they can drift further when the split takes almost every row).
+    counts = np.bincount(codes)
+    share = np.bincount(codes[train], minlength=len(counts))
+    assert np.all(np.abs(share - counts * train_size / len(codes)) < 1 + 1e-9)
+
+
+@pytest.mark.parametrize("n_folds", [2, 5, 7])
+def test_folds_cover_every_row_once(codes, n_folds):
+    folds = prepare_data.stratified_kfold_indices(codes, n_folds, random_state=3)
+    assert len(folds) == n_folds
+    tests = np.concatenate([test for _, test in folds])
+    np.testing.assert_array_equal(np.sort(tests), np.arange(len(codes)))
+    sizes = [len(test) for _, test in folds]
+    assert max(sizes) - min(sizes) <= 1
+    for train, test in folds:
+        np.testing.assert_array_equal(np.union1d(train, test), np.arange(len(codes)))
+        assert len(train) + len(test) == len(codes)
+
+
+def test_repeated_splits_do_not_depend_on_jobs(codes):
+    seeds = [3, 4, 5]
+    serial = prepare_data.repeated_split_indices(codes, 300, 100, seeds)
+    parallel = prepare_data.repeated_split_indices(codes, 300, 100, seeds, n_jobs=2)
+    for (a_train, a_test), (b_train, b_test), seed in zip(serial, parallel, seeds):
+        np.testing.assert_array_equal(a_train, b_train)
+        np.testing.assert_array_equal(a_test, b_test)
+        single = prepare_data.stratified_split_indices(codes, 300, 100, seed)
+        np.testing.assert_array_equal(a_train, single[0])
@@ -0,0 +1,58 @@
+import pytest
+
+from profiling import Profiler, configure, get_profiler, span
+
+
+@pytest.fixture(autouse=True)
+def reset_profiler():
+    yield
+    configure()
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_span_propagates_exceptions(enabled, tmp_path):
+    configure(enabled, tmp_path / "trace.jsonl" if enabled else None)
+    with pytest.raises(ValueError, match="boom"):
+        with span("x"):
+            raise ValueError("boom")
+
+
+@pytest.mark.parametrize("enabled", [False, True])
+def test_nested_span_propagates_keyboard_interrupt(enabled):
+    configure(enabled)
+    with pytest.raises(KeyboardInterrupt):
+        with span("outer"):
+            with span("inner"):
+                raise KeyboardInterrupt
+
+
+def test_failed_span_is_still_recorded_when_enabled(tmp_path):
+    profiler = configure(True, tmp_path / "trace.jsonl")
+    with pytest.raises(RuntimeError):
+        with span("load"):
+            raise RuntimeError
+    assert [s.name for s in profiler.spans] == ["load"]
+    assert (tmp_path / "trace.jsonl").read_text().count("\n") == 1
+
+
+def test_disabled_profiler_keeps_nothing_but_times_spans():
+    profiler = get_profiler()
+    assert not profiler.enabled
+    with span("fit") as s:
+        sum(range(1000))
+    assert s.wall > 0
+    assert profiler.spans == []
+
+
+def test_nested_paths_and_peaks():
+    profiler = Profiler(enabled=True)
+    try:
+        with profiler.span("outer"):
+            with profiler.span("inner"):
+                block = bytearray(4 << 20)
+            del block
+        outer, inner = sorted(profiler.spans, key=lambda s: s.depth)
+        assert inner.path == "outer/inner"
+        assert outer.peak_mb >= inner.peak_mb >= 4
+    finally:
+        profiler.close()
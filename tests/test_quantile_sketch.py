@@ -0,0 +1,61 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from quantile_sketch import KLLSketch, sketch_columns
+
+LEVELS = np.linspace(0, 1, 101)
+
+
+def max_rank_error(sketch, values):
+    """Largest gap between a sketch quantile's true rank and its level, over LEVELS."""
+    ordered = np.sort(values)
+    est = sketch.quantiles(LEVELS)
+    lo = np.searchsorted(ordered, est, side="left") / len(values)
+    hi = np.searchsorted(ordered, est, side="right") / len(values)
+    return float(np.max(np.maximum(lo - LEVELS, LEVELS - hi).clip(min=0)))
+
+
+@pytest.mark.parametrize("k", [100, 200, 800])
+def test_rank_error_within_bound(k):
+    values = np.random.default_rng(k).lognormal(size=200_000)
+    sketch = KLLSketch(k, seed=0)
+    for chunk in np.array_split(values, 37):
+        sketch.update(chunk)
+    assert sketch.n == len(values)
+    assert max_rank_error(sketch, values) <= 2.5 / k
+    assert (sketch.quantile(0), sketch.quantile(1)) == (values.min(), values.max())
+    assert len(sketch) < 4 * k
+
+
+def test_merged_sketches_stay_accurate():
+    values = np.random.default_rng(0).normal(size=120_000)
+    parts = [KLLSketch(200, seed=i).update(part) for i, part in enumerate(np.array_split(values, 6))]
+    merged = parts[0]
+    for part in parts[1:]:
+        merged.merge(pickle.loads(pickle.dumps(part)))  # as returned by a worker process
+    assert merged.n == len(values)
+    assert max_rank_error(merged, values) <= 2.5 / 200
+    assert (merged.min, merged.max) == (values.min(), values.max())
+    with pytest.raises(ValueError):
+        merged.merge(KLLSketch(100))
+
+
+def test_small_inputs_are_exact_and_nans_skipped():
+    sketch = KLLSketch(200, seed=0).update([3.0, np.nan, 1.0, 2.0])
+    assert sketch.n == 3
+    np.testing.assert_array_equal(sketch.quantiles([0, 0.5, 1]), [1.0, 2.0, 3.0])
+    np.testing.assert_array_equal(sketch.rank([0.5, 2.0, 9.0]), [0, 2 / 3, 1])
+    assert np.isnan(KLLSketch().quantile(0.5))
+
+
+def test_sketch_columns_matches_single_sketches():
+    rng = np.random.default_rng(0)
+    columns = {"a": rng.normal(size=5000), "b": rng.uniform(size=5000)}
+    sketches = sketch_columns(columns, k=64, chunk_rows=1000, seed=0)
+    for name, col in columns.items():
+        single = KLLSketch(64, seed=0)
+        for start in range(0, 5000, 1000):
+            single.update(col[start : start + 1000])
+        np.testing.assert_array_equal(sketches[name].quantiles(LEVELS), single.quantiles(LEVELS))
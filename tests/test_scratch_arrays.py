@@ -0,0 +1,35 @@
+import multiprocessing as mp
+
+import numpy as np
+
+from scratch_arrays import ScratchArray, open_scratch
+
+
+def _add_one(args):
+    handle, start, stop = args
+    array, shm = open_scratch(handle)
+    array[start:stop] += 1
+    total = float(array[start:stop].sum())
+    del array
+    if shm is not None:
+        shm.close()
+    return total
+
+
+def test_private_array_has_no_handle():
+    scratch = ScratchArray(None, "private", (4,), np.int32)
+    assert scratch.handle() is None
+    scratch.release()
+
+
+def test_workers_write_through_shared_and_file_handles(tmp_path):
+    for tmp in (None, str(tmp_path)):
+        scratch = ScratchArray(tmp, "values", (1000,), np.float64, shared=True)
+        scratch.array[:] = np.arange(1000)
+        tasks = [(scratch.handle(), start, start + 250) for start in range(0, 1000, 250)]
+        with mp.get_context().Pool(2) as pool:
+            totals = pool.map(_add_one, tasks)
+        np.testing.assert_array_equal(scratch.array, np.arange(1000) + 1)
+        assert sum(totals) == float((np.arange(1000) + 1).sum())
+        scratch.release()
+        assert scratch.shm is None
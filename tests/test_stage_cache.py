@@ -0,0 +1,83 @@
+import itertools
+
+import pytest
+
+import stage_cache
+from stage_cache import StageCache, path_digest, stage_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Distinct, increasing lastUsed times so LRU order does not depend on timer resolution.
+    ticks = itertools.count(1000)
+    monkeypatch.setattr(stage_cache.time, "time", lambda: float(next(ticks)))
+
+
+def write_outputs(tmp_path, name, size):
+    out = tmp_path / "out" / name
+    out.mkdir(parents=True)
+    (out / "a.bin").write_bytes(b"a" * size)
+    (out / "sub").mkdir()
+    (out / "sub" / "b.txt").write_text("b")
+    return out
+
+
+def test_store_restore_roundtrip(tmp_path, clock):
+    out = write_outputs(tmp_path, "run", 100)
+    cache = StageCache(tmp_path / "store")
+    assert cache.restore("k", tmp_path / "dest") is None
+    assert cache.store("k", "train", {"depth": 3}, [out / "a.bin", out / "sub"])
+    (out / "a.bin").write_bytes(b"changed")  # outputs are copied, not linked
+    restored = cache.restore("k", tmp_path / "dest")
+    assert [p.name for p in restored] == ["a.bin", "sub"]
+    assert (tmp_path / "dest" / "a.bin").read_bytes() == b"a" * 100
+    assert (tmp_path / "dest" / "sub" / "b.txt").read_text() == "b"
+
+
+def test_key_changes_with_flags_inputs_and_code(tmp_path, monkeypatch):
+    data = tmp_path / "train.csv"
+    data.write_text("x,y\n1,2\n")
+    key = stage_key("train", {"depth": 3}, {"train": path_digest(data)})
+    assert key == stage_key("train", {"depth": 3}, {"train": path_digest(data)})
+    assert key != stage_key("train", {"depth": 4}, {"train": path_digest(data)})
+    assert key != stage_key("prepare", {"depth": 3}, {"train": path_digest(data)})
+    data.write_text("x,y\n1,3\n")
+    assert key != stage_key("train", {"depth": 3}, {"train": path_digest(data)})
+    data.write_text("x,y\n1,2\n")
+    monkeypatch.setattr(stage_cache, "code_digest", lambda: "edited")
+    assert key != stage_key("train", {"depth": 3}, {"train": path_digest(data)})
+
+
+def test_directory_digest_covers_names_and_contents(tmp_path):
+    out = write_outputs(tmp_path, "run", 10)
+    digest = path_digest(out)
+    (out / "sub" / "b.txt").write_text("c")
+    assert path_digest(out) != digest
+    (out / "sub" / "b.txt").write_text("b")
+    (out / "sub" / "b.txt").rename(out / "sub" / "c.txt")
+    assert path_digest(out) != digest
+
+
+def test_lru_eviction_under_budget(tmp_path, clock):
+    cache = StageCache(tmp_path / "store")
+    cache.budget_bytes = 2500
+    outs = {k: write_outputs(tmp_path, k, 1000) for k in "abc"}
+    assert cache.store("a", "train", {}, [outs["a"]])
+    assert cache.store("b", "train", {}, [outs["b"]])
+    assert cache.restore("a", tmp_path / "dest") is not None  # a is now more recent than b
+    assert cache.store("c", "train", {}, [outs["c"]])
+    assert cache.restore("b", tmp_path / "dest") is None
+    assert cache.restore("a", tmp_path / "dest") is not None
+    assert cache.restore("c", tmp_path / "dest") is not None
+
+
+def test_newest_entry_is_kept_and_oversized_outputs_are_refused(tmp_path, clock):
+    cache = StageCache(tmp_path / "store")
+    cache.budget_bytes = 1500
+    assert cache.store("a", "train", {}, [write_outputs(tmp_path, "a", 1000)])
+    assert cache.store("b", "train", {}, [write_outputs(tmp_path, "b", 1000)])
+    assert cache.restore("a", tmp_path / "dest") is None
+    assert cache.restore("b", tmp_path / "dest") is not None
+    assert not cache.store("c", "train", {}, [write_outputs(tmp_path, "c", 2000)])
+    assert cache.restore("c", tmp_path / "dest") is None
+    assert cache.restore("b", tmp_path / "dest") is not None
@@ -0,0 +1,38 @@
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+import sweep_tree
+from stage_cache import path_digest
+
+
+def test_best_model_is_exported_like_train_tree(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.normal(size=400), "b": rng.normal(size=400)})
+    df["y"] = np.sin(df["a"]) + df["b"] + rng.normal(scale=0.1, size=400)
+    df[:300].to_csv(tmp_path / "train.csv", index=False)
+    df[300:].to_csv(tmp_path / "test.csv", index=False)
+    out_dir = tmp_path / "model"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "sweep_tree.py",
+            f"--train-data={tmp_path / 'train.csv'}",
+            f"--test-data={tmp_path / 'test.csv'}",
+            "--target=y",
+            "--max-depth=2,4",
+            "--min-samples-leaf=5",
+            f"--out-dir={out_dir}",
+        ],
+    )
+    sweep_tree.main()
+    meta = json.loads((out_dir / "meta.json").read_text())
+    test_paths = json.loads((out_dir / "test_paths.json").read_text())
+    assert meta["fitSeconds"] >= 0
+    assert meta["nodeCount"] == len(json.loads((out_dir / "tree.json").read_text())["nodes"])
+    assert meta["testRows"] == 100 and meta["testRmse"] == meta["sweep"]["testRmse"]
+    assert test_paths["source"] == "test.csv"
+    assert test_paths["testDigest"] == path_digest(tmp_path / "test.csv")
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.tree import DecisionTreeRegressor
+
+from predict_tree import TreePredictor
+from tree_codegen import NESTED_MAX_DEPTH, float64_cuts, generate_python
+
+
+def boundary_probes(t: np.ndarray) -> np.ndarray:
+    """float64 values at and around each threshold and its neighbouring float32 values."""
+    t32 = t.astype(np.float32)
+    neighbours = [np.nextafter(t32, np.float32(-np.inf)), t32, np.nextafter(t32, np.float32(np.inf))]
+    points = [t] + [n.astype(np.float64) for n in neighbours]
+    # Midpoints between consecutive float32 values are where float32(x) changes.
+    points += [
+        (a.astype(np.float64) + b.astype(np.float64)) / 2 for a, b in zip(neighbours, neighbours[1:])
+    ]
+    probes = []
+    for p in points:
+        probes += [p, np.nextafter(p, -np.inf), np.nextafter(p, np.inf)]
+    return np.stack(probes, axis=1)
+
+
+def test_float64_cuts_reproduce_float32_comparison():
+    rng = np.random.default_rng(0)
+    t32 = rng.normal(scale=1e3, size=4000).astype(np.float32)
+    thresholds = np.concatenate(
+        [
+            rng.normal(scale=1e3, size=4000),
+            rng.uniform(-1, 1, 4000) * 10.0 ** rng.integers(-30, 30, 4000),
+            t32.astype(np.float64),  # exactly representable
+            (t32.astype(np.float64) + np.nextafter(t32, np.float32(np.inf))) / 2,  # float32 midpoints
+            [0.0, -0.0, 1.5, -1.5, 2.0**-149, 2.0**-126],
+        ]
+    )
+    cuts = float64_cuts(thresholds)
+    x = boundary_probes(thresholds)
+    expected = x.astype(np.float32) <= thresholds[:, None]
+    assert np.count_nonzero((x < cuts[:, None]) != expected) == 0
+
+
+def test_generated_python_matches_predictor():
+    rng = np.random.default_rng(1)
+    X = pd.DataFrame(rng.normal(size=(3000, 3)), columns=["a", "b", "c"])
+    y = X["a"] * X["b"] + np.sin(X["c"])
+    tree = DecisionTreeRegressor(max_depth=8, random_state=0).fit(X.to_numpy(), y)
+    predictor = TreePredictor.from_tree(tree, list(X.columns))
+    # Probe every threshold from both sides, where float32 rounding matters.
+    t = tree.tree_.threshold[tree.tree_.children_left >= 0]
+    probes = boundary_probes(t).ravel()
+    rows = np.vstack([rng.choice(probes, size=(20000, 3)), X.to_numpy()])
+    for mode in ("nested", "table"):
+        namespace = {}
+        exec(generate_python(predictor, mode=mode), namespace)
+        got = np.array(namespace["predict_many"](rows.tolist()))
+        np.testing.assert_array_equal(got, tree.predict(rows))
+
+
+def chain_tree(depth: int) -> TreePredictor:
+    """Node i < depth splits on x <= i: left is a leaf of value i, right is node i + 1."""
+    internal = np.arange(depth)
+    leaves = np.arange(depth, 2 * depth + 1)
+    left = np.concatenate([leaves[:-1], np.full(depth + 1, -1)])
+    right = np.concatenate([internal[1:], [leaves[-1]], np.full(depth + 1, -1)])
+    threshold = np.concatenate([internal + 0.5, np.zeros(depth + 1)])
+    value = np.concatenate([np.zeros(depth), np.arange(depth + 1, dtype=np.float64)])
+    return TreePredictor(np.zeros(2 * depth + 1), threshold, left, right, value, 0, ["x"])
+
+
+def test_nested_code_compiles_at_max_depth():
+    predictor = chain_tree(NESTED_MAX_DEPTH)
+    assert predictor.depth == NESTED_MAX_DEPTH
+    namespace = {}
+    exec(generate_python(predictor, mode="nested"), namespace)
+    rows = [[float(x)] for x in range(NESTED_MAX_DEPTH + 2)]
+    assert namespace["predict_many"](rows) == predictor.predict(np.array(rows)).tolist()
+    assert "_NODES" not in generate_python(predictor, mode="auto")
+    with pytest.raises(ValueError, match="use table"):
+        generate_python(chain_tree(NESTED_MAX_DEPTH + 1), mode="nested")
+    assert "_NODES" in generate_python(chain_tree(NESTED_MAX_DEPTH + 1), mode="auto")
@@ -0,0 +1,90 @@
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from predict_tree import TreePredictor
+from tree_layout import NODE_SIZE, read_layout, tidy_layout, write_layout
+
+DX, DY = NODE_SIZE
+
+
+def random_tree(n_splits, rng, chain=False):
+    """Child arrays of a tree grown by splitting random (or always the last) leaves."""
+    left, right, leaves = [-1], [-1], [0]
+    for _ in range(n_splits):
+        i = len(leaves) - 1 if chain else int(rng.integers(len(leaves)))
+        v = leaves.pop(i)
+        left[v], right[v] = len(left), len(left) + 1
+        left += [-1, -1]
+        right += [-1, -1]
+        leaves += [left[v], right[v]]
+    return np.array(left), np.array(right)
+
+
+# Coordinates d3.tree().nodeSize([36, 140]) gives for the same trees.
+@pytest.mark.parametrize(
+    "left,right,x",
+    [
+        ([-1], [-1], [0]),
+        ([1, -1, -1], [2, -1, -1], [0, -18, 18]),
+        ([1, 3, -1, -1, -1], [2, 4, -1, -1, -1], [0, -18, 18, -36, 0]),
+        ([1, 3, 5, -1, -1, -1, -1], [2, 4, 6, -1, -1, -1, -1], [0, -54, 54, -72, -36, 36, 72]),
+    ],
+)
+def test_matches_d3_on_small_trees(left, right, x):
+    got_x, got_y = tidy_layout(left, right)
+    np.testing.assert_array_equal(got_x, x)
+    depth = [0] * len(left)
+    for v in range(len(left)):
+        if left[v] >= 0:
+            depth[left[v]] = depth[right[v]] = depth[v] + 1
+    np.testing.assert_array_equal(got_y, np.array(depth) * DY)
+
+
+@pytest.mark.parametrize("n_splits,chain", [(200, False), (2000, False), (300, True)])
+def test_tidy_invariants(n_splits, chain):
+    left, right = random_tree(n_splits, np.random.default_rng(n_splits), chain)
+    x, y = tidy_layout(left, right)
+    assert x[0] == 0
+    internal = left >= 0
+    # Parents are centred over their children.
+    np.testing.assert_allclose(x[internal], (x[left[internal]] + x[right[internal]]) / 2, atol=1e-9)
+    # Left to right within each level, nodes keep their order and d3's separation:
+    # one node width between siblings, two between cousins.
+    parent = np.full(len(left), -1)
+    parent[left[internal]] = np.flatnonzero(internal)
+    parent[right[internal]] = np.flatnonzero(internal)
+    levels = defaultdict(list)
+    stack = [0]
+    while stack:
+        v = stack.pop()
+        levels[y[v]].append(v)
+        if internal[v]:
+            stack += [right[v], left[v]]
+    for nodes in levels.values():
+        gaps = np.diff(x[nodes])
+        need = np.where(parent[nodes[1:]] == parent[nodes[:-1]], DX, 2 * DX)
+        assert np.all(gaps >= need - 1e-9)
+
+
+def test_unreachable_nodes_get_nan():
+    x, y = tidy_layout([1, -1, -1, -1], [2, -1, -1, -1])
+    np.testing.assert_array_equal(x[:3], [0, -18, 18])
+    assert np.isnan(x[3]) and np.isnan(y[3])
+
+
+def test_layout_bin_round_trip(tmp_path):
+    left, right = random_tree(50, np.random.default_rng(0))
+    n = len(left)
+    predictor = TreePredictor(
+        np.zeros(n, dtype=int), np.zeros(n), left, right, np.arange(n, dtype=float)
+    )
+    path = write_layout(predictor, tmp_path / "layout.bin", tree_digest="ab" * 32)
+    layout = read_layout(path)
+    x, y = tidy_layout(left, right)
+    np.testing.assert_array_equal(layout["x"], x)
+    np.testing.assert_array_equal(layout["y"], y)
+    assert layout["treeDigest"] == "ab" * 32
+    assert (layout["nodeCount"], layout["root"]) == (n, 0)
+    assert layout["bbox"] == {"minX": x.min(), "maxX": x.max(), "minY": 0.0, "maxY": y.max()}
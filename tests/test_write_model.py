@@ -0,0 +1,118 @@
+import gzip
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import train_tree
+from tree_binary import tree_digest
+from tree_codegen import JS_PREDICTOR
+from tree_layout import LAYOUT_FILE, read_layout
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({"a": rng.normal(size=200), "b": rng.integers(0, 5, 200).astype(float)})
+    df["y"] = df["a"] * 2 + df["b"] + rng.normal(scale=0.1, size=200)
+    return df
+
+
+def fit_and_write(df, out_dir, min_samples_leaf, **kwargs):
+    tree = train_tree.train_tree(df, "y", None, min_samples_leaf, 0)
+    meta = {"target": "y"}
+    return tree, meta, train_tree.write_model(tree, ["a", "b"], meta, out_dir, **kwargs)
+
+
+def test_derived_artifacts_record_tree_digest(data, tmp_path):
+    _, meta, _ = fit_and_write(data, tmp_path, 5, test_df=data)
+    digest = tree_digest(tmp_path / "tree.bin")
+    assert meta["treeDigest"] == digest
+    assert read_layout(tmp_path / LAYOUT_FILE)["treeDigest"] == digest
+    assert json.loads((tmp_path / train_tree.TEST_PATHS).read_text())["treeDigest"] == digest
+    assert f'TREE_DIGEST = "{digest}"' in (tmp_path / JS_PREDICTOR).read_text()
+
+
+def test_test_paths_identify_their_test_set(data, tmp_path):
+    csv_path = tmp_path / "test.csv"
+    data.to_csv(csv_path, index=False)
+    test_df = pd.read_csv(csv_path)
+    digest = train_tree.path_digest(csv_path)
+    fit_and_write(data, tmp_path, 5, test_df=test_df, test_source="test.csv", test_digest=digest)
+    test_paths = json.loads((tmp_path / train_tree.TEST_PATHS).read_text())
+    assert test_paths["testDigest"] == digest
+    # The viewer's replay check: pred - error reproduces each row's target.
+    y = np.array(test_paths["pred"]) - np.array(test_paths["error"])
+    np.testing.assert_allclose(y, test_df["y"], rtol=0, atol=1e-5)
+
+
+def test_no_js_removes_stale_predictor(data, tmp_path):
+    fit_and_write(data, tmp_path, 5, test_df=data)
+    _, meta, paths = fit_and_write(data, tmp_path, 20, js_mode=None)
+    assert not (tmp_path / JS_PREDICTOR).exists()
+    assert not (tmp_path / train_tree.TEST_PATHS).exists()
+    assert (tmp_path / LAYOUT_FILE).exists()
+    assert sorted(meta["artifactBytes"]) == sorted(p.name for p in paths[:-1])
+
+
+def test_gzip_removes_stale_tree_json(data, tmp_path):
+    fit_and_write(data, tmp_path, 5)
+    _, meta, _ = fit_and_write(data, tmp_path, 20, gzip_json=True)
+    assert not (tmp_path / "tree.json").exists()
+    assert "tree.json.gz" in meta["artifactBytes"]
+    fit_and_write(data, tmp_path, 5)
+    assert not (tmp_path / "tree.json.gz").exists()
+
+
+def test_auto_mode_skips_js_above_threshold(data, tmp_path, monkeypatch):
+    monkeypatch.setattr(train_tree, "JS_AUTO_MAX_NODES", 3)
+    fit_and_write(data, tmp_path, 5)
+    assert not (tmp_path / JS_PREDICTOR).exists()
+    fit_and_write(data, tmp_path, 5, js_mode="nested")
+    assert (tmp_path / JS_PREDICTOR).exists()
+
+
+def test_no_layout_removes_layout(data, tmp_path):
+    (tmp_path / "layout.json").write_text("{}")  # written by older versions
+    fit_and_write(data, tmp_path, 5)
+    assert not (tmp_path / "layout.json").exists()
+    fit_and_write(data, tmp_path, 5, layout=False)
+    assert not (tmp_path / LAYOUT_FILE).exists()
+
+
+
+@pytest.mark.parametrize("tree_format", ["nodes", "columnar"])
+@pytest.mark.parametrize("name", ["tree.json", "tree.json.gz"])
+@pytest.mark.parametrize("chunk_nodes", [7, train_tree.DEFAULT_STREAM_CHUNK_NODES])
+def test_streamed_json_matches_in_memory(data, tmp_path, tree_format, name, chunk_nodes):
+    tree = train_tree.train_tree(data, "y", None, 2, 0)
+    export = {"nodes": train_tree.export_tree_json, "columnar": train_tree.export_tree_columnar}
+    expected = json.dumps(export[tree_format](tree, ["a", "b"])).encode("utf-8")
+    path = tmp_path / name
+    train_tree.write_tree_json_stream(
+        tree, ["a", "b"], path, tree_format=tree_format, chunk_nodes=chunk_nodes
+    )
+    opener = gzip.open if name.endswith(".gz") else open
+    with opener(path, "rb") as fh:
+        assert fh.read() == expected
+
+
+def test_stage_cache_hit_prints_profile(data, tmp_path, monkeypatch, capsys):
+    data.to_csv(tmp_path / "train.csv", index=False)
+    argv = [
+        "train_tree.py",
+        f"--train-data={tmp_path / 'train.csv'}",
+        "--target=y",
+        "--test-data=",
+        f"--out-dir={tmp_path / 'model'}",
+        f"--stage-cache={tmp_path / 'store'}",
+        "--profile",
+    ]
+    monkeypatch.setattr(sys, "argv", argv)
+    train_tree.main()
+    capsys.readouterr()
+    train_tree.main()
+    out = capsys.readouterr().out
+    assert "restored" in out and "restore" in out.split("from cache.")[1]
@@ -0,0 +1,101 @@
+// One requestAnimationFrame loop for every ball travelling down the tree. Ball state lives in
+// parallel typed arrays indexed by slot: the current segment, when it started, and how long it
+// lasts. Finished slots go on a free list, and the arrays double when full. Drawing goes through a
+// backend, so SVG circles or canvas entries are recycled rather than created per sample:
+//   acquire(sample) -> handle, place(handle, x, y), release(handle), and an optional
+//   frame() called once after all balls have moved.
+//
+// Paths are arrays of layout nodes ({ x, y }, x the breadth); a ball moves from (y, x) of one
+// node to the next at `speed` layout units per second.
+
+const INITIAL_CAPACITY = 64;
+
+export class BallScheduler {
+  constructor(backend, speed = 280) {
+    this.backend = backend;
+    this.speed = speed;
+    this.capacity = 0;
+    this.seg = new Int32Array(0);
+    this.start = new Float64Array(0);
+    this.duration = new Float64Array(0);
+    this.paths = [];
+    this.handles = [];
+    this.onDone = [];
+    this.free = [];
+    this.active = new Int32Array(0); // slots in flight, packed at the front
+    this.count = 0;
+    this.running = false;
+    this.tick = this.tick.bind(this);
+    this.grow(INITIAL_CAPACITY);
+  }
+
+  grow(capacity) {
+    const copy = (Type, old) => { const a = new Type(capacity); a.set(old); return a; };
+    this.seg = copy(Int32Array, this.seg);
+    this.start = copy(Float64Array, this.start);
+    this.duration = copy(Float64Array, this.duration);
+    this.active = copy(Int32Array, this.active);
+    for (let slot = capacity - 1; slot >= this.capacity; slot--) this.free.push(slot);
+    this.paths.length = this.handles.length = this.onDone.length = capacity;
+    this.capacity = capacity;
+  }
+
+  segmentDuration(path, i) {
+    const a = path[i], b = path[i + 1];
+    return (Math.hypot(b.y - a.y, b.x - a.x) / this.speed) * 1000;
+  }
+
+  launch(path, sample, onDone) {
+    if (path.length < 2) { onDone && onDone(); return; }
+    if (this.free.length === 0) this.grow(this.capacity * 2);
+    const slot = this.free.pop();
+    this.seg[slot] = 0;
+    this.start[slot] = performance.now();
+    this.duration[slot] = this.segmentDuration(path, 0);
+    this.paths[slot] = path;
+    this.onDone[slot] = onDone;
+    this.handles[slot] = this.backend.acquire(sample);
+    this.backend.place(this.handles[slot], path[0].y, path[0].x);
+    this.active[this.count++] = slot;
+    if (!this.running) { this.running = true; requestAnimationFrame(this.tick); }
+  }
+
+  release(slot) {
+    this.backend.release(this.handles[slot]);
+    this.paths[slot] = this.handles[slot] = this.onDone[slot] = undefined;
+    this.free.push(slot);
+  }
+
+  tick(now) {
+    const { seg, start, duration, paths, active } = this;
+    const finished = [];
+    for (let i = 0; i < this.count;) {
+      const slot = active[i], path = paths[slot];
+      // Carry leftover time into the next segment so speed does not depend on the frame rate
+      while (seg[slot] < path.length - 1 && now - start[slot] >= duration[slot]) {
+        start[slot] += duration[slot];
+        if (++seg[slot] < path.length - 1) duration[slot] = this.segmentDuration(path, seg[slot]);
+      }
+      if (seg[slot] >= path.length - 1) {
+        finished.push(this.onDone[slot]);
+        this.release(slot);
+        active[i] = active[--this.count];
+        continue;
+      }
+      const a = path[seg[slot]], b = path[seg[slot] + 1];
+      const k = Math.max(0, (now - start[slot]) / duration[slot]);
+      this.backend.place(this.handles[slot], a.y + (b.y - a.y) * k, a.x + (b.x - a.x) * k);
+      i++;
+    }
+    for (const done of finished) done && done();
+    if (this.backend.frame) this.backend.frame();
+    if (this.count > 0) requestAnimationFrame(this.tick); else this.running = false;
+  }
+
+  // Drop every ball in flight without calling its onDone (used by reset)
+  clear() {
+    for (let i = 0; i < this.count; i++) this.release(this.active[i]);
+    this.count = 0;
+    if (this.backend.frame) this.backend.frame();
+  }
+}
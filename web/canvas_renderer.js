@@ -0,0 +1,226 @@
+// Canvas 2D backend for the tree viewer. Large trees and long sample runs would otherwise need one
+// SVG element per node, link, ball and stacked dot. Here nodes, links and samples are plain arrays
+// redrawn in a few batched paths per frame (only when something changed). Tooltips use a
+// uniform-grid hit test instead of DOM events.
+//
+// Coordinates follow main.js: layout nodes are { data: id, x, y } with x the breadth and y the
+// depth, drawn at screen (y, x) under the current zoom transform { x, y, k }.
+
+export const CANVAS_NODE_THRESHOLD = 2000;
+export const CANVAS_SAMPLE_THRESHOLD = 5000;
+
+const NODE_RADIUS = 16;
+const BALL_RADIUS = 8;
+const DOT_RADIUS = 5;
+const DOT_COLS = 6;
+const DOT_SPACING = 11;
+const GRID_CELL = 48; // hit-test grid cell in layout units
+const COLORS = {
+  link: '#bbb', active: '#ff7f0e', node: '#fff', leaf: '#f0f7ff', nodeStroke: '#444',
+  sample: '#1f77b4', sampleStroke: '#fff', background: '#fafafa',
+};
+
+// `?renderer=svg|canvas` forces a backend; otherwise canvas is used above either threshold.
+export function shouldUseCanvas(nodeCount, sampleCount, override) {
+  if (override === 'canvas') return true;
+  if (override === 'svg') return false;
+  return nodeCount > CANVAS_NODE_THRESHOLD || sampleCount > CANVAS_SAMPLE_THRESHOLD;
+}
+
+function cellKey(cx, cy) {
+  return `${cx},${cy}`;
+}
+
+function gridInsert(grid, item, x, y) {
+  const key = cellKey(Math.floor(x / GRID_CELL), Math.floor(y / GRID_CELL));
+  const cell = grid.get(key);
+  if (cell) cell.push(item); else grid.set(key, [item]);
+}
+
+// Nearest item within `radius` of (x, y); items are stored by their (sx, sy) drawing position.
+function gridNearest(grid, x, y, radius) {
+  const span = Math.ceil(radius / GRID_CELL);
+  const cx = Math.floor(x / GRID_CELL), cy = Math.floor(y / GRID_CELL);
+  let best = null, bestD = radius * radius;
+  for (let i = cx - span; i <= cx + span; i++) {
+    for (let j = cy - span; j <= cy + span; j++) {
+      const cell = grid.get(cellKey(i, j));
+      if (!cell) continue;
+      for (const item of cell) {
+        const d = (item.sx - x) ** 2 + (item.sy - y) ** 2;
+        if (d <= bestD) { best = item; bestD = d; }
+      }
+    }
+  }
+  return best;
+}
+
+export class CanvasRenderer {
+  constructor(canvas) {
+    this.canvas = canvas;
+    this.ctx = canvas.getContext('2d');
+    this.transform = { x: 0, y: 0, k: 1 };
+    this.nodes = [];
+    this.links = [];
+    this.isLeaf = () => false;
+    this.activePath = [];
+    this.balls = new Set();
+    this.freeBalls = [];
+    this.dots = [];
+    this.dotCounts = new Map();
+    this.nodeGrid = new Map();
+    this.dotGrid = new Map();
+    this.frame = 0;
+    this.resize();
+  }
+
+  resize() {
+    const dpr = window.devicePixelRatio || 1;
+    this.width = this.canvas.clientWidth;
+    this.height = this.canvas.clientHeight;
+    this.canvas.width = Math.round(this.width * dpr);
+    this.canvas.height = Math.round(this.height * dpr);
+    this.dpr = dpr;
+    this.requestDraw();
+  }
+
+  setTree(nodes, links, isLeaf) {
+    this.nodes = nodes;
+    this.links = links;
+    this.isLeaf = isLeaf;
+    this.nodeGrid = new Map();
+    for (const n of nodes) {
+      n.sx = n.y; n.sy = n.x;
+      gridInsert(this.nodeGrid, n, n.sx, n.sy);
+    }
+    this.requestDraw();
+  }
+
+  setTransform(t) {
+    this.transform = { x: t.x, y: t.y, k: t.k };
+    this.requestDraw();
+  }
+
+  setActivePath(path) {
+    this.activePath = path;
+    this.requestDraw();
+  }
+
+  // Balls are recycled; their positions are set by the ball scheduler, which calls flush()
+  // once per frame after moving them.
+  addBall(sample) {
+    const ball = this.freeBalls.pop() || { sample: null, sx: 0, sy: 0 };
+    ball.sample = sample;
+    this.balls.add(ball);
+    return ball;
+  }
+
+  moveBall(ball, x, y) {
+    ball.sx = x; ball.sy = y;
+  }
+
+  removeBall(ball) {
+    this.balls.delete(ball);
+    ball.sample = null;
+    this.freeBalls.push(ball);
+  }
+
+  // Same grid as the SVG stacks: rows of DOT_COLS dots up and to the right of the leaf.
+  addStackDot(leafNode, sample) {
+    const count = this.dotCounts.get(leafNode.data) || 0;
+    this.dotCounts.set(leafNode.data, count + 1);
+    const dot = {
+      sample,
+      sx: leafNode.y + 20 + (count % DOT_COLS) * DOT_SPACING,
+      sy: leafNode.x - 20 + Math.floor(count / DOT_COLS) * DOT_SPACING,
+    };
+    this.dots.push(dot);
+    gridInsert(this.dotGrid, dot, dot.sx, dot.sy);
+    this.requestDraw();
+  }
+
+  clearSamples() {
+    for (const ball of this.balls) this.removeBall(ball);
+    this.dots = [];
+    this.dotCounts.clear();
+    this.dotGrid = new Map();
+    this.requestDraw();
+  }
+
+  // Item under a point in canvas CSS pixels: { sample } for a ball or dot, { node } for a node.
+  hitTest(px, py) {
+    const { x, y, k } = this.transform;
+    const wx = (px - x) / k, wy = (py - y) / k;
+    const dot = gridNearest(this.dotGrid, wx, wy, DOT_RADIUS);
+    if (dot) return { sample: dot.sample };
+    for (const ball of this.balls) {
+      if ((ball.sx - wx) ** 2 + (ball.sy - wy) ** 2 <= BALL_RADIUS ** 2) return { sample: ball.sample };
+    }
+    const node = gridNearest(this.nodeGrid, wx, wy, NODE_RADIUS);
+    return node ? { node } : null;
+  }
+
+  // Draw now (inside another requestAnimationFrame callback) instead of a frame later
+  flush() {
+    if (this.frame) { cancelAnimationFrame(this.frame); this.frame = 0; }
+    this.draw();
+  }
+
+  requestDraw() {
+    if (!this.frame) this.frame = requestAnimationFrame(() => { this.frame = 0; this.draw(); });
+  }
+
+  draw() {
+    const { ctx, dpr } = this;
+    const { x, y, k } = this.transform;
+    ctx.setTransform(dpr, 0, 0, dpr, 0, 0);
+    ctx.fillStyle = COLORS.background;
+    ctx.fillRect(0, 0, this.width, this.height);
+    ctx.setTransform(dpr * k, 0, 0, dpr * k, dpr * x, dpr * y);
+
+    // Visible region in layout units, padded by a node radius
+    const x0 = -x / k - NODE_RADIUS, x1 = (this.width - x) / k + NODE_RADIUS;
+    const y0 = -y / k - NODE_RADIUS, y1 = (this.height - y) / k + NODE_RADIUS;
+    const visible = n => n.sx >= x0 && n.sx <= x1 && n.sy >= y0 && n.sy <= y1;
+
+    ctx.beginPath();
+    for (const { source: a, target: b } of this.links) {
+      if (!visible(a) && !visible(b)) continue;
+      ctx.moveTo(a.sx, a.sy); ctx.lineTo(b.sx, b.sy);
+    }
+    ctx.strokeStyle = COLORS.link; ctx.lineWidth = 2.5; ctx.stroke();
+    const path = this.activePath;
+    if (path.length > 1) {
+      ctx.beginPath();
+      ctx.moveTo(path[0].sx, path[0].sy);
+      for (let i = 1; i < path.length; i++) ctx.lineTo(path[i].sx, path[i].sy);
+      ctx.strokeStyle = COLORS.active; ctx.lineWidth = 3; ctx.stroke();
+    }
+
+    const internal = new Path2D(), leaves = new Path2D(), active = new Path2D();
+    for (const n of this.nodes) {
+      if (!visible(n)) continue;
+      const p = this.isLeaf(n.data) ? leaves : internal;
+      p.moveTo(n.sx + NODE_RADIUS, n.sy); p.arc(n.sx, n.sy, NODE_RADIUS, 0, 2 * Math.PI);
+    }
+    // The highlighted path is drawn from its own O(depth) list, not looked up per node
+    for (const n of path) {
+      active.moveTo(n.sx + NODE_RADIUS, n.sy); active.arc(n.sx, n.sy, NODE_RADIUS, 0, 2 * Math.PI);
+    }
+    ctx.lineWidth = 1.8; ctx.strokeStyle = COLORS.nodeStroke;
+    ctx.fillStyle = COLORS.node; ctx.fill(internal); ctx.stroke(internal);
+    ctx.fillStyle = COLORS.leaf; ctx.fill(leaves); ctx.stroke(leaves);
+    ctx.lineWidth = 3; ctx.strokeStyle = COLORS.active; ctx.stroke(active);
+
+    this.drawSamples(this.balls, BALL_RADIUS, 1);
+    this.drawSamples(this.dots, DOT_RADIUS, 0.5);
+  }
+
+  drawSamples(items, radius, strokeWidth) {
+    const { ctx } = this;
+    const path = new Path2D();
+    for (const s of items) { path.moveTo(s.sx + radius, s.sy); path.arc(s.sx, s.sy, radius, 0, 2 * Math.PI); }
+    ctx.fillStyle = COLORS.sample; ctx.fill(path);
+    ctx.lineWidth = strokeWidth; ctx.strokeStyle = COLORS.sampleStroke; ctx.stroke(path);
+  }
+}
@@ -1,9 +1,12 @@
-import { csv, json, hierarchy, tree as d3tree, select, zoom, interpolate } from "https://cdn.jsdelivr.net/npm/d3@7/+esm";
+import { csvParse, json, hierarchy, tree as d3tree, select, zoom, zoomIdentity } from "https://cdn.jsdelivr.net/npm/d3@7/+esm";
+import { CanvasRenderer, shouldUseCanvas } from "./canvas_renderer.js";
+import { BallScheduler } from "./ball_scheduler.js";
 
 const svg = select("#svg");
 const rootG = svg.append("g").attr("class", "rootG");
 const gLinks = rootG.append("g").attr("class", "links");
 const gNodes = rootG.append("g").attr("class", "nodes");
+const canvasEl = document.getElementById("canvas");
 
 const playBtn = document.getElementById("play");
 const pauseBtn = document.getElementById("pause");
@@ -19,41 +22,224 @@ const yErrEl = document.getElementById("yErr");
 const tooltip = document.getElementById('tooltip');
 
 let meta, model, testData, featureNames, root, layout, nodesById;
+// Extent of the drawn tree in layout coordinates (x: breadth, y: depth), used by fitToView
+let bbox = null;
+// model/layout.bin from scripts/tree_layout.py: the d3 tree layout precomputed at export
+let precomputedLayout = null;
+// Compiled model/predictor.js (scripts/tree_codegen.py) and a reused feature buffer for it
+let predictor = null, predictorRow = null;
+// model/test_paths.json: per-sample leaf, prediction, error and path precomputed at export time
+let replay = null;
+// Set when the canvas backend draws the tree instead of SVG elements (large trees or test sets)
+let canvasRenderer = null;
+let surface = svg, zoomBehavior = null;
 let animTimer = null;
 let currentIndex = 0;
 let ballsLayer, stacksLayer;
+// Shared animation loop for in-flight balls, created once the render backend is known
+let balls = null;
+// SVG elements by node id (links by their child's id) and the highlighted path's node ids
+let nodeEls = [], linkEls = [], activeIds = [];
 
-function toHier(model) {
-  const nodeMap = new Map(model.nodes.map(n => [n.id, n]));
-  function build(id) {
-    const n = nodeMap.get(id);
-    const children = n.isLeaf ? [] : [build(n.left), build(n.right)];
-    return { ...n, children };
+// The model is held as parallel typed arrays indexed by node id (leaves have left === -1),
+// whether it came from tree.bin, columnar tree.json or per-node tree.json.
+const TREE_BIN_MAGIC = 0x42525452; // "RTRB" read as a little-endian uint32
+const TREE_BIN_BLOCKS = [
+  ['feature', Int32Array], ['left', Int32Array], ['right', Int32Array], ['nSamples', Int32Array],
+  ['threshold', Float64Array], ['value', Float64Array], ['impurity', Float32Array],
+];
+
+function fromBinary(buf) {
+  // Views straight into the fetched buffer; blocks are 8-byte aligned (see scripts/tree_binary.py)
+  const view = new DataView(buf);
+  if (view.getUint32(0, true) !== TREE_BIN_MAGIC) throw new Error('tree.bin: bad magic');
+  const nodeCount = view.getUint32(8, true);
+  const m = { root: view.getInt32(12, true), nodeCount };
+  let offset = 16;
+  for (const [name, Type] of TREE_BIN_BLOCKS) {
+    m[name] = new Type(buf, offset, nodeCount);
+    offset = (offset + nodeCount * Type.BYTES_PER_ELEMENT + 7) & ~7;
+  }
+  return m;
+}
+
+function fromColumnar(model) {
+  const m = { root: model.root, nodeCount: model.nodeCount };
+  for (const [name, Type] of TREE_BIN_BLOCKS) m[name] = Type.from(model[name]);
+  return m;
+}
+
+function fromNodes(model) {
+  const nodeCount = model.nodes.length;
+  const m = { root: model.root, nodeCount };
+  for (const [name, Type] of TREE_BIN_BLOCKS) m[name] = new Type(nodeCount);
+  for (const n of model.nodes) {
+    const i = n.id;
+    m.nSamples[i] = n.nSamples; m.impurity[i] = n.impurity; m.value[i] = n.value;
+    if (n.isLeaf) { m.left[i] = -1; m.right[i] = -1; m.feature[i] = -2; }
+    else { m.left[i] = n.left; m.right[i] = n.right; m.feature[i] = n.featureIndex; m.threshold[i] = n.threshold; }
+  }
+  return m;
+}
+
+async function sha256Hex(buf) {
+  const bytes = new Uint8Array(await crypto.subtle.digest('SHA-256', buf));
+  return Array.from(bytes, b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function loadModel(base) {
+  try {
+    const res = await fetch(`${base}/model/tree.bin`);
+    if (res.ok) {
+      const buf = await res.arrayBuffer();
+      const m = fromBinary(buf);
+      // crypto.subtle only exists in secure contexts; init() falls back to meta.treeDigest
+      if (globalThis.crypto && crypto.subtle) m.digest = await sha256Hex(buf);
+      return m;
+    }
+  } catch (e) {
+    // no binary model next to tree.json; fall through
   }
-  return build(model.root);
+  const m = await json(`${base}/model/tree.json`);
+  return m.format === 'columnar' ? fromColumnar(m) : fromNodes(m);
+}
+
+async function loadPredictor(base) {
+  // Optional: older exports (or --no-js) have no predictor.js and prediction walks the arrays.
+  try {
+    return await import(new URL(`${base}/model/predictor.js`, document.baseURI).href);
+  } catch (e) {
+    return null;
+  }
+}
+
+async function loadTestData(base) {
+  const res = await fetch(`${base}/data/california_housing_test.csv`);
+  if (!res.ok) throw new Error(`${res.status} ${res.statusText}`);
+  const buf = await res.arrayBuffer();
+  const rows = csvParse(new TextDecoder().decode(buf));
+  // Compared with test_paths.json's testDigest (see loadModel for the crypto.subtle check)
+  if (globalThis.crypto && crypto.subtle) rows.digest = await sha256Hex(buf);
+  return rows;
+}
+
+// pred and error are rounded to 6 decimals in test_paths.json
+const REPLAY_TOLERANCE = 1e-5;
+
+function replayMatches(precomputed, rows) {
+  // Same test set: row count, file digest when both sides have one, and every row's target
+  if (precomputed.nSamples !== rows.length) return false;
+  if (rows.digest && precomputed.testDigest && rows.digest !== precomputed.testDigest) return false;
+  const { pred, error } = precomputed;
+  for (let i = 0; i < rows.length; i++) {
+    const y = +rows[i][meta.target];
+    if (!(Math.abs(pred[i] - error[i] - y) <= REPLAY_TOLERANCE)) return false;
+  }
+  return true;
+}
+
+async function loadReplay(base) {
+  try {
+    return await json(`${base}/model/test_paths.json`);
+  } catch (e) {
+    return null;
+  }
+}
+
+function replayPath(index) {
+  // leafPaths holds '0'/'1' (left/right) decisions from the root for each reached leaf
+  const code = replay.leafPaths[replay.leaf[index]];
+  let id = model.root;
+  const path = [nodesById[id]];
+  for (let i = 0; i < code.length; i++) {
+    id = code.charCodeAt(i) === 48 ? model.left[id] : model.right[id];
+    path.push(nodesById[id]);
+  }
+  return { leaf: path[path.length - 1], path };
+}
+
+const LAYOUT_BIN_MAGIC = 0x4c525452; // "RTRL" read as a little-endian uint32
+const LAYOUT_BIN_HEADER_BYTES = 144;
+
+function layoutFromBinary(buf) {
+  // x/y are Float64Array views into the buffer (see scripts/tree_layout.py); NaN marks unreachable nodes
+  const view = new DataView(buf);
+  if (view.getUint32(0, true) !== LAYOUT_BIN_MAGIC) throw new Error('layout.bin: bad magic');
+  const nodeCount = view.getUint32(8, true);
+  const digest = new TextDecoder().decode(new Uint8Array(buf, 16, 64)).replace(/\0+$/, '');
+  const [minX, maxX, minY, maxY] = new Float64Array(buf, 112, 4);
+  return {
+    nodeCount,
+    root: view.getInt32(12, true),
+    treeDigest: digest,
+    bbox: { minX, maxX, minY, maxY },
+    x: new Float64Array(buf, LAYOUT_BIN_HEADER_BYTES, nodeCount),
+    y: new Float64Array(buf, LAYOUT_BIN_HEADER_BYTES + nodeCount * 8, nodeCount),
+  };
+}
+
+async function loadLayout(base) {
+  try {
+    const res = await fetch(`${base}/model/layout.bin`);
+    return res.ok ? layoutFromBinary(await res.arrayBuffer()) : null;
+  } catch (e) {
+    return null;
+  }
+}
+
+function nodeTooltip(id) {
+  if (isLeaf(id)) return `pred: ${model.value[id].toFixed(3)}`;
+  return `${featureNames[model.feature[id]]} ≤ ${model.threshold[id].toFixed(2)}`;
+}
+
+function sampleTooltip(sample) {
+  return `y: ${(+sample[meta.target]).toFixed(3)}`;
+}
+
+function showTooltip(e, text) {
+  const pad = 10;
+  tooltip.textContent = text;
+  tooltip.style.opacity = 1;
+  tooltip.style.left = `${e.clientX + pad}px`;
+  tooltip.style.top = `${e.clientY + pad}px`;
+}
+
+function isLeaf(id) {
+  return model.left[id] < 0;
 }
 
 function computePrediction(sample) {
-  let n = nodesById.get(model.root);
-  const path = [n];
-  while (!n.data.isLeaf) {
-    const idx = n.data.featureIndex;
-    const fname = featureNames[idx];
-    const v = +sample[fname];
-    const nextId = (v <= n.data.threshold) ? n.data.left : n.data.right;
-    n = nodesById.get(nextId);
-    path.push(n);
+  if (predictor) {
+    const names = predictor.FEATURE_NAMES;
+    for (let i = 0; i < names.length; i++) predictorRow[i] = +sample[names[i]];
+    const path = predictor.pathTo(predictor.leafOf(predictorRow)).map(id => nodesById[id]);
+    return { leaf: path[path.length - 1], path };
+  }
+  let id = model.root;
+  const path = [nodesById[id]];
+  while (!isLeaf(id)) {
+    const v = +sample[featureNames[model.feature[id]]];
+    id = (v <= model.threshold[id]) ? model.left[id] : model.right[id];
+    path.push(nodesById[id]);
   }
-  return { leaf: n, path };
+  return { leaf: nodesById[id], path };
 }
 
+// Only the part of the path that differs from the previous one is touched: O(depth) per step.
 function setActivePath(path) {
-  svg.selectAll('.node').classed('active', false);
-  svg.selectAll('.link').classed('active', false);
-  for (let i = 0; i < path.length; i++) {
-    const n = path[i];
-    svg.select(`#node-${n.data.id}`).classed('active', true);
-    if (i > 0) svg.select(`#link-${path[i-1].data.id}-${n.data.id}`).classed('active', true);
+  if (canvasRenderer) { canvasRenderer.setActivePath(path); return; }
+  let common = 0;
+  while (common < path.length && common < activeIds.length && path[common].data === activeIds[common]) common++;
+  for (let i = common; i < activeIds.length; i++) {
+    nodeEls[activeIds[i]].classList.remove('active');
+    if (i > 0) linkEls[activeIds[i]].classList.remove('active');
+  }
+  activeIds.length = common;
+  for (let i = common; i < path.length; i++) {
+    const id = path[i].data;
+    nodeEls[id].classList.add('active');
+    if (i > 0) linkEls[id].classList.add('active');
+    activeIds.push(id);
   }
 }
 
@@ -61,20 +247,56 @@ function render() {
   const width = svg.node().clientWidth;
   const height = svg.node().clientHeight;
 
-  layout = d3tree().nodeSize([36, 140]); // fixed spacing for readability
-  root = hierarchy(toHier(model));
-  root = layout(root);
+  let nodes, links;
+  if (precomputedLayout) {
+    // Plain { data, x, y } nodes: everything below only reads those fields
+    const { x, y } = precomputedLayout;
+    nodesById = new Array(model.nodeCount);
+    nodes = [];
+    links = [];
+    for (let id = 0; id < model.nodeCount; id++) {
+      if (Number.isNaN(x[id])) continue;
+      nodes.push(nodesById[id] = { data: id, x: x[id], y: y[id] });
+    }
+    for (const source of nodes) {
+      if (isLeaf(source.data)) continue;
+      links.push({ source, target: nodesById[model.left[source.data]] });
+      links.push({ source, target: nodesById[model.right[source.data]] });
+    }
+    root = nodesById[model.root];
+    bbox = precomputedLayout.bbox;
+  } else {
+    layout = d3tree().nodeSize([36, 140]); // fixed spacing for readability (see scripts/tree_layout.py)
+    // Hierarchy over node ids: d.data is the id into the model arrays
+    root = hierarchy(model.root, id => isLeaf(id) ? null : [model.left[id], model.right[id]]);
+    root = layout(root);
+
+    nodesById = new Array(model.nodeCount);
+    root.each(n => { nodesById[n.data] = n; });
+    nodes = root.descendants();
+    links = root.links();
+    bbox = { minX: Infinity, maxX: -Infinity, minY: Infinity, maxY: -Infinity };
+    for (const n of nodes) {
+      if (n.x < bbox.minX) bbox.minX = n.x;
+      if (n.x > bbox.maxX) bbox.maxX = n.x;
+      if (n.y < bbox.minY) bbox.minY = n.y;
+      if (n.y > bbox.maxY) bbox.maxY = n.y;
+    }
+  }
 
-  nodesById = new Map();
-  root.each(n => nodesById.set(n.data.id, n));
+  if (canvasRenderer) {
+    canvasRenderer.setTree(nodes, links, isLeaf);
+    if (!balls) balls = new BallScheduler(canvasBallBackend());
+    fitToView();
+    return;
+  }
 
   // Links
-  const links = root.links();
-  const linkSel = gLinks.selectAll("line").data(links, d => `${d.source.data.id}-${d.target.data.id}`);
+  const linkSel = gLinks.selectAll("line").data(links, d => `${d.source.data}-${d.target.data}`);
   linkSel.join(
     enter => enter.append("line")
       .attr("class", "link")
-      .attr("id", d => `link-${d.source.data.id}-${d.target.data.id}`)
+      .attr("id", d => `link-${d.source.data}-${d.target.data}`)
       .attr("x1", d => d.source.y)
       .attr("y1", d => d.source.x)
       .attr("x2", d => d.target.y)
@@ -88,21 +310,16 @@ function render() {
   );
 
   // Nodes
-  const nodeSel = gNodes.selectAll("g.node").data(root.descendants(), d => d.data.id);
+  const nodeSel = gNodes.selectAll("g.node").data(nodes, d => d.data);
   const nodeEnter = nodeSel.join(
     enter => {
-      const g = enter.append("g").attr("class", d => `node ${d.data.isLeaf ? 'leaf' : ''}`).attr("id", d => `node-${d.data.id}`)
+      const g = enter.append("g").attr("class", d => `node ${isLeaf(d.data) ? 'leaf' : ''}`).attr("id", d => `node-${d.data}`)
         .attr("transform", d => `translate(${d.y}, ${d.x})`);
       g.append("circle").attr("r", 16);
       // Tooltip for both internal and leaf nodes
       g.on('mouseenter', (e, d) => {
         tooltip.style.opacity = 1;
-        if (d.data.isLeaf) {
-          tooltip.textContent = `pred: ${d.data.value.toFixed(3)}`;
-        } else {
-          const fname = featureNames[d.data.featureIndex];
-          tooltip.textContent = `${fname} ≤ ${d.data.threshold.toFixed(2)}`;
-        }
+        tooltip.textContent = nodeTooltip(d.data);
       }).on('mousemove', (e) => {
         const pad = 10;
         tooltip.style.left = `${e.clientX + pad}px`;
@@ -116,9 +333,16 @@ function render() {
     exit => exit.remove()
   );
 
+  nodeEls = new Array(model.nodeCount);
+  linkEls = new Array(model.nodeCount);
+  activeIds = [];
+  gNodes.selectAll("g.node").each(function (d) { nodeEls[d.data] = this; });
+  gLinks.selectAll("line").each(function (d) { linkEls[d.target.data] = this; });
+
   // Ensure layers for animation and stacks (topmost so balls show above nodes)
   if (!ballsLayer) ballsLayer = rootG.append('g').attr('class', 'balls');
   if (!stacksLayer) stacksLayer = rootG.append('g').attr('class', 'stacks');
+  if (!balls) balls = new BallScheduler(svgBallBackend());
 
   fitToView();
 }
@@ -130,19 +354,59 @@ function basePath() {
   return path.includes('/web/') ? '..' : '.';
 }
 
+function showSurface(useCanvas) {
+  // Chromium ignores the hidden attribute on <svg>, so the SVG is hidden through its style;
+  // passing false restores both elements to the SVG view.
+  svg.style('display', useCanvas ? 'none' : null);
+  canvasEl.hidden = !useCanvas;
+}
+
 async function init() {
   const base = basePath();
-  [meta, model, testData] = await Promise.all([
+  let compiled, precomputed, treeLayout;
+  [meta, model, testData, compiled, precomputed, treeLayout] = await Promise.all([
     json(`${base}/model/meta.json`),
-    json(`${base}/model/tree.json`),
-    csv(`${base}/data/california_housing_test.csv`)
+    loadModel(base),
+    loadTestData(base),
+    loadPredictor(base),
+    loadReplay(base),
+    loadLayout(base)
   ]);
+  // Derived artifacts record the SHA-256 of the tree.bin they came from; ignore any left over
+  // from a different tree than the one loaded.
+  const treeDigest = model.digest || meta.treeDigest;
+  const matches = digest => Boolean(treeDigest) && digest === treeDigest;
+  if (treeLayout && matches(treeLayout.treeDigest)) {
+    precomputedLayout = treeLayout;
+  }
+  // Replay only results computed for this tree and this test set
+  if (precomputed && matches(precomputed.treeDigest) && replayMatches(precomputed, testData)) {
+    replay = precomputed;
+  }
   featureNames = meta.featureNames;
+  if (compiled && matches(compiled.TREE_DIGEST)) {
+    predictor = compiled;
+    predictorRow = new Float64Array(predictor.FEATURE_NAMES.length);
+  }
   sampleTotalEl.textContent = testData.length;
+  const override = new URLSearchParams(window.location.search).get('renderer');
+  if (shouldUseCanvas(model.nodeCount, testData.length, override)) {
+    showSurface(true);
+    canvasRenderer = new CanvasRenderer(canvasEl);
+    surface = select(canvasEl);
+    surface.on('mousemove', (e) => {
+      const hit = canvasRenderer.hitTest(e.offsetX, e.offsetY);
+      if (!hit) { tooltip.style.opacity = 0; return; }
+      showTooltip(e, hit.node ? nodeTooltip(hit.node.data) : sampleTooltip(hit.sample));
+    }).on('mouseleave', () => { tooltip.style.opacity = 0; });
+    window.addEventListener('resize', () => canvasRenderer.resize());
+  }
   // enable zoom/pan
-  svg.call(zoom().scaleExtent([0.2, 3]).on('zoom', (e) => {
-    rootG.attr('transform', e.transform);
-  }));
+  zoomBehavior = zoom().scaleExtent([0.2, 3]).on('zoom', (e) => {
+    if (canvasRenderer) canvasRenderer.setTransform(e.transform);
+    else rootG.attr('transform', e.transform);
+  });
+  surface.call(zoomBehavior);
   render();
   // enable controls now that everything is ready
   playBtn.disabled = false;
@@ -152,22 +416,22 @@ async function init() {
 
 function updateStats(sample, leaf) {
   const y = +sample[meta.target];
-  const pred = leaf.data.value;
+  const pred = replay ? replay.pred[currentIndex] : model.value[leaf.data];
   yTrueEl.textContent = y.toFixed(3);
   yPredEl.textContent = pred.toFixed(3);
-  yErrEl.textContent = (pred - y).toFixed(3);
+  yErrEl.textContent = (replay ? replay.error[currentIndex] : pred - y).toFixed(3);
 }
 
 function stepOnce() {
   if (!testData || testData.length === 0 || !nodesById) return;
   if (currentIndex >= testData.length) { pause(); return; }
   const sample = testData[currentIndex];
-  const res = computePrediction(sample);
+  const res = replay ? replayPath(currentIndex) : computePrediction(sample);
   setActivePath(res.path);
   updateStats(sample, res.leaf);
   sampleIdxEl.textContent = (currentIndex + 1);
-  if (ballsLayer && stacksLayer) {
-  animateBallAlongPath(res.path, sample, () => stackAtLeaf(res.leaf, sample));
+  if (balls) {
+    balls.launch(res.path, sample, () => stackAtLeaf(res.leaf, sample));
   }
   currentIndex++;
 }
@@ -193,19 +457,19 @@ stepBtn.addEventListener('click', () => { pause(); stepOnce(); });
 speedEl.addEventListener('input', () => { if (animTimer) { pause(); play(); } });
 
 function fitToView() {
-  if (!root) return;
-  const nodes = root.descendants();
-  const xs = nodes.map(n => n.x), ys = nodes.map(n => n.y);
-  const minX = Math.min(...xs) - 60, maxX = Math.max(...xs) + 60;
-  const minY = Math.min(...ys) - 60, maxY = Math.max(...ys) + 60;
+  if (!bbox) return;
+  const minX = bbox.minX - 60, maxX = bbox.maxX + 60;
+  const minY = bbox.minY - 60, maxY = bbox.maxY + 60;
   const vbWidth = maxY - minY;
   const vbHeight = maxX - minX;
-  const width = svg.node().clientWidth;
-  const height = svg.node().clientHeight;
+  const width = surface.node().clientWidth;
+  const height = surface.node().clientHeight;
   const k = Math.min(width / vbWidth, height / vbHeight, 1.5);
   const tx = (width - k * (minY + maxY)) / 2;
   const ty = (height - k * (minX + maxX)) / 2;
-  rootG.attr('transform', `translate(${tx},${ty}) scale(${k})`);
+  // Through the zoom behavior so later pans start from the fitted view; large trees fit below 0.2
+  zoomBehavior.scaleExtent([Math.min(0.2, k), 3]);
+  surface.call(zoomBehavior.transform, zoomIdentity.translate(tx, ty).scale(k));
 }
 
 fitBtn.addEventListener('click', fitToView);
@@ -213,55 +477,45 @@ fitBtn.addEventListener('click', fitToView);
 init();
 
 // Animation helpers
-function animateBallAlongPath(path, sample, onDone) {
-  // Build segments from source->target positions
-  const segments = [];
-  for (let i = 0; i < path.length - 1; i++) {
-    const a = path[i], b = path[i+1];
-    segments.push({
-      ax: a.y, ay: a.x,
-      bx: b.y, by: b.x,
-      id: `${a.data.id}-${b.data.id}`
-    });
-  }
-  if (segments.length === 0) { onDone && onDone(); return; }
-
-  const ball = ballsLayer.append('circle').attr('r', 8).attr('fill', '#1f77b4').attr('stroke', '#fff').attr('stroke-width', 1)
-    .on('mouseenter', (e) => {
-      tooltip.style.opacity = 1;
-      tooltip.textContent = `y: ${(+sample[meta.target]).toFixed(3)}`;
-    })
-    .on('mousemove', (e) => {
-      const pad = 10; tooltip.style.left = `${e.clientX + pad}px`; tooltip.style.top = `${e.clientY + pad}px`;
-    })
-    .on('mouseleave', () => { tooltip.style.opacity = 0; });
+// Ball backends for BallScheduler: SVG circles are hidden and reused instead of removed
+function svgBallBackend() {
+  const pool = [];
+  return {
+    acquire(sample) {
+      let el = pool.pop();
+      if (!el) {
+        el = ballsLayer.append('circle').attr('r', 8).attr('fill', '#1f77b4').attr('stroke', '#fff').attr('stroke-width', 1)
+          .on('mouseenter', (e, d) => {
+            tooltip.style.opacity = 1;
+            tooltip.textContent = sampleTooltip(d);
+          })
+          .on('mousemove', (e) => {
+            const pad = 10; tooltip.style.left = `${e.clientX + pad}px`; tooltip.style.top = `${e.clientY + pad}px`;
+          })
+          .on('mouseleave', () => { tooltip.style.opacity = 0; })
+          .node();
+      }
+      select(el).datum(sample).attr('display', null);
+      return el;
+    },
+    place(el, x, y) { el.setAttribute('transform', `translate(${x},${y})`); },
+    release(el) { el.setAttribute('display', 'none'); pool.push(el); },
+  };
+}
 
-  let segIndex = 0;
-  const speedPxPerSec = 280; // visual speed along edges
-
-  function moveNext() {
-    if (segIndex >= segments.length) { ball.remove(); onDone && onDone(); return; }
-    const { ax, ay, bx, by } = segments[segIndex];
-    const dist = Math.hypot(bx - ax, by - ay);
-    const duration = (dist / speedPxPerSec) * 1000;
-    const ix = interpolate(ax, bx);
-    const iy = interpolate(ay, by);
-    const start = performance.now();
-
-    function frame(t) {
-      const k = Math.min(1, (t - start) / duration);
-      const x = ix(k), y = iy(k);
-      ball.attr('transform', `translate(${x},${y})`);
-      if (k < 1) requestAnimationFrame(frame); else { segIndex++; moveNext(); }
-    }
-    requestAnimationFrame(frame);
-  }
-  moveNext();
+function canvasBallBackend() {
+  return {
+    acquire: sample => canvasRenderer.addBall(sample),
+    place: (ball, x, y) => canvasRenderer.moveBall(ball, x, y),
+    release: ball => canvasRenderer.removeBall(ball),
+    frame: () => canvasRenderer.flush(),
+  };
 }
 
 function stackAtLeaf(leafNode, sample) {
+  if (canvasRenderer) { canvasRenderer.addStackDot(leafNode, sample); return; }
   // Stack balls in a small grid near the leaf node position
-  const key = `stack-${leafNode.data.id}`;
+  const key = `stack-${leafNode.data}`;
   let g = stacksLayer.select(`#${key}`);
   if (g.empty()) {
     g = stacksLayer.append('g').attr('id', key).attr('transform', `translate(${leafNode.y + 20}, ${leafNode.x - 20})`);
@@ -275,7 +529,7 @@ function stackAtLeaf(leafNode, sample) {
     .attr('cx', cx).attr('cy', cy).attr('r', 5)
     .attr('fill', '#1f77b4').attr('stroke', '#fff').attr('stroke-width', 0.5)
     .on('mouseenter', (e) => {
-      tooltip.style.opacity = 1; tooltip.textContent = `y: ${(+sample[meta.target]).toFixed(3)}`;
+      tooltip.style.opacity = 1; tooltip.textContent = sampleTooltip(sample);
     })
     .on('mousemove', (e) => {
       const pad = 10; tooltip.style.left = `${e.clientX + pad}px`; tooltip.style.top = `${e.clientY + pad}px`;
@@ -284,8 +538,9 @@ function stackAtLeaf(leafNode, sample) {
 }
 
 resetBtn.addEventListener('click', () => {
-  if (ballsLayer) ballsLayer.selectAll('*').remove();
+  if (balls) balls.clear();
   if (stacksLayer) stacksLayer.selectAll('*').remove();
+  if (canvasRenderer) canvasRenderer.clearSamples();
   currentIndex = 0;
   sampleIdxEl.textContent = 0;
   // allow playing again after reset